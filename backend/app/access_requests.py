@@ -1,21 +1,29 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
+import base64
+import hashlib
+import json
+import os
 import uuid
 
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 
+from app.access_store import AccessRequestStore, store_from_env
+from app.audit import audit_log
+
 router = APIRouter(tags=["access-requests"])
 
 # -----------------------------
-# MVP MOCK STORAGE (in-memory)
+# STORAGE (app/access_store.py)
 # -----------------------------
+# MVP: SQLite local (ACCESS_STORE=sqlite, default) o dict en memoria (ACCESS_STORE=memory)
 # En producción:
-# - Persistir en Firestore / Cloud SQL
+# - Implementar AccessRequestStore sobre Firestore / Cloud SQL
 # - Auditar en Cloud Logging / BigQuery
 # - Enforce auth via IAP/OAuth + verify JWT
 # - Validar IAM real (BigQuery / Dataplex)
-_DB: Dict[str, Dict[str, Any]] = {}
+_STORE: AccessRequestStore = store_from_env()
 
 
 class AccessRequestCreate(BaseModel):
@@ -31,6 +39,29 @@ class AccessRequestDecision(BaseModel):
     decided_by: str = Field(..., description="Email del que decide (owner/admin)")
 
 
+class BatchDecisionItem(BaseModel):
+    request_id: str
+    decision: str = Field(..., description="APPROVED or REJECTED")
+
+
+class BatchDecisionRequest(BaseModel):
+    decided_by: str = Field(..., description="Email del que decide (owner/admin)")
+    decisions: List[BatchDecisionItem] = Field(..., min_length=1, max_length=500)
+
+
+def _provisioning_enabled() -> bool:
+    return os.getenv("ENABLE_PROVISIONING", "false").lower() == "true"
+
+
+def has_approved_request(requester_email: str, linked_resource: str) -> bool:
+    """¿requester_email tiene una solicitud APPROVED sobre linked_resource?"""
+    return _STORE.has_approved(requester_email, linked_resource)
+
+
+def close_store() -> None:
+    _STORE.close()
+
+
 def _now_iso() -> str:
     return datetime.utcnow().isoformat() + "Z"
 
@@ -60,34 +91,82 @@ def create_access_request(payload: AccessRequestCreate):
         "decided_by": None,
         "decision": None,
     }
-    _DB[rid] = item
+    _STORE.create(item)
     return {"ok": True, "item": item}
 
 
+def _encode_cursor(key: Tuple[str, str]) -> str:
+    raw = json.dumps({"c": key[0], "i": key[1]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return str(data["c"]), str(data["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/access-requests")
 def list_access_requests(
     status: Optional[str] = Query(default=None, description="PENDING/APPROVED/REJECTED"),
     approver_email: Optional[str] = Query(default=None, description="Email del owner que aprueba"),
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = Query(default=None, description="next_cursor de la página anterior"),
 ):
     """
     MVP:
       - Si viene approver_email: filtra por data_owner=approver_email
       - Si no viene approver_email: devuelve todo (para ADMIN mock)
+      - Newest first, paginado por keyset (created_at, id): limit + cursor
+      - total sale de los contadores del store (sin escanear)
     Producción:
       - Autorizar por rol (owner/admin) a ver solicitudes
     """
-    items = list(_DB.values())
+    after = _decode_cursor(cursor) if cursor else None
+    data_owner = approver_email or None
+    status = status or None
+
+    # Filtros + orden resueltos por el store con sus índices; limit+1 para saber si hay más
+    items = _STORE.list(data_owner=data_owner, status=status, limit=limit + 1, after=after)
+    has_more = len(items) > limit
+    items = items[:limit]
 
-    if approver_email:
-        items = [x for x in items if x.get("data_owner") == approver_email]
+    return {
+        "items": items,
+        "total": _STORE.count(data_owner=data_owner, status=status),
+        "next_cursor": _encode_cursor((items[-1]["created_at"], items[-1]["id"])) if has_more else None,
+    }
+
+
+def _apply_decision(request_id: str, decision: str, decided_by: str) -> Dict[str, Any]:
+    """Valida y persiste una decisión; errores como HTTPException (404/403/400)."""
+    item = _STORE.get(request_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Request not found")
 
-    if status:
-        items = [x for x in items if x.get("status") == status]
+    owner = item.get("data_owner")
+    if decided_by != owner:
+        # En producción permitir ADMIN también
+        raise HTTPException(status_code=403, detail="Only Data Owner can approve/reject in this MVP")
 
-    # Orden newest first
-    items.sort(key=lambda x: x.get("created_at") or "", reverse=True)
+    decision = decision.upper().strip()
+    if decision not in ("APPROVED", "REJECTED"):
+        raise HTTPException(status_code=400, detail="decision must be APPROVED or REJECTED")
 
-    return {"items": items, "total": len(items)}
+    item = _STORE.update(
+        request_id,
+        {
+            "status": decision,
+            "decision": decision,
+            "decided_by": decided_by,
+            "decided_at": _now_iso(),
+        },
+    )
+    audit_log(decided_by, f"ACCESS_REQUEST_{decision}", item["linked_resource"], {"request_id": request_id})
+    return item
 
 
 @router.post("/access-requests/{request_id}/decision")
@@ -96,27 +175,87 @@ def decide_access_request(request_id: str, payload: AccessRequestDecision):
     MVP:
       - Solo permite decidir si decided_by == data_owner (o es admin en prod)
       - Cambia status a APPROVED/REJECTED
-    Producción:
-      - Aplicar IAM real (BigQuery dataset/table IAM o Dataplex policy)
-      - Registrar auditoría
+    ENABLE_PROVISIONING=true:
+      - Encola el grant (dataset READER) y responde sin esperar a BigQuery
     """
-    item = _DB.get(request_id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Request not found")
+    item = _apply_decision(request_id, payload.decision, payload.decided_by)
+    out: Dict[str, Any] = {"ok": True, "item": item}
+    if item["status"] == "APPROVED" and _provisioning_enabled():
+        # Solo encola: el grant lo aplica un worker (ver GET /provisioning/jobs/{job_id})
+        out["provisioning"] = _enqueue_grants([item])[request_id]
+    return out
 
-    owner = item.get("data_owner")
-    if payload.decided_by != owner:
-        # En producción permitir ADMIN también
-        raise HTTPException(status_code=403, detail="Only Data Owner can approve/reject in this MVP")
 
-    decision = payload.decision.upper().strip()
-    if decision not in ("APPROVED", "REJECTED"):
-        raise HTTPException(status_code=400, detail="decision must be APPROVED or REJECTED")
+def _enqueue_grants(approved: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Encola los grants de los aprobados: un job por dataset (un get_dataset +
+    un update_dataset en el worker, no uno por solicitud), o por tabla con
+    PROVISIONING_GRANT_SCOPE=table. La llave de idempotencia sale de los
+    request_ids, así repetir la decisión no duplica jobs; si el job anterior
+    quedó FAILED, repetirla lo reencola (ver JobQueue.enqueue).
+    Retorna {request_id: {job_id, status}}; el avance se consulta en
+    GET /provisioning/jobs/{job_id}.
+    """
+    from app.iam_provisioning import grant_scope, group_by_dataset, group_by_table
+    from app.provisioning_queue import get_queue
 
-    item["status"] = decision
-    item["decision"] = decision
-    item["decided_by"] = payload.decided_by
-    item["decided_at"] = _now_iso()
+    by_id = {x["id"]: x for x in approved}
+    linked = {rid: x["linked_resource"] for rid, x in by_id.items()}
+    table_scope = grant_scope() == "table"
+    kind = "grant_table_reader" if table_scope else "grant_dataset_reader"
+    groups, unsupported = group_by_table(linked) if table_scope else group_by_dataset(linked)
+    outcomes: Dict[str, Dict[str, Any]] = {
+        rid: {"ok": False, "error": "Unsupported linked_resource"} for rid in unsupported
+    }
+    queue = get_queue()
+    for target, rids in groups.items():
+        rids = sorted(rids)
+        resource = ".".join(target)
+        key = f"{kind}:" + hashlib.sha1(f"{resource}|{','.join(rids)}".encode()).hexdigest()
+        payload = dict(zip(("project", "dataset", "table"), target))
+        payload.update(emails=[by_id[rid]["requester_email"] for rid in rids], request_ids=rids)
+        job = queue.enqueue(kind, payload, idempotency_key=key)
+        for rid in rids:
+            outcomes[rid] = {"ok": True, "resource": resource, "job_id": job["id"], "status": job["status"]}
+    return outcomes
 
-    _DB[request_id] = item
-    return {"ok": True, "item": item}
+
+@router.post("/access-requests/decisions:batch")
+def decide_access_requests_batch(payload: BatchDecisionRequest):
+    """
+    Aprueba/rechaza varias solicitudes en un request.
+    - Cada decisión se valida y persiste por separado: resultado por request_id
+      (ok=False + status/error si no aplica)
+    - ENABLE_PROVISIONING=true: los aprobados se encolan agrupados por dataset
+      (un job = un update de access_entries por dataset, no uno por solicitud)
+    """
+    results: List[Dict[str, Any]] = []
+    approved: List[Dict[str, Any]] = []
+    for d in payload.decisions:
+        try:
+            item = _apply_decision(d.request_id, d.decision, payload.decided_by)
+        except HTTPException as e:
+            results.append({"request_id": d.request_id, "ok": False, "status_code": e.status_code, "error": e.detail})
+            continue
+        results.append({"request_id": d.request_id, "ok": True, "status": item["status"]})
+        if item["status"] == "APPROVED":
+            approved.append(item)
+
+    provisioning = _provisioning_enabled() and bool(approved)
+    if provisioning:
+        outcomes = _enqueue_grants(approved)
+        for r in results:
+            if r["request_id"] in outcomes:
+                r["provisioning"] = outcomes[r["request_id"]]
+
+    return {
+        "ok": all(r["ok"] for r in results),
+        "results": results,
+        "summary": {
+            "approved": len(approved),
+            "rejected": sum(1 for r in results if r.get("status") == "REJECTED"),
+            "failed": sum(1 for r in results if not r["ok"]),
+            "provisioning_enabled": _provisioning_enabled(),
+            "jobs": len({r["provisioning"]["job_id"] for r in results if "job_id" in r.get("provisioning", {})}),
+        },
+    }
@@ -0,0 +1,354 @@
+"""
+Storage de solicitudes de acceso.
+
+AccessRequestStore es la interfaz que usa access_requests.py; los filtros de
+listado se resuelven en el store (no en Python sobre todos los items), así que un
+backend Firestore / Cloud SQL implementa los mismos métodos con sus índices.
+
+- SQLiteAccessRequestStore (default): archivo local en WAL, compartible entre
+  workers de uvicorn en el mismo host. Índices:
+    (data_owner, status, created_at, id) -> bandeja del owner por estado
+    (data_owner, created_at, id)         -> bandeja del owner (todos los estados)
+    (status, created_at, id)             -> vista admin por estado
+    (requester_email, created_at, id)    -> "mis solicitudes" / chequeo de acceso
+    (created_at, id)                     -> vista admin sin filtros
+  Los totales por (data_owner, status) se mantienen en request_counts dentro de
+  la misma transacción que el insert/update: `total` no escanea la tabla.
+- MemoryAccessRequestStore: dict en proceso + listas ordenadas por (data_owner, status).
+
+Listados paginados por keyset sobre (created_at, id) descendente: `after` es la
+llave del último item de la página anterior.
+
+Config:
+- ACCESS_STORE=sqlite|memory
+- ACCESS_STORE_PATH=access_requests.db
+"""
+
+import bisect
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+FIELDS = (
+    "id",
+    "linked_resource",
+    "requester_email",
+    "access_level",
+    "reason",
+    "data_owner",
+    "status",
+    "created_at",
+    "decided_at",
+    "decided_by",
+    "decision",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS access_requests (
+    id              TEXT PRIMARY KEY,
+    linked_resource TEXT NOT NULL,
+    requester_email TEXT NOT NULL,
+    access_level    TEXT NOT NULL,
+    reason          TEXT NOT NULL,
+    data_owner      TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    created_at      TEXT NOT NULL,
+    decided_at      TEXT,
+    decided_by      TEXT,
+    decision        TEXT
+);
+CREATE INDEX IF NOT EXISTS ar_owner_status_created ON access_requests (data_owner, status, created_at, id);
+CREATE INDEX IF NOT EXISTS ar_owner_created ON access_requests (data_owner, created_at, id);
+CREATE INDEX IF NOT EXISTS ar_status_created ON access_requests (status, created_at, id);
+CREATE INDEX IF NOT EXISTS ar_created ON access_requests (created_at, id);
+CREATE INDEX IF NOT EXISTS ar_requester_created ON access_requests (requester_email, created_at, id);
+CREATE TABLE IF NOT EXISTS request_counts (
+    data_owner TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    n          INTEGER NOT NULL,
+    PRIMARY KEY (data_owner, status)
+);
+"""
+
+# (created_at, id): llave de orden y de cursor
+SortKey = Tuple[str, str]
+
+
+class AccessRequestStore(ABC):
+    """Interfaz: items como dicts con las llaves de FIELDS. Un backend sin algún método no se puede instanciar."""
+
+    @abstractmethod
+    def create(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update(self, request_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Aplica `changes` y retorna el item actualizado (None si no existe)."""
+        ...
+
+    @abstractmethod
+    def list(
+        self,
+        data_owner: Optional[str] = None,
+        status: Optional[str] = None,
+        requester_email: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[SortKey] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Items que cumplen los filtros, más nuevos primero (created_at, id desc),
+        estrictamente anteriores a `after` y como máximo `limit`.
+        """
+        ...
+
+    @abstractmethod
+    def count(
+        self,
+        data_owner: Optional[str] = None,
+        status: Optional[str] = None,
+        requester_email: Optional[str] = None,
+    ) -> int:
+        ...
+
+    @abstractmethod
+    def has_approved(self, requester_email: str, linked_resource: str) -> bool:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryAccessRequestStore(AccessRequestStore):
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._items: Dict[str, Dict[str, Any]] = {}
+        # (data_owner, status) -> [(created_at, id)] ascendente
+        self._index: Dict[Tuple[str, str], List[SortKey]] = {}
+
+    @staticmethod
+    def _key(item: Dict[str, Any]) -> SortKey:
+        return item["created_at"], item["id"]
+
+    def _index_add(self, item: Dict[str, Any]) -> None:
+        bisect.insort(self._index.setdefault((item["data_owner"], item["status"]), []), self._key(item))
+
+    def _index_remove(self, item: Dict[str, Any]) -> None:
+        keys = self._index.get((item["data_owner"], item["status"]), [])
+        i = bisect.bisect_left(keys, self._key(item))
+        if i < len(keys) and keys[i] == self._key(item):
+            del keys[i]
+
+    def create(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._items[item["id"]] = dict(item)
+            self._index_add(item)
+        return dict(item)
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(request_id)
+            return dict(item) if item else None
+
+    def update(self, request_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(request_id)
+            if item is None:
+                return None
+            self._index_remove(item)
+            item.update(changes)
+            self._index_add(item)
+            return dict(item)
+
+    def _lists(self, data_owner: Optional[str], status: Optional[str]) -> List[List[SortKey]]:
+        return [
+            keys
+            for (owner, st), keys in self._index.items()
+            if (data_owner is None or owner == data_owner) and (status is None or st == status)
+        ]
+
+    def list(
+        self,
+        data_owner: Optional[str] = None,
+        status: Optional[str] = None,
+        requester_email: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[SortKey] = None,
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            # cada lista ya está ordenada: se recorre hacia atrás desde `after` y se mezclan
+            def _desc(keys: List[SortKey]) -> Iterable[SortKey]:
+                end = len(keys) if after is None else bisect.bisect_left(keys, after)
+                return (keys[i] for i in range(end - 1, -1, -1))
+
+            merged = heapq.merge(*(_desc(k) for k in self._lists(data_owner, status)), reverse=True)
+            items = (self._items[rid] for _created, rid in merged)
+            if requester_email is not None:
+                items = (x for x in items if x["requester_email"] == requester_email)
+            return [dict(x) for x in itertools.islice(items, limit)]
+
+    def count(
+        self,
+        data_owner: Optional[str] = None,
+        status: Optional[str] = None,
+        requester_email: Optional[str] = None,
+    ) -> int:
+        with self._lock:
+            if requester_email is not None:
+                return sum(
+                    1
+                    for keys in self._lists(data_owner, status)
+                    for _created, rid in keys
+                    if self._items[rid]["requester_email"] == requester_email
+                )
+            return sum(len(keys) for keys in self._lists(data_owner, status))
+
+    def has_approved(self, requester_email: str, linked_resource: str) -> bool:
+        with self._lock:
+            return any(
+                x["status"] == "APPROVED"
+                and x["requester_email"] == requester_email
+                and x["linked_resource"] == linked_resource
+                for x in self._items.values()
+            )
+
+
+class SQLiteAccessRequestStore(AccessRequestStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        with self._lock, self._conn:
+            # DB creada antes de request_counts: se recalculan una vez
+            if self._conn.execute("SELECT COUNT(*) FROM request_counts").fetchone()[0] == 0:
+                self._conn.execute(
+                    "INSERT INTO request_counts (data_owner, status, n) "
+                    "SELECT data_owner, status, COUNT(*) FROM access_requests GROUP BY data_owner, status"
+                )
+
+    def _bump(self, data_owner: str, status: str, delta: int) -> None:
+        # Requiere self._lock tomado y transacción abierta
+        self._conn.execute(
+            "INSERT INTO request_counts (data_owner, status, n) VALUES (?, ?, ?) "
+            "ON CONFLICT(data_owner, status) DO UPDATE SET n = n + excluded.n",
+            (data_owner, status, delta),
+        )
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        return {k: row[k] for k in FIELDS} if row is not None else None
+
+    def create(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO access_requests ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                tuple(item.get(k) for k in FIELDS),
+            )
+            self._bump(item["data_owner"], item["status"], 1)
+        return dict(item)
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM access_requests WHERE id = ?", (request_id,)).fetchone()
+        return self._row(row)
+
+    def update(self, request_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        cols = [k for k in changes if k in FIELDS and k != "id"]
+        with self._lock, self._conn:
+            before = self._conn.execute(
+                "SELECT data_owner, status FROM access_requests WHERE id = ?", (request_id,)
+            ).fetchone()
+            if before is None:
+                return None
+            if cols:
+                self._conn.execute(
+                    f"UPDATE access_requests SET {', '.join(f'{k} = ?' for k in cols)} WHERE id = ?",
+                    (*(changes[k] for k in cols), request_id),
+                )
+            row = self._conn.execute("SELECT * FROM access_requests WHERE id = ?", (request_id,)).fetchone()
+            if (row["data_owner"], row["status"]) != (before["data_owner"], before["status"]):
+                self._bump(before["data_owner"], before["status"], -1)
+                self._bump(row["data_owner"], row["status"], 1)
+        return self._row(row)
+
+    @staticmethod
+    def _where(
+        data_owner: Optional[str],
+        status: Optional[str],
+        requester_email: Optional[str],
+    ) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for col, value in (("data_owner", data_owner), ("status", status), ("requester_email", requester_email)):
+            if value is not None:
+                clauses.append(f"{col} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def list(
+        self,
+        data_owner: Optional[str] = None,
+        status: Optional[str] = None,
+        requester_email: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[SortKey] = None,
+    ) -> List[Dict[str, Any]]:
+        where, params = self._where(data_owner, status, requester_email)
+        if after is not None:
+            # row value: el índice (…, created_at, id) busca directo la posición del cursor
+            where += (" AND " if where else " WHERE ") + "(created_at, id) < (?, ?)"
+            params += [after[0], after[1]]
+        sql = f"SELECT * FROM access_requests{where} ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row(r) for r in rows]
+
+    def count(
+        self,
+        data_owner: Optional[str] = None,
+        status: Optional[str] = None,
+        requester_email: Optional[str] = None,
+    ) -> int:
+        if requester_email is not None:
+            where, params = self._where(data_owner, status, requester_email)
+            with self._lock:
+                return self._conn.execute(f"SELECT COUNT(*) FROM access_requests{where}", params).fetchone()[0]
+        where, params = self._where(data_owner, status, None)
+        with self._lock:
+            return self._conn.execute(f"SELECT COALESCE(SUM(n), 0) FROM request_counts{where}", params).fetchone()[0]
+
+    def has_approved(self, requester_email: str, linked_resource: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM access_requests WHERE requester_email = ? AND linked_resource = ? "
+                "AND status = 'APPROVED' LIMIT 1",
+                (requester_email, linked_resource),
+            ).fetchone()
+        return row is not None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def store_from_env() -> AccessRequestStore:
+    kind = os.getenv("ACCESS_STORE", "sqlite").lower()
+    if kind == "sqlite":
+        return SQLiteAccessRequestStore(os.getenv("ACCESS_STORE_PATH", "access_requests.db"))
+    if kind == "memory":
+        return MemoryAccessRequestStore()
+    raise ValueError("Unsupported ACCESS_STORE. Use: sqlite | memory")
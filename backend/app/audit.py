@@ -1,42 +1,188 @@
-from fastapi import APIRouter, Query
-from typing import Any, Dict, List
+import base64
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
 from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+
+from app.audit_index import AuditQueryEngine
+from app.audit_sink import AuditWriter, writer_from_env
 
 router = APIRouter(tags=["audit"])
 
 # In-memory mock audit log (MVP)
-# En producción: escribir en BigQuery / Cloud Logging / PubSub + sink / Firestore
-_AUDIT: List[Dict[str, Any]] = [
-    {
-        "ts": datetime.now(timezone.utc).isoformat(),
-        "actor": "system",
-        "action": "BOOT",
-        "resource": "-",
-        "details": {"message": "Audit mock initialized"},
+# Persistencia: AUDIT_SINKS=segments,bigquery (ver audit_sink); el request solo encola.
+# Con segments, GET /audit consulta los segmentos indexados (ver audit_index).
+#
+# Ring buffer de capacidad fija: appendleft O(1) y el más viejo se descarta solo
+# (antes list.insert(0) movía los 5000 elementos en cada evento).
+# Registros compactos (ts epoch, actor, action, resource, details, seq); el dict y
+# el ts ISO se arman al leer, que es lo raro. seq se asigna bajo el lock: sigue el
+# orden del ring y desempata eventos con el mismo ts en el cursor de GET /audit.
+AUDIT_MAX_EVENTS = int(os.getenv("AUDIT_MAX_EVENTS", "5000"))
+
+_Record = Tuple[float, str, str, str, Dict[str, Any], int]
+
+_AUDIT: Deque[_Record] = deque(maxlen=AUDIT_MAX_EVENTS)
+# iterar un deque mientras otro thread hace appendleft lanza RuntimeError
+_AUDIT_LOCK = threading.Lock()
+_SEQ = itertools.count()
+
+_WRITER: Optional[AuditWriter] = None
+_ENGINE: Optional[AuditQueryEngine] = None
+
+
+def _to_item(rec: _Record) -> Dict[str, Any]:
+    ts, actor, action, resource, details, _seq = rec
+    return {
+        "ts": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+        "actor": actor,
+        "action": action,
+        "resource": resource,
+        "details": details,
     }
-]
 
 
-def audit_log(actor: str, action: str, resource: str, details: Dict[str, Any] = None) -> None:
-    _AUDIT.insert(
-        0,
-        {
-            "ts": datetime.now(timezone.utc).isoformat(),
-            "actor": actor,
-            "action": action,
-            "resource": resource,
-            "details": details or {},
-        },
-    )
-    # Limitar tamaño en memoria
-    if len(_AUDIT) > 5000:
-        del _AUDIT[5000:]
+def audit_log(actor: str, action: str, resource: str, details: Optional[Dict[str, Any]] = None) -> None:
+    with _AUDIT_LOCK:
+        rec = (time.time(), actor, action, resource, details or {}, next(_SEQ))
+        _AUDIT.appendleft(rec)
+    if _WRITER is not None:
+        _WRITER.submit(rec)
+
+
+def start_writer() -> Optional[AuditWriter]:
+    """Levanta el writer en background si hay sinks configurados (AUDIT_SINKS)."""
+    global _WRITER
+    _WRITER = writer_from_env(_to_item)
+    if _WRITER is not None:
+        _WRITER.start()
+    return _WRITER
+
+
+def stop_writer() -> None:
+    """Vacía lo pendiente a los sinks y cierra el segmento abierto."""
+    global _WRITER
+    writer, _WRITER = _WRITER, None
+    if writer is not None:
+        writer.stop()
+
+
+audit_log("system", "BOOT", "-", {"message": "Audit mock initialized"})
+
+
+def _parse_ts(value: Optional[str], name: str) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be ISO 8601 (e.g. 2026-01-31T12:00:00Z)")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _engine() -> Optional[AuditQueryEngine]:
+    """Motor sobre los segmentos si AUDIT_SINKS incluye segments (también sin writer, p.ej. réplicas)."""
+    global _ENGINE
+    if "segments" not in os.getenv("AUDIT_SINKS", "").lower():
+        return None
+    if _ENGINE is None:
+        _ENGINE = AuditQueryEngine(
+            os.getenv("AUDIT_DIR", "audit_segments"), int(os.getenv("AUDIT_INDEX_CACHE_SEGMENTS", "64"))
+        )
+    return _ENGINE
+
+
+def warm_index() -> None:
+    """Precarga en background los headers de los segmentos (con 10M eventos el primer query en frío tarda segundos)."""
+    engine = _engine()
+    if engine is not None:
+        threading.Thread(target=engine.warm, name="audit-index-warm", daemon=True).start()
+
+
+def _memory_query(
+    actor: Optional[str],
+    resource: Optional[str],
+    ts_from: Optional[float],
+    ts_to: Optional[float],
+    cursor: Optional[str],
+    limit: int,
+) -> Dict[str, Any]:
+    # cursor = seq del último item (posición en el ring, como (segmento, pos) en
+    # segments): eventos con el mismo ts en el borde de página no se saltan ni se
+    # repiten, y un salto del reloj no desordena la paginación
+    before: Optional[int] = None
+    if cursor:
+        try:
+            before = int(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["s"])
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    with _AUDIT_LOCK:
+        recs = list(_AUDIT)
+    out: List[_Record] = []
+    more = False
+    for rec in recs:
+        ts = rec[0]
+        if (before is not None and rec[5] >= before) or (ts_to is not None and ts > ts_to):
+            continue
+        if ts_from is not None and ts < ts_from:
+            break
+        if (actor is not None and rec[1] != actor) or (resource is not None and rec[3] != resource):
+            continue
+        if len(out) == limit:
+            more = True
+            break
+        out.append(rec)
+    next_cursor = None
+    if more:
+        next_cursor = base64.urlsafe_b64encode(json.dumps({"s": out[-1][5]}).encode("utf-8")).decode("ascii")
+    return {"items": [_to_item(r) for r in out], "total": len(recs), "next_cursor": next_cursor, "source": "memory"}
 
 
 @router.get("/audit")
-def list_audit(limit: int = Query(50, ge=1, le=500)) -> Dict[str, Any]:
+async def list_audit(
+    limit: int = Query(50, ge=1, le=500),
+    actor: Optional[str] = Query(default=None),
+    resource: Optional[str] = Query(default=None),
+    from_: Optional[str] = Query(default=None, alias="from", description="ISO 8601, inclusive"),
+    to: Optional[str] = Query(default=None, description="ISO 8601, inclusive"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor de la página anterior"),
+) -> Dict[str, Any]:
     """
-    MVP: retorna log en memoria.
-    Producción: filtrar por actor, resource, rango fechas y paginar.
+    Más reciente primero, filtrable por actor, resource y rango de fechas.
+    - AUDIT_SINKS con segments: consulta los segmentos persistidos vía índice
+      en el threadpool (lee disco), sin bloquear el event loop; los eventos aún en
+      la cola del writer aparecen tras el próximo flush
+    - sin segments (MVP): filtra el ring en memoria
+    - total: eventos en el log sin filtrar (ring o segmentos); con segments es
+      null mientras el índice se precarga al arrancar
     """
-    return {"items": _AUDIT[:limit], "total": len(_AUDIT)}
+    ts_from, ts_to = _parse_ts(from_, "from"), _parse_ts(to, "to")
+    engine = _engine()
+    if engine is None:
+        return _memory_query(actor, resource, ts_from, ts_to, cursor, limit)
+
+    def _query() -> Dict[str, Any]:
+        return {**engine.query(actor, resource, ts_from, ts_to, cursor, limit), "total": engine.total()}
+
+    try:
+        result = await run_in_threadpool(_query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**result, "source": "segments"}
+
+
+@router.get("/audit/writer")
+async def audit_writer_stats() -> Dict[str, Any]:
+    """Backpressure del writer: profundidad de cola, high water, descartados, stats por sink."""
+    if _WRITER is None:
+        return {"enabled": False}
+    return {"enabled": True, **_WRITER.stats()}
@@ -0,0 +1,468 @@
+"""
+Índice y motor de consultas sobre los segmentos de auditoría (audit_sink).
+
+Cada segmento (una hora UTC, append-only) tiene un sidecar `<segmento>.idx`
+que el sink escribe al cerrarlo:
+
+    línea 1: header JSON  {count, min_ts, max_ts, base_ms, monotonic, compress,
+                           actors: {actor: [start, n]}, resources: {...}, blocks}
+    resto:   arrays binarios (little-endian)
+             ts_ms    int32[count]    ms desde base_ms, en orden de escritura
+             actor    uint32[count]   posiciones agrupadas por actor (CSR, ver header)
+             resource uint32[count]   ídem por resource
+             block_off uint64[blocks+1]  offset de cada batch escrito (+ tamaño final)
+             block_first uint32[blocks]  primer evento de cada batch
+
+Una consulta descarta segmentos sin abrirlos: primero por la hora del nombre,
+después por min/max y por el diccionario de actores/resources del header. Solo
+en los que quedan se cargan los arrays (LRU) y se leen los batches que contienen
+los eventos pedidos (un batch gzip = un miembro gzip, se descomprime solo ese).
+
+Segmentos sin sidecar (el activo, o uno de un proceso que murió) se indexan
+leyendo el archivo, incrementalmente: solo lo agregado desde la última consulta.
+"""
+
+import base64
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SIDECAR_SUFFIX = ".idx"
+# batches de un segmento plano indexado por escaneo (sin sidecar)
+_SCAN_BLOCK_EVENTS = 500
+
+
+@lru_cache(maxsize=65536)
+def _segment_key(name: str) -> Tuple[str, int]:
+    from app.audit_sink import _SEGMENT_RE
+
+    m = _SEGMENT_RE.match(name)
+    return (m.group("hour"), int(m.group("seq"))) if m else ("", 0)
+
+
+@lru_cache(maxsize=65536)
+def _hour_bounds(hour: str) -> Tuple[float, float]:
+    start = datetime.strptime(hour + "+0000", "%Y%m%d%H%z").timestamp()
+    return start, start + 3600.0
+
+
+def _le(a: array) -> bytes:
+    if sys.byteorder != "little":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def _from_le(typecode: str, raw: bytes) -> array:
+    a = array(typecode)
+    a.frombytes(raw)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a
+
+
+def _contains(sorted_positions: array, i: int) -> bool:
+    k = bisect_left(sorted_positions, i)
+    return k < len(sorted_positions) and sorted_positions[k] == i
+
+
+def _epoch(ts: str) -> float:
+    return datetime.fromisoformat(ts).timestamp()
+
+
+class SegmentIndex:
+    """Índice de un segmento. Lo construye el sink (o un escaneo) y lo carga el motor."""
+
+    def __init__(self, name: str, compress: bool):
+        self.name = name
+        self.compress = compress
+        self.count = 0
+        self.base_ms: Optional[int] = None
+        self.min_ts: Optional[float] = None
+        self.max_ts: Optional[float] = None
+        self.monotonic = True
+        self.ts = array("i")
+        self.actors: Dict[str, array] = {}
+        self.resources: Dict[str, array] = {}
+        self.block_off = array("Q")
+        self.block_first = array("I")
+        self.end = 0  # bytes del segmento ya indexados
+
+    # -------- construcción --------
+
+    def start_block(self, offset: int) -> None:
+        self.block_off.append(offset)
+        self.block_first.append(self.count)
+
+    def add(self, ts: float, actor: str, resource: str) -> None:
+        if self.base_ms is None:
+            self.base_ms = int(ts // 3600) * 3_600_000
+        ms = int(round(ts * 1000)) - self.base_ms
+        if self.ts and ms < self.ts[-1]:
+            self.monotonic = False
+        self.ts.append(ms)
+        self.min_ts = ts if self.min_ts is None else min(self.min_ts, ts)
+        self.max_ts = ts if self.max_ts is None else max(self.max_ts, ts)
+        self.actors.setdefault(actor, array("I")).append(self.count)
+        self.resources.setdefault(resource, array("I")).append(self.count)
+        self.count += 1
+
+    def end_block(self, end: int) -> None:
+        self.end = end
+
+    # -------- sidecar --------
+
+    @staticmethod
+    def _csr(postings: Dict[str, array]) -> Tuple[Dict[str, List[int]], array]:
+        dictionary: Dict[str, List[int]] = {}
+        flat = array("I")
+        for key, pos in postings.items():
+            dictionary[key] = [len(flat), len(pos)]
+            flat.extend(pos)
+        return dictionary, flat
+
+    def header(self) -> Dict[str, Any]:
+        return {
+            "version": 1,
+            "count": self.count,
+            "min_ts": self.min_ts,
+            "max_ts": self.max_ts,
+            "base_ms": self.base_ms or 0,
+            "monotonic": self.monotonic,
+            "compress": self.compress,
+            "blocks": len(self.block_off),
+            "end": self.end,
+        }
+
+    def write_sidecar(self, path: str) -> None:
+        actors, actor_flat = self._csr(self.actors)
+        resources, resource_flat = self._csr(self.resources)
+        head = self.header() | {"actors": actors, "resources": resources}
+        offsets = array("Q", self.block_off)
+        offsets.append(self.end)
+        tmp = f"{path}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(head, separators=(",", ":")).encode("utf-8") + b"\n")
+            for a in (self.ts, actor_flat, resource_flat, offsets, self.block_first):
+                f.write(_le(a))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def read_header(path: str) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            return json.loads(f.readline())
+
+    @classmethod
+    def load_sidecar(cls, name: str, path: str) -> "SegmentIndex":
+        with open(path, "rb") as f:
+            head = json.loads(f.readline())
+            n, blocks = head["count"], head["blocks"]
+            ix = cls(name, head["compress"])
+            ix.count, ix.base_ms = n, head["base_ms"]
+            ix.min_ts, ix.max_ts, ix.monotonic, ix.end = head["min_ts"], head["max_ts"], head["monotonic"], head["end"]
+            ix.ts = _from_le("i", f.read(4 * n))
+            actor_flat = _from_le("I", f.read(4 * n))
+            resource_flat = _from_le("I", f.read(4 * n))
+            offsets = _from_le("Q", f.read(8 * (blocks + 1)))
+            ix.block_off = offsets[:blocks]
+            ix.block_first = _from_le("I", f.read(4 * blocks))
+        ix.actors = {k: actor_flat[s : s + c] for k, (s, c) in head["actors"].items()}
+        ix.resources = {k: resource_flat[s : s + c] for k, (s, c) in head["resources"].items()}
+        return ix
+
+    # -------- escaneo (segmentos sin sidecar) --------
+
+    def scan(self, path: str) -> None:
+        """Indexa lo agregado al archivo desde self.end (solo registros completos)."""
+        with open(path, "rb") as f:
+            f.seek(self.end)
+            data = f.read()
+        if not data:
+            return
+        if self.compress:
+            pos = 0
+            while pos < len(data):
+                d = zlib.decompressobj(wbits=31)
+                try:
+                    raw = d.decompress(data[pos:])
+                except zlib.error:
+                    break
+                if not d.eof:
+                    break  # miembro a medio escribir: se reintenta en la próxima consulta
+                size = len(data) - pos - len(d.unused_data)
+                self._scan_lines(self.end + pos, raw.splitlines())
+                pos += size
+            self.end += pos
+        else:
+            complete = data[: data.rfind(b"\n") + 1]
+            lines = complete.splitlines(keepends=True)
+            offset = self.end
+            for i in range(0, len(lines), _SCAN_BLOCK_EVENTS):
+                chunk = lines[i : i + _SCAN_BLOCK_EVENTS]
+                self._scan_lines(offset, chunk)
+                offset += sum(len(x) for x in chunk)
+            self.end += len(complete)
+
+    def _scan_lines(self, offset: int, lines: List[bytes]) -> None:
+        self.start_block(offset)
+        for line in lines:
+            if line.strip():
+                e = json.loads(line)
+                self.add(_epoch(e["ts"]), e.get("actor", ""), e.get("resource", ""))
+
+    # -------- consulta --------
+
+    def block_range(self, b: int) -> Tuple[int, int]:
+        end = self.block_off[b + 1] if b + 1 < len(self.block_off) else self.end
+        return self.block_off[b], end
+
+    def candidates(
+        self,
+        actor: Optional[str],
+        resource: Optional[str],
+        ts_from: Optional[float],
+        ts_to: Optional[float],
+        before: Optional[int],
+    ) -> Iterable[int]:
+        """Posiciones que cumplen los filtros, de la más nueva a la más vieja."""
+        lo_ms = None if ts_from is None else int(round(ts_from * 1000)) - (self.base_ms or 0)
+        hi_ms = None if ts_to is None else int(round(ts_to * 1000)) - (self.base_ms or 0)
+        stop = self.count if before is None else min(before, self.count)
+
+        lists = []
+        if actor is not None:
+            lists.append(self.actors.get(actor))
+        if resource is not None:
+            lists.append(self.resources.get(resource))
+        if any(p is None for p in lists):
+            return
+
+        if not lists:
+            start = 0
+            if self.monotonic:
+                if lo_ms is not None:
+                    start = bisect_left(self.ts, lo_ms)
+                if hi_ms is not None:
+                    stop = min(stop, bisect_right(self.ts, hi_ms))
+            positions: Iterable[int] = range(stop - 1, start - 1, -1)
+        else:
+            # se recorre la lista más corta; la otra (ordenada) se consulta por bisect
+            lists.sort(key=len)
+            base = lists[0]
+            end = bisect_left(base, stop)
+            positions = (base[k] for k in range(end - 1, -1, -1))
+            if len(lists) > 1:
+                other = lists[1]
+                positions = (i for i in positions if _contains(other, i))
+
+        ts = self.ts
+        for i in positions:
+            ms = ts[i]
+            if lo_ms is not None and ms < lo_ms:
+                if self.monotonic:
+                    return
+                continue
+            if hi_ms is not None and ms > hi_ms:
+                continue
+            yield i
+
+
+def encode_cursor(segment: str, position: int) -> str:
+    raw = json.dumps({"s": segment, "i": position}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """ValueError si el cursor no es válido."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(data["s"]), int(data["i"])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class AuditQueryEngine:
+    """Consulta los segmentos de un directorio, más nuevo primero, con paginación por cursor."""
+
+    def __init__(self, directory: str, cache_segments: int = 64):
+        self.directory = directory
+        self.cache_segments = cache_segments
+        # _lock cubre solo los dicts de abajo; el I/O (sidecars, bloques) va fuera
+        self._lock = threading.Lock()
+        # scan() agrega a un índice abierto: un escaneo a la vez
+        self._scan_lock = threading.Lock()
+        # segmento -> header del sidecar (inmutable una vez escrito: no se re-stat-ea)
+        self._headers: Dict[str, Dict[str, Any]] = {}
+        # segmento -> índice cargado (LRU); los escaneados viven aparte (crecen)
+        self._loaded: "OrderedDict[str, SegmentIndex]" = OrderedDict()
+        self._scanned: Dict[str, SegmentIndex] = {}
+        self._warmed = False
+
+    def _segments(self) -> List[str]:
+        try:
+            names = [n for n in os.listdir(self.directory) if _segment_key(n)[0]]
+        except FileNotFoundError:
+            return []
+        return sorted(names, key=_segment_key, reverse=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _header(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            head = self._headers.get(name)
+        if head is not None:
+            return head
+        try:
+            head = SegmentIndex.read_header(self._path(name) + SIDECAR_SUFFIX)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._headers[name] = head
+            # el segmento se cerró: lo escaneado se reemplaza por el sidecar
+            self._scanned.pop(name, None)
+        return head
+
+    def warm(self) -> int:
+        """Lee los headers de todos los sidecars para que el primer query no lo pague."""
+        n = 0
+        for name in self._segments():
+            n += self._header(name) is not None
+        self._warmed = True
+        return n
+
+    def total(self) -> Optional[int]:
+        """
+        Eventos persistidos (suma de los headers + lo escaneado de segmentos abiertos).
+        None hasta que warm() terminó: en frío leer todos los headers tarda segundos.
+        """
+        if not self._warmed:
+            return None
+        n = 0
+        for name in self._segments():
+            head = self._header(name)
+            n += head["count"] if head is not None else self._index(name, False).count
+        return n
+
+    def _index(self, name: str, has_sidecar: bool) -> SegmentIndex:
+        if has_sidecar:
+            with self._lock:
+                ix = self._loaded.get(name)
+                if ix is not None:
+                    self._loaded.move_to_end(name)
+                    return ix
+            # dos queries pueden cargar el mismo sidecar a la vez: gana el primero
+            ix = SegmentIndex.load_sidecar(name, self._path(name) + SIDECAR_SUFFIX)
+            with self._lock:
+                ix = self._loaded.setdefault(name, ix)
+                self._loaded.move_to_end(name)
+                while len(self._loaded) > self.cache_segments:
+                    self._loaded.popitem(last=False)
+            return ix
+        with self._scan_lock:
+            with self._lock:
+                ix = self._scanned.get(name)
+                if ix is None:
+                    ix = self._scanned[name] = SegmentIndex(name, name.endswith(".gz"))
+            ix.scan(self._path(name))
+        return ix
+
+    @staticmethod
+    def _skip(head: Dict[str, Any], actor, resource, ts_from, ts_to) -> bool:
+        if not head["count"]:
+            return True
+        if ts_from is not None and head["max_ts"] < ts_from:
+            return True
+        if ts_to is not None and head["min_ts"] > ts_to:
+            return True
+        if actor is not None and actor not in head["actors"]:
+            return True
+        if resource is not None and resource not in head["resources"]:
+            return True
+        return False
+
+    def _read_events(self, ix: SegmentIndex, positions: List[int]) -> Dict[int, Dict[str, Any]]:
+        by_block: Dict[int, List[int]] = {}
+        for i in positions:
+            by_block.setdefault(bisect_right(ix.block_first, i) - 1, []).append(i)
+        out: Dict[int, Dict[str, Any]] = {}
+        with open(self._path(ix.name), "rb") as f:
+            for b, wanted in by_block.items():
+                start, end = ix.block_range(b)
+                f.seek(start)
+                raw = f.read(end - start)
+                lines = (gzip.decompress(raw) if ix.compress else raw).splitlines()
+                first = ix.block_first[b]
+                for i in wanted:
+                    out[i] = json.loads(lines[i - first])
+        return out
+
+    def query(
+        self,
+        actor: Optional[str] = None,
+        resource: Optional[str] = None,
+        ts_from: Optional[float] = None,
+        ts_to: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        after: Optional[Tuple[str, int]] = decode_cursor(cursor) if cursor else None
+        hits: List[Tuple[SegmentIndex, int]] = []
+        stats = {"segments": 0, "skipped_by_name": 0, "skipped_by_index": 0, "searched": 0}
+        more = False
+
+        # sin self._lock: _header/_index lo toman solo para sus dicts
+        for name in self._segments():
+            stats["segments"] += 1
+            if after is not None and _segment_key(name) > _segment_key(after[0]):
+                continue
+            hour_start, hour_end = _hour_bounds(_segment_key(name)[0])
+            if (ts_from is not None and hour_end <= ts_from) or (ts_to is not None and hour_start > ts_to):
+                stats["skipped_by_name"] += 1
+                continue
+            head = self._header(name)
+            if head is not None and self._skip(head, actor, resource, ts_from, ts_to):
+                stats["skipped_by_index"] += 1
+                continue
+            ix = self._index(name, head is not None)
+            if head is None and self._skip(
+                ix.header() | {"actors": ix.actors, "resources": ix.resources}, actor, resource, ts_from, ts_to
+            ):
+                stats["skipped_by_index"] += 1
+                continue
+            stats["searched"] += 1
+            before = after[1] if after is not None and name == after[0] else None
+            for i in ix.candidates(actor, resource, ts_from, ts_to, before):
+                if len(hits) == limit:
+                    more = True
+                    break
+                hits.append((ix, i))
+            if more:
+                break
+
+        items: List[Dict[str, Any]] = []
+        by_segment: Dict[str, Tuple[SegmentIndex, List[int]]] = {}
+        for ix, i in hits:
+            by_segment.setdefault(ix.name, (ix, []))[1].append(i)
+        events = {name: self._read_events(ix, pos) for name, (ix, pos) in by_segment.items()}
+        for ix, i in hits:
+            items.append(events[ix.name][i])
+
+        last = hits[-1] if hits else None
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(last[0].name, last[1]) if more and last else None,
+            "stats": stats | {"took_ms": round((time.perf_counter() - t0) * 1000, 2)},
+        }
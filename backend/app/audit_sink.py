@@ -0,0 +1,354 @@
+"""
+Writer de auditoría en background: el request solo encola.
+
+audit_log -> cola acotada -> thread que arma batches (por tamaño o por tiempo)
+-> sinks. Si la cola está llena el evento se descarta del sink (sigue en el ring
+en memoria) y se cuenta en `dropped`: auditar nunca bloquea un request.
+
+Sinks:
+- segments: NDJSON append-only en AUDIT_DIR, un segmento por hora UTC (rota también
+  por tamaño); al cerrar cada segmento escribe su índice (ver audit_index). Con AUDIT_COMPRESS=gzip cada batch es un miembro gzip: un corte a
+  mitad de escritura pierde solo el último batch.
+- bigquery: streaming insert (tabledata.insertAll) con insertId para dedupe;
+  contra el fake (BIGQUERY_API_ENDPOINT) sirve de stand-in local.
+
+Config:
+- AUDIT_SINKS=segments,bigquery    vacío = solo memoria (MVP)
+- AUDIT_DIR=audit_segments
+- AUDIT_COMPRESS=none|gzip
+- AUDIT_SEGMENT_MAX_BYTES=67108864
+- AUDIT_FSYNC=false                fsync por batch
+- AUDIT_BQ_TABLE=project.dataset.audit_events
+- AUDIT_QUEUE_MAX=10000
+- AUDIT_BATCH_SIZE=500
+- AUDIT_FLUSH_INTERVAL_S=1
+"""
+
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.audit_index import SIDECAR_SUFFIX, SegmentIndex
+from app.upstream import track
+
+Event = Dict[str, Any]
+
+_SEGMENT_RE = re.compile(r"^audit-(?P<hour>\d{10})-(?P<seq>\d{6})\.ndjson(?P<gz>\.gz)?$")
+
+
+class AuditSink(ABC):
+    """Destino de batches de eventos. write() puede lanzar: el writer lo cuenta."""
+
+    name = "sink"
+
+    def __init__(self) -> None:
+        self.batches = 0
+        self.events = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.write_ms = 0.0
+
+    @abstractmethod
+    def write(self, events: List[Event]) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "events": self.events,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "avg_write_ms": round(self.write_ms / self.batches, 3) if self.batches else None,
+        }
+
+
+class SegmentFileSink(AuditSink):
+    """NDJSON append-only, un archivo por hora UTC (+ rotación por tamaño)."""
+
+    name = "segments"
+
+    def __init__(self, directory: str, compress: bool = False, max_segment_bytes: int = 64 * 2**20, fsync: bool = False):
+        super().__init__()
+        self.directory = directory
+        self.compress = compress
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync = fsync
+        self.bytes_written = 0
+        self.segments_closed = 0
+        os.makedirs(directory, exist_ok=True)
+        # Nunca se reabre un segmento de una corrida anterior: seq sigue desde el máximo
+        self._seq = max(
+            (int(m.group("seq")) for m in map(_SEGMENT_RE.match, os.listdir(directory)) if m), default=0
+        )
+        self._file = None
+        self._index: Optional[SegmentIndex] = None
+        self._hour = ""
+        self._size = 0
+
+    def _open(self, hour: str) -> None:
+        self._close_segment()
+        suffix = ".ndjson.gz" if self.compress else ".ndjson"
+        # O_EXCL: otro proceso con el mismo AUDIT_DIR (workers de uvicorn, otra
+        # instancia) pudo tomar ese seq; cada segmento tiene un solo escritor,
+        # si no el sidecar no cubre todas las líneas
+        while True:
+            self._seq += 1
+            name = f"audit-{hour}-{self._seq:06d}{suffix}"
+            try:
+                fd = os.open(os.path.join(self.directory, name), os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o600)
+                break
+            except FileExistsError:
+                continue
+        self._file = os.fdopen(fd, "ab")
+        self._index = SegmentIndex(name, self.compress)
+        self._hour = hour
+        self._size = 0
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            # sidecar con min/max + actores/resources: audit_index salta el segmento sin leerlo
+            self._index.write_sidecar(os.path.join(self.directory, self._index.name + SIDECAR_SUFFIX))
+            self.segments_closed += 1
+
+    def _append(self, hour: str, run: List[Tuple[Event, bytes]]) -> None:
+        if self._file is None or hour != self._hour or self._size >= self.max_segment_bytes:
+            self._open(hour)
+        raw = b"".join(line for _e, line in run)
+        data = gzip.compress(raw, 6) if self.compress else raw
+        self._file.write(data)
+        self._index.start_block(self._size)
+        for e, _line in run:
+            self._index.add(datetime.fromisoformat(e["ts"]).timestamp(), e.get("actor", ""), e.get("resource", ""))
+        self._size += len(data)
+        self._index.end_block(self._size)
+        self.bytes_written += len(data)
+
+    def write(self, events: List[Event]) -> None:
+        # partición = hora UTC del evento ("2026-10-18T15:..." -> "2026101815")
+        run_hour, run = "", []
+        for e in events:
+            hour = e["ts"][:13].replace("-", "").replace("T", "")
+            if run and hour != run_hour:
+                self._append(run_hour, run)
+                run = []
+            run_hour = hour
+            run.append((e, json.dumps(e, separators=(",", ":"), default=str).encode("utf-8") + b"\n"))
+        if run:
+            self._append(run_hour, run)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._close_segment()
+
+    def stats(self) -> Dict[str, Any]:
+        return super().stats() | {
+            "directory": self.directory,
+            "compress": self.compress,
+            "bytes_written": self.bytes_written,
+            "segments_closed": self.segments_closed,
+        }
+
+
+class BigQueryStreamingSink(AuditSink):
+    """tabledata.insertAll; reintenta el batch completo (insertId evita duplicados)."""
+
+    name = "bigquery"
+
+    def __init__(self, table_id: str, client: Any = None, max_retries: int = 3):
+        super().__init__()
+        self.table_id = table_id
+        self.max_retries = max_retries
+        self._client = client
+        self.retries = 0
+
+    def write(self, events: List[Event]) -> None:
+        if self._client is None:
+            from app.gcp_clients import bigquery_client
+
+            self._client = bigquery_client(self.table_id.split(".")[0])
+        rows = [{**e, "details": json.dumps(e.get("details") or {}, default=str)} for e in events]
+        row_ids = [e["event_id"] for e in events]
+        for attempt in range(self.max_retries + 1):
+            try:
+                with track("bigquery"):
+                    errors = self._client.insert_rows_json(self.table_id, rows, row_ids=row_ids)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if not errors:
+                    return
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"insertAll errors: {errors[:3]}")
+            self.retries += 1
+            time.sleep(min(0.1 * 2 ** attempt, 2.0))
+
+    def stats(self) -> Dict[str, Any]:
+        return super().stats() | {"table": self.table_id, "retries": self.retries}
+
+
+class AuditWriter:
+    """Cola acotada + thread que vacía en batches hacia los sinks."""
+
+    def __init__(
+        self,
+        sinks: List[AuditSink],
+        to_event: Callable[[Any], Event],
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval_s: float = 1.0,
+    ):
+        self.sinks = sinks
+        self.to_event = to_event
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._drop_lock = threading.Lock()
+        self._boot = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.batches = 0
+        self.high_water = 0
+        self.last_flush_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def submit(self, record: Any) -> bool:
+        """Camino del request: O(1), nunca bloquea. False = descartado por cola llena."""
+        try:
+            self._q.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+            return False
+
+    def _take_batch(self) -> List[Any]:
+        # espera el primer evento; desde ahí junta hasta batch_size o flush_interval_s
+        try:
+            batch: List[Any] = [self._q.get(timeout=self.flush_interval_s)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval_s
+        while len(batch) < self.batch_size and not self._stop.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._q.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Any]) -> None:
+        t0 = time.perf_counter()
+        events = []
+        for rec in batch:
+            self._seq += 1
+            e = self.to_event(rec)
+            e["event_id"] = f"{self._boot}-{self._seq}"
+            events.append(e)
+        for sink in self.sinks:
+            s0 = time.perf_counter()
+            try:
+                sink.write(events)
+            except Exception as ex:
+                sink.errors += 1
+                sink.last_error = f"{type(ex).__name__}: {ex}"
+                continue
+            sink.batches += 1
+            sink.events += len(events)
+            sink.write_ms += (time.perf_counter() - s0) * 1000
+        self.flushed += len(events)
+        self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - t0) * 1000
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.high_water = max(self.high_water, self._q.qsize())
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+
+    def stop(self) -> None:
+        """Corta el loop, vacía lo pendiente y cierra los sinks."""
+        self._stop.set()
+        self._thread.join(timeout=10)
+        pending: List[Any] = []
+        while True:
+            try:
+                pending.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        for i in range(0, len(pending), self.batch_size):
+            self._flush(pending[i : i + self.batch_size])
+        for sink in self.sinks:
+            sink.close()
+
+    def stats(self) -> Dict[str, Any]:
+        depth = self._q.qsize()
+        return {
+            "queue_depth": depth,
+            "queue_max": self.max_queue,
+            "queue_utilization": round(depth / self.max_queue, 4) if self.max_queue else None,
+            "high_water": max(self.high_water, depth),
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "avg_batch": round(self.flushed / self.batches, 1) if self.batches else None,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "sinks": {s.name: s.stats() for s in self.sinks},
+        }
+
+
+def sinks_from_env() -> List[AuditSink]:
+    sinks: List[AuditSink] = []
+    names = [n.strip().lower() for n in os.getenv("AUDIT_SINKS", "").split(",") if n.strip()]
+    if "segments" in names:
+        sinks.append(
+            SegmentFileSink(
+                os.getenv("AUDIT_DIR", "audit_segments"),
+                compress=os.getenv("AUDIT_COMPRESS", "none").lower() == "gzip",
+                max_segment_bytes=int(os.getenv("AUDIT_SEGMENT_MAX_BYTES", str(64 * 2**20))),
+                fsync=os.getenv("AUDIT_FSYNC", "false").lower() == "true",
+            )
+        )
+    if "bigquery" in names:
+        table = os.getenv("AUDIT_BQ_TABLE", "")
+        if table.count(".") != 2:
+            raise ValueError("AUDIT_BQ_TABLE must be project.dataset.table")
+        sinks.append(BigQueryStreamingSink(table))
+    return sinks
+
+
+def writer_from_env(to_event: Callable[[Any], Event]) -> Optional[AuditWriter]:
+    sinks = sinks_from_env()
+    if not sinks:
+        return None
+    return AuditWriter(
+        sinks,
+        to_event,
+        max_queue=int(os.getenv("AUDIT_QUEUE_MAX", "10000")),
+        batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "500")),
+        flush_interval_s=float(os.getenv("AUDIT_FLUSH_INTERVAL_S", "1")),
+    )
@@ -1,34 +1,514 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import datetime as dt
+import decimal
+import io
+import json
 import os
-from fastapi import APIRouter, Query
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from google.api_core.exceptions import NotFound
+from google.cloud.bigquery import SchemaField
+
+from app import upstream
+from app.auth import get_current_user
+from app.preview_cache import PreviewCache, compress, iter_decompressed
 
 router = APIRouter()
 
+# Tope de bytes por fila en el preview (aprox. JSON); las celdas que no caben se truncan
+PREVIEW_MAX_ROW_BYTES = int(os.getenv("PREVIEW_MAX_ROW_BYTES", "16384"))
+PREVIEW_MAX_ROWS = 100
+# format=ndjson|arrow: filas por página de tabledata.list (= por chunk) y tope de filas
+PREVIEW_STREAM_PAGE_ROWS = int(os.getenv("PREVIEW_STREAM_PAGE_ROWS", "1000"))
+PREVIEW_STREAM_MAX_ROWS = int(os.getenv("PREVIEW_STREAM_MAX_ROWS", "10000"))
+
+# Cache de previews (modo real): bodies comprimidos, LRU por bytes + spill opcional a disco
+_PREVIEW_CACHE = PreviewCache(
+    max_bytes=int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(64 * 2**20))),
+    spill_dir=os.getenv("PREVIEW_CACHE_SPILL_DIR", ""),
+    spill_max_bytes=int(os.getenv("PREVIEW_CACHE_SPILL_MAX_BYTES", str(512 * 2**20))),
+)
+# Un solo read a BigQuery por llave aunque lleguen varios clicks a la vez (format=json)
+_INFLIGHT: Dict[Any, "asyncio.Future[Tuple[str, bytes]]"] = {}
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+class PreviewRequestError(ValueError):
+    """linked_resource o columnas inválidas (400), distinto de errores de BigQuery."""
+
 def _is_mock() -> bool:
     return os.getenv("MOCK_MODE", "true").lower() in ("1", "true", "yes", "y")
 
+def _access_check_enabled() -> bool:
+    return os.getenv("PREVIEW_ACCESS_CHECK", "true").lower() in ("1", "true", "yes", "y")
+
+def _can_preview(actor: Dict[str, str], linked_resource: str) -> bool:
+    """
+    MVP: rol privilegiado (según app.auth) o solicitud APPROVED del actor sobre el recurso.
+    Producción: validar IAM real (testIamPermissions / tables.getData).
+    """
+    from app.access_requests import has_approved_request
+    from app.bq_schema import _is_approver
+
+    return _is_approver(actor["role"]) or has_approved_request(actor["email"], linked_resource)
+
+def _parse_columns(columns: Optional[str]) -> Optional[List[str]]:
+    # "a,b , c" -> ["a", "b", "c"]; vacío = todas las columnas
+    if not columns:
+        return None
+    names = [c.strip() for c in columns.split(",") if c.strip()]
+    return list(dict.fromkeys(names)) or None
+
+def _jsonable(v: Any) -> Any:
+    # Tipos que list_rows entrega y json no serializa (DATE/TIMESTAMP/NUMERIC/BYTES/RECORD)
+    if v is None or isinstance(v, (str, int, float, bool)):
+        return v
+    if isinstance(v, (dt.datetime, dt.date, dt.time)):
+        return v.isoformat()
+    if isinstance(v, decimal.Decimal):
+        return str(v)
+    if isinstance(v, bytes):
+        return base64.b64encode(v).decode("ascii")
+    if isinstance(v, dict):
+        return {k: _jsonable(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_jsonable(x) for x in v]
+    return str(v)
+
+def _cell_size(v: Any) -> int:
+    if v is None or isinstance(v, bool):
+        return 4
+    if isinstance(v, str):
+        return len(v.encode("utf-8")) + 2
+    if isinstance(v, (int, float)):
+        return len(repr(v))
+    return len(repr(v).encode("utf-8"))
+
+def _cap_row(values: List[Any], max_bytes: int) -> Tuple[List[Any], bool]:
+    """
+    Limita una fila a ~max_bytes: los strings que no caben se cortan, el resto
+    de celdas que no caben queda en None. Retorna (fila, truncada).
+    """
+    used = 0
+    truncated = False
+    out: List[Any] = []
+    for v in values:
+        size = _cell_size(v)
+        if used + size <= max_bytes:
+            out.append(v)
+            used += size
+            continue
+        truncated = True
+        room = max_bytes - used
+        if isinstance(v, str) and room > 8:
+            cut = v.encode("utf-8")[: room - 5].decode("utf-8", "ignore") + "…"
+            out.append(cut)
+            used += _cell_size(cut)
+        else:
+            out.append(None)
+            used += 4
+    return out, truncated
+
+def _parse_linked_resource(linked_resource: str) -> str:
+    from app.bq_schema import _parse_bigquery_linked_resource
+
+    try:
+        project, dataset, table = _parse_bigquery_linked_resource(linked_resource)
+    except ValueError as e:
+        raise PreviewRequestError(str(e))
+    return f"{project}.{dataset}.{table}"
+
+def _selected_fields(schema: Sequence[Any], columns: Optional[List[str]]) -> List[Any]:
+    if columns is None:
+        return list(schema)
+    by_name = {f.name: f for f in schema}
+    missing = [c for c in columns if c not in by_name]
+    if missing:
+        raise PreviewRequestError(f"Unknown columns: {', '.join(missing)}")
+    return [by_name[c] for c in columns]
+
+Page = List[Tuple[Any, ...]]
+
+def _open_rows(
+    linked_resource: str,
+    limit: int,
+    columns: Optional[List[str]],
+    page_size: int,
+) -> Tuple[List[SchemaField], Optional[int], Iterator[Any]]:
+    """get_table + list_rows: (campos proyectados, total de filas, iterador de páginas)."""
+    from app.gcp_clients import bigquery_client
+
+    table_ref = _parse_linked_resource(linked_resource)
+    client = bigquery_client()
+    t = client.get_table(table_ref)
+    fields = _selected_fields(t.schema, columns)
+    it = client.list_rows(t, selected_fields=fields, max_results=limit, page_size=page_size)
+    return fields, t.num_rows, iter(it.pages)
+
+def _next_page(pages: Iterator[Any]) -> Optional[Page]:
+    # Row -> tupla de valores (Row.values() hace deepcopy)
+    page = next(pages, None)
+    return None if page is None else [tuple(r) for r in page]
+
+_MOCK_FIELDS = [
+    SchemaField("row", "INT64"),
+    SchemaField("example_col_1", "STRING"),
+    SchemaField("example_col_2", "INT64"),
+]
+
+def _mock_pages(limit: int, page_size: int) -> Iterator[Page]:
+    for start in range(1, limit + 1, page_size):
+        yield [(i, "value", (i - 1) * 10) for i in range(start, min(limit, start + page_size - 1) + 1)]
+
+def preview_table(
+    linked_resource: str,
+    limit: int = 10,
+    columns: Optional[List[str]] = None,
+    max_row_bytes: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Primeras `limit` filas vía tabledata.list (list_rows): sin query job, sin bytes
+    facturados. `columns` proyecta (selectedFields); cada fila se acota a
+    max_row_bytes. Retorna el formato columnar {"columns", "rows"} del mock.
+    Bloqueante: desde handlers async usar upstream.run_blocking.
+    """
+    limit = max(1, min(int(limit), PREVIEW_MAX_ROWS))
+    max_row_bytes = PREVIEW_MAX_ROW_BYTES if max_row_bytes is None else max_row_bytes
+
+    # page_size=limit: una sola llamada a tabledata.list
+    fields, total_rows, pages = _open_rows(linked_resource, limit, columns, page_size=limit)
+    rows: List[List[Any]] = []
+    truncated_rows = 0
+    page = _next_page(pages)
+    while page is not None:
+        for values in page:
+            capped, truncated = _cap_row([_jsonable(v) for v in values], max_row_bytes)
+            truncated_rows += truncated
+            rows.append(capped)
+        page = _next_page(pages)
+
+    return {
+        "ok": True,
+        "mode": "bigquery",
+        "linked_resource": linked_resource,
+        "columns": [f.name for f in fields],
+        "rows": rows,
+        "total_rows": total_rows,
+        "truncated_rows": truncated_rows,
+        "max_row_bytes": max_row_bytes,
+    }
+
+# -----------------------------
+# Streaming (format=ndjson|arrow)
+# -----------------------------
+# Una página de tabledata.list por chunk: el primer chunk sale apenas llega la
+# primera página y en memoria vive una página a la vez (no una lista de dicts).
+
+def _ndjson_line(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def _ndjson_chunk(page: Page, max_row_bytes: int) -> Tuple[bytes, int]:
+    """Una línea JSON (array) por fila; retorna (bytes, filas truncadas)."""
+    lines = []
+    truncated_rows = 0
+    for values in page:
+        capped, truncated = _cap_row([_jsonable(v) for v in values], max_row_bytes)
+        truncated_rows += truncated
+        lines.append(_ndjson_line(capped))
+    lines.append("")
+    return "\n".join(lines).encode("utf-8"), truncated_rows
+
+def _arrow_type(pa: Any, f: SchemaField) -> Any:
+    if f.mode == "REPEATED" or f.field_type in ("RECORD", "STRUCT"):
+        return pa.string()  # anidados como JSON
+    return {
+        "STRING": pa.string(),
+        "INT64": pa.int64(),
+        "INTEGER": pa.int64(),
+        "FLOAT64": pa.float64(),
+        "FLOAT": pa.float64(),
+        "BOOL": pa.bool_(),
+        "BOOLEAN": pa.bool_(),
+        "NUMERIC": pa.decimal128(38, 9),
+        "BIGNUMERIC": pa.decimal256(76, 38),
+        "DATE": pa.date32(),
+        "DATETIME": pa.timestamp("us"),
+        "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+        "TIME": pa.time64("us"),
+        "BYTES": pa.binary(),
+    }.get(f.field_type, pa.string())
+
+def _cut_str(v: str, max_bytes: int) -> str:
+    raw = v.encode("utf-8")
+    if len(raw) <= max_bytes:
+        return v
+    return raw[: max(0, max_bytes - 3)].decode("utf-8", "ignore") + "…"
+
+def _arrow_column(pa: Any, typ: Any, values: Sequence[Any], max_bytes: int) -> Any:
+    if typ == pa.string():
+        values = [
+            None if v is None else _cut_str(v if isinstance(v, str) else _ndjson_line(_jsonable(v)), max_bytes)
+            for v in values
+        ]
+    elif typ == pa.binary():
+        values = [None if v is None else v[:max_bytes] for v in values]
+    return pa.array(values, type=typ)
+
+class _ArrowEncoder:
+    """
+    Arrow IPC stream: schema + un RecordBatch por página. En Arrow el tope de bytes
+    se aplica por celda string/bytes (el formato es columnar, no por fila).
+    """
+
+    def __init__(self, pa: Any, fields: List[SchemaField], max_bytes: int):
+        self.pa = pa
+        self.max_bytes = max_bytes
+        self.schema = pa.schema([pa.field(f.name, _arrow_type(pa, f)) for f in fields])
+        self._buf = io.BytesIO()
+        self._writer = pa.ipc.new_stream(self._buf, self.schema)
+
+    def _take(self) -> bytes:
+        out = self._buf.getvalue()
+        self._buf.seek(0)
+        self._buf.truncate()
+        return out
+
+    def header(self) -> bytes:
+        return self._take()
+
+    def batch(self, page: Page) -> bytes:
+        cols = list(zip(*page)) if page else [()] * len(self.schema)
+        arrays = [
+            _arrow_column(self.pa, self.schema.field(i).type, cols[i], self.max_bytes)
+            for i in range(len(self.schema))
+        ]
+        self._writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        return self._take()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._take()
+
+def _preview_http_error(e: Exception) -> HTTPException:
+    if isinstance(e, PreviewRequestError):
+        return HTTPException(status_code=400, detail=str(e))
+    if isinstance(e, upstream.UpstreamTimeout):
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, NotFound):
+        return HTTPException(status_code=404, detail=f"Failed to preview BigQuery table: {e}")
+    return HTTPException(status_code=500, detail=f"Failed to preview BigQuery table: {e}")
+
+async def _stream_preview(
+    linked_resource: str,
+    limit: int,
+    columns: Optional[List[str]],
+    fmt: str,
+    mock: bool,
+    cache_key: Any = None,
+) -> StreamingResponse:
+    pa = None
+    if fmt == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise HTTPException(status_code=406, detail="format=arrow requires pyarrow (pip install pyarrow)")
+
+    page_size = max(1, min(limit, PREVIEW_STREAM_PAGE_ROWS))
+    max_bytes = PREVIEW_MAX_ROW_BYTES
+
+    # Metadata + primera página antes de responder: los errores salen como 4xx/5xx
+    if mock:
+        fields, total_rows, pages = _MOCK_FIELDS, limit, _mock_pages(limit, page_size)
+        first = next(pages, None)
+    else:
+        try:
+            fields, total_rows, pages = await upstream.run_blocking(
+                "bigquery", _open_rows, linked_resource, limit, columns, page_size
+            )
+            first = await upstream.run_blocking("bigquery", _next_page, pages)
+        except Exception as e:
+            raise _preview_http_error(e)
+
+    async def _pages() -> AsyncIterator[Page]:
+        page = first
+        while page is not None:
+            yield page
+            if mock:
+                page = next(pages, None)
+            else:
+                page = await upstream.run_blocking("bigquery", _next_page, pages)
+
+    names = [f.name for f in fields]
+    complete = False  # solo un stream que terminó bien entra al cache
+
+    async def _ndjson() -> AsyncIterator[bytes]:
+        nonlocal complete
+        # 1ra línea {"columns", "total_rows"}, luego una fila (array) por línea, al final {"done", ...}
+        yield (_ndjson_line({"columns": names, "total_rows": total_rows}) + "\n").encode("utf-8")
+        rows = truncated_rows = 0
+        try:
+            async for page in _pages():
+                chunk, truncated = _ndjson_chunk(page, max_bytes)
+                rows += len(page)
+                truncated_rows += truncated
+                yield chunk
+        except Exception as e:
+            # ya se mandó 200: el error va como última línea
+            yield (_ndjson_line({"done": False, "error": str(e), "rows": rows}) + "\n").encode("utf-8")
+            return
+        yield (_ndjson_line({"done": True, "rows": rows, "truncated_rows": truncated_rows}) + "\n").encode("utf-8")
+        complete = True
+
+    async def _arrow() -> AsyncIterator[bytes]:
+        nonlocal complete
+        enc = _ArrowEncoder(pa, fields, max_bytes)
+        yield enc.header()
+        async for page in _pages():
+            yield enc.batch(page)
+        yield enc.close()
+        complete = True
+
+    async def _tee(body: AsyncIterator[bytes], media_type: str) -> AsyncIterator[bytes]:
+        # Comprime a medida que sale; si supera el tope por entrada deja de acumular
+        comp = zlib.compressobj(6)
+        parts: Optional[List[bytes]] = []
+        stored = raw = 0
+        async for chunk in body:
+            if parts is not None:
+                part = comp.compress(chunk)
+                parts.append(part)
+                stored += len(part)
+                raw += len(chunk)
+                if stored > _PREVIEW_CACHE.max_entry_bytes:
+                    parts = None
+            yield chunk
+        if parts is not None and complete:
+            parts.append(comp.flush())
+            await _PREVIEW_CACHE.aput(cache_key, media_type, b"".join(parts), raw_size=raw)
+
+    media_type = ARROW_MEDIA_TYPE if fmt == "arrow" else NDJSON_MEDIA_TYPE
+    body = _arrow() if fmt == "arrow" else _ndjson()
+    if cache_key is not None and _PREVIEW_CACHE.enabled:
+        body = _tee(body, media_type)
+    return StreamingResponse(body, media_type=media_type, headers={"X-Preview-Cache": "miss"})
+
+async def _preview_cache_key(
+    linked_resource: str,
+    columns: Optional[List[str]],
+    limit: int,
+    fmt: str,
+) -> Any:
+    """Llave por versión de la tabla: last_modified sale del cache de schema (revalidado por etag)."""
+    from app.bq_schema import _bq_client, _cached_table_schema
+
+    entry = await _cached_table_schema(_bq_client(), linked_resource)
+    version = entry["last_modified"].isoformat() if entry["last_modified"] else entry["etag"]
+    return (linked_resource, tuple(columns) if columns else None, limit, fmt, version)
+
+def _cached_response(media_type: str, blob: bytes) -> Response:
+    headers = {"X-Preview-Cache": "hit"}
+    if media_type == "application/json":
+        return Response(content=zlib.decompress(blob), media_type=media_type, headers=headers)
+    return StreamingResponse(iter_decompressed(blob), media_type=media_type, headers=headers)
+
+def _encode_json(payload: Any) -> Tuple[int, bytes]:
+    raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return len(raw), compress(raw)
+
+async def _json_preview(linked_resource: str, limit: int, columns: Optional[List[str]], key: Any) -> Response:
+    async def _load() -> Tuple[str, bytes]:
+        try:
+            payload = await upstream.run_blocking("bigquery", preview_table, linked_resource, limit, columns)
+        except Exception as e:
+            raise _preview_http_error(e)
+        # serializar + comprimir hasta max_entry_bytes no va en el event loop
+        raw_size, blob = await run_in_threadpool(_encode_json, payload)
+        await _PREVIEW_CACHE.aput(key, "application/json", blob, raw_size=raw_size)
+        return "application/json", blob
+
+    flight = _INFLIGHT.get(key)
+    if flight is None:
+        flight = _INFLIGHT[key] = asyncio.get_running_loop().create_future()
+        try:
+            flight.set_result(await _load())
+        except BaseException as e:
+            flight.set_exception(e)
+        finally:
+            _INFLIGHT.pop(key, None)
+        # el owner no cuenta como hit
+        media_type, blob = flight.result()
+        return Response(content=zlib.decompress(blob), media_type=media_type, headers={"X-Preview-Cache": "miss"})
+    return _cached_response(*(await asyncio.shield(flight)))
+
 @router.get("/assets/preview")
-def preview_asset(
+async def preview_asset(
+    request: Request,
     linked_resource: str = Query(..., description="e.g. bigquery://project.dataset.table"),
-    limit: int = Query(10, ge=1, le=100),
+    limit: int = Query(10, ge=1, le=PREVIEW_STREAM_MAX_ROWS),
+    columns: Optional[str] = Query(None, description="Proyección: col_a,col_b (default: todas)"),
+    format: str = Query("json", pattern="^(json|ndjson|arrow)$", description="json | ndjson | arrow (stream)"),
 ):
     """
     MVP:
     - En MOCK_MODE=true: retorna filas dummy.
-    - En producción: aquí iría BigQuery client + SELECT * LIMIT N (con controles).
+    - En modo real: tabledata.list (preview_table), columnar {"columns", "rows"}.
+    - format=ndjson|arrow: StreamingResponse por páginas (hasta PREVIEW_STREAM_MAX_ROWS filas).
+    - Modo real: permiso por request (PREVIEW_ACCESS_CHECK) y después cache compartido
+      por versión de tabla (PREVIEW_CACHE_*).
     """
+    if format == "json" and limit > PREVIEW_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"limit > {PREVIEW_MAX_ROWS} requires format=ndjson|arrow")
+
     if _is_mock():
+        if format != "json":
+            return await _stream_preview(linked_resource, limit, _parse_columns(columns), format, mock=True)
         rows = []
         for i in range(1, limit + 1):
             rows.append({"row": i, "example_col_1": "value", "example_col_2": (i - 1) * 10})
         return {"ok": True, "mode": "mock", "linked_resource": linked_resource, "rows": rows}
 
-    # Placeholder modo real (sin conectar GCP todavía)
-    return {
-        "ok": True,
-        "mode": "real_not_implemented",
-        "linked_resource": linked_resource,
-        "rows": [],
-        "message": "Preview real no implementado en este MVP. Usa MOCK_MODE=true.",
-    }
+    cols = _parse_columns(columns)
+    try:
+        _parse_linked_resource(linked_resource)
+    except PreviewRequestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # El permiso se valida en cada request, antes de tocar el cache: una entrada
+    # compartida nunca llega a quien no tiene acceso a la tabla. El rol sale de
+    # auth (email -> rol), no del X-User-Role que manda el cliente: 401/403 si no se conoce
+    if _access_check_enabled():
+        user = get_current_user(request.headers.get("x-user-email"))
+        if not _can_preview(user, linked_resource):
+            raise HTTPException(status_code=403, detail="No access to preview this resource")
+
+    key = await _preview_cache_key(linked_resource, cols, limit, format) if _PREVIEW_CACHE.enabled else None
+    if key is not None:
+        hit = await _PREVIEW_CACHE.aget(key)
+        if hit is not None:
+            return _cached_response(*hit)
+
+    if format != "json":
+        return await _stream_preview(linked_resource, limit, cols, format, mock=False, cache_key=key)
+    if key is None:
+        try:
+            return await upstream.run_blocking("bigquery", preview_table, linked_resource, limit, cols)
+        except Exception as e:
+            raise _preview_http_error(e)
+    return await _json_preview(linked_resource, limit, cols, key)
+
+@router.get("/assets/preview/cache")
+def preview_cache_stats():
+    return _PREVIEW_CACHE.stats()
+
+@router.delete("/assets/preview/cache")
+def clear_preview_cache():
+    _PREVIEW_CACHE.clear()
+    return {"ok": True}
@@ -1,10 +1,40 @@
+import asyncio
+import hashlib
+import os
+import time
+from email.utils import format_datetime
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
-from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 
+from app import upstream
+from app.gcp_clients import bigquery_client
+from app.mock_catalog import MOCK_SCHEMAS
+from app.ttl_cache import TTLCache
+
 router = APIRouter()
 
+# Tablas leídas en paralelo por POST /assets/schema:batch (además del límite por upstream)
+_BATCH_CONCURRENCY = int(os.getenv("SCHEMA_BATCH_CONCURRENCY", "8"))
+_BATCH_MAX_ITEMS = 100
+
+# Cache de metadata por tabla (project.dataset.table):
+# - SCHEMA_CACHE_TTL_S: tiempo que una entrada se sirve sin consultar BigQuery
+# - pasado el TTL se revalida pidiendo solo etag/lastModifiedTime; si no cambió se reutiliza
+# - SCHEMA_CACHE_MAX_AGE_S: tope de vida de una entrada (después se vuelve a leer completa)
+_SCHEMA_TTL_S = float(os.getenv("SCHEMA_CACHE_TTL_S", "60"))
+_SCHEMA_CACHE = TTLCache(
+    maxsize=int(os.getenv("SCHEMA_CACHE_MAXSIZE", "1024")),
+    ttl_s=float(os.getenv("SCHEMA_CACHE_MAX_AGE_S", "3600")),
+    name="bq_schema",
+)
+_SCHEMA_REVALIDATED = 0  # revalidaciones que no requirieron releer el schema
+
+# Los mismos linked_resource se repiten entre vistas: se parsean una vez
+@lru_cache(maxsize=4096)
 def _parse_bigquery_linked_resource(linked_resource: str) -> Tuple[str, str, str]:
     """
     linked_resource format (MVP):
@@ -19,8 +49,8 @@ def _parse_bigquery_linked_resource(linked_resource: str) -> Tuple[str, str, str
     return parts[0], parts[1], parts[2]
 
 def _bq_client() -> bigquery.Client:
-    # Usa ADC / GOOGLE_APPLICATION_CREDENTIALS
-    return bigquery.Client()
+    # Usa ADC / GOOGLE_APPLICATION_CREDENTIALS; cliente compartido del proceso
+    return bigquery_client()
 
 def _actor(req: Request) -> Dict[str, str]:
     # MVP: actor por headers (front)
@@ -34,42 +64,41 @@ def _is_approver(role: str) -> bool:
     role = (role or "").upper()
     return role in ("ADMIN", "DATA_OWNER", "DATA_STEWARD", "APPROVER")
 
-@router.get("/assets/schema")
-def get_schema(
-    request: Request,
-    linked_resource: str = Query(..., description="bigquery://project.dataset.table"),
-) -> Dict[str, Any]:
-    actor = _actor(request)
+def _is_mock(request: Request) -> bool:
+    # MOCK_MODE (default true, igual que preview) o header X-Mock: 1 por request
+    if os.getenv("MOCK_MODE", "true").lower() in ("1", "true", "yes", "y"):
+        return True
+    return _is_demo(request)
 
-    # MOCK MODE (si quieres demo sin GCP): header X-Mock: 1
-    if request.headers.get("x-mock", "0") == "1":
+def _is_demo(request: Request) -> bool:
+    return request.headers.get("x-mock", "0") == "1"
+
+def _mock_schema(linked_resource: str, demo: bool = False) -> Dict[str, Any]:
+    # MOCK_SCHEMAS o schema vacío (la UI no se rompe); columnas de ejemplo solo con X-Mock: 1 explícito
+    data = MOCK_SCHEMAS.get(linked_resource)
+    if data or not demo:
+        data = data or {"table_description": "—", "columns": []}
         return {
             "linked_resource": linked_resource,
-            "system": "BIGQUERY",
-            "table_description": "Mock description from catalog.",
-            "columns": [
-                {"name": "date", "type": "DATE", "mode": "NULLABLE", "description": "Fecha del movimiento"},
-                {"name": "store_id", "type": "STRING", "mode": "NULLABLE", "description": "Identificador tienda"},
-                {"name": "sku", "type": "STRING", "mode": "NULLABLE", "description": "Código producto"},
-                {"name": "sales_qty", "type": "INT64", "mode": "NULLABLE", "description": "Unidades vendidas"},
-            ],
-            "can_edit": _is_approver(actor["role"]),
-            "actor": actor,
+            "system": "BIGQUERY" if linked_resource.startswith("bigquery://") else "DATAPLEX",
+            **data,
+            "column_count": len(data.get("columns", [])),
         }
+    columns = [
+        {"name": "date", "type": "DATE", "mode": "NULLABLE", "description": "Fecha del movimiento"},
+        {"name": "store_id", "type": "STRING", "mode": "NULLABLE", "description": "Identificador tienda"},
+        {"name": "sku", "type": "STRING", "mode": "NULLABLE", "description": "Código producto"},
+        {"name": "sales_qty", "type": "INT64", "mode": "NULLABLE", "description": "Unidades vendidas"},
+    ]
+    return {
+        "linked_resource": linked_resource,
+        "system": "BIGQUERY",
+        "table_description": "Mock description from catalog.",
+        "columns": columns,
+        "column_count": len(columns),
+    }
 
-    try:
-        project, dataset, table = _parse_bigquery_linked_resource(linked_resource)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-    client = _bq_client()
-    table_ref = f"{project}.{dataset}.{table}"
-
-    try:
-        t = client.get_table(table_ref)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to read BigQuery table metadata: {e}")
-
+def _table_schema(linked_resource: str, t: bigquery.Table) -> Dict[str, Any]:
     cols: List[Dict[str, Any]] = []
     for f in t.schema:
         cols.append(
@@ -86,6 +115,159 @@ def get_schema(
         "system": "BIGQUERY",
         "table_description": t.description or "",
         "columns": cols,
+        "column_count": len(cols),
+    }
+
+async def _get_table(client: bigquery.Client, table_ref: str, action: str) -> bigquery.Table:
+    """get_table en el executor de upstreams (no bloquea el event loop)."""
+    try:
+        return await upstream.run_blocking("bigquery", client.get_table, table_ref)
+    except upstream.UpstreamTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=f"{action}: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{action}: {e}")
+
+def _table_version(client: bigquery.Client, project: str, dataset: str, table: str) -> Dict[str, Any]:
+    """
+    tables.get con partial response (fields=etag,lastModifiedTime): misma llamada
+    que get_table pero sin traer ni parsear el schema completo.
+    """
+    conn = getattr(client, "_connection", None)
+    if conn is None:
+        t = client.get_table(f"{project}.{dataset}.{table}")
+        return {"etag": t.etag}
+    return conn.api_request(
+        method="GET",
+        path=f"/projects/{project}/datasets/{dataset}/tables/{table}",
+        query_params={"fields": "etag,lastModifiedTime"},
+    )
+
+def _cache_entry(linked_resource: str, t: bigquery.Table) -> Dict[str, Any]:
+    return {
+        "etag": t.etag or "",
+        "last_modified": t.modified,
+        "schema": _table_schema(linked_resource, t),
+        "checked_at": time.monotonic(),
+    }
+
+async def _cached_table_schema(client: bigquery.Client, linked_resource: str) -> Dict[str, Any]:
+    """
+    Entrada de _SCHEMA_CACHE para linked_resource: fresca dentro del TTL; después
+    se revalida por etag y solo se relee la tabla completa si cambió.
+    Los errores de parseo/BigQuery salen como HTTPException.
+    """
+    global _SCHEMA_REVALIDATED
+    try:
+        project, dataset, table = _parse_bigquery_linked_resource(linked_resource)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    table_ref = f"{project}.{dataset}.{table}"
+
+    found, entry = _SCHEMA_CACHE.get(table_ref)
+    if found:
+        if time.monotonic() - entry["checked_at"] < _SCHEMA_TTL_S:
+            return entry
+        try:
+            current = await upstream.run_blocking("bigquery", _table_version, client, project, dataset, table)
+        except upstream.UpstreamTimeout as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except NotFound as e:
+            _SCHEMA_CACHE.invalidate(table_ref)
+            raise HTTPException(status_code=404, detail=f"Failed to read BigQuery table metadata: {e}")
+        except Exception:
+            current = {}
+        if entry["etag"] and current.get("etag") == entry["etag"]:
+            entry = {**entry, "checked_at": time.monotonic()}
+            _SCHEMA_CACHE.put(table_ref, entry)
+            _SCHEMA_REVALIDATED += 1
+            return entry
+
+    t = await _get_table(client, table_ref, "Failed to read BigQuery table metadata")
+    entry = _cache_entry(linked_resource, t)
+    _SCHEMA_CACHE.put(table_ref, entry)
+    return entry
+
+def _response_etag(table_etag: str, actor: Dict[str, str]) -> str:
+    # El body incluye actor (y can_edit, que sale del rol): el ETag cambia con la
+    # versión de la tabla y con quién pregunta
+    key = f"{table_etag}|{actor['email']}|{actor['role']}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (v.strip() for v in if_none_match.split(","))
+
+@router.get("/assets/schema")
+async def get_schema(
+    request: Request,
+    response: Response,
+    linked_resource: str = Query(..., description="bigquery://project.dataset.table"),
+) -> Any:
+    actor = _actor(request)
+    can_edit = _is_approver(actor["role"])
+
+    # MOCK MODE (demo sin GCP): MOCK_MODE=true o header X-Mock: 1
+    if _is_mock(request):
+        return {**_mock_schema(linked_resource, _is_demo(request)), "can_edit": can_edit, "actor": actor}
+
+    entry = await _cached_table_schema(_bq_client(), linked_resource)
+
+    # private: el body depende del actor; no-cache: el browser revalida con If-None-Match
+    headers = {"Cache-Control": "private, no-cache", "Vary": "X-User-Role, X-User-Email"}
+    if entry["etag"]:
+        headers["ETag"] = _response_etag(entry["etag"], actor)
+    if entry["last_modified"] is not None:
+        headers["Last-Modified"] = format_datetime(entry["last_modified"], usegmt=True)
+
+    if "ETag" in headers and _etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return {**entry["schema"], "can_edit": can_edit, "actor": actor}
+
+@router.get("/assets/schema/cache")
+def schema_cache_stats() -> Dict[str, Any]:
+    return {**_SCHEMA_CACHE.stats(), "fresh_ttl_s": _SCHEMA_TTL_S, "revalidated": _SCHEMA_REVALIDATED}
+
+class SchemaBatchRequest(BaseModel):
+    linked_resources: List[str] = Field(..., min_length=1, max_length=_BATCH_MAX_ITEMS)
+
+@router.post("/assets/schema:batch")
+async def get_schema_batch(request: Request, payload: SchemaBatchRequest) -> Dict[str, Any]:
+    """
+    Schema de varias tablas en un request (p.ej. conteo de columnas en una página de resultados).
+    - get_table concurrente con paralelismo acotado (SCHEMA_BATCH_CONCURRENCY)
+    - resultado parcial: cada item trae ok=True + schema, u ok=False + status/error
+    """
+    actor = _actor(request)
+    mock = _is_mock(request)
+    demo = _is_demo(request)
+    client = None if mock else _bq_client()
+    sem = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+    async def _one(linked_resource: str) -> Dict[str, Any]:
+        if mock:
+            return {"ok": True, **_mock_schema(linked_resource, demo)}
+        async with sem:
+            try:
+                entry = await _cached_table_schema(client, linked_resource)
+            except HTTPException as e:
+                return {"ok": False, "linked_resource": linked_resource, "status": e.status_code, "error": e.detail}
+        return {"ok": True, **entry["schema"]}
+
+    # dedup manteniendo el orden del request
+    unique = list(dict.fromkeys(payload.linked_resources))
+    results = await asyncio.gather(*(_one(lr) for lr in unique))
+
+    return {
+        "items": results,
+        "errors": sum(1 for r in results if not r["ok"]),
         "can_edit": _is_approver(actor["role"]),
         "actor": actor,
     }
@@ -100,13 +282,13 @@ class SchemaUpdateRequest(BaseModel):
     columns: List[ColumnUpdate] = Field(default_factory=list)
 
 @router.patch("/assets/schema")
-def update_schema(request: Request, payload: SchemaUpdateRequest) -> Dict[str, Any]:
+async def update_schema(request: Request, payload: SchemaUpdateRequest) -> Dict[str, Any]:
     actor = _actor(request)
     if not _is_approver(actor["role"]):
         raise HTTPException(status_code=403, detail="Not allowed to edit catalog metadata")
 
     # MOCK MODE
-    if request.headers.get("x-mock", "0") == "1":
+    if _is_mock(request):
         return {"ok": True, "mode": "mock", "updated_by": actor, "linked_resource": payload.linked_resource}
 
     try:
@@ -117,10 +299,7 @@ def update_schema(request: Request, payload: SchemaUpdateRequest) -> Dict[str, A
     client = _bq_client()
     table_ref = f"{project}.{dataset}.{table}"
 
-    try:
-        t = client.get_table(table_ref)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to load BigQuery table: {e}")
+    t = await _get_table(client, table_ref, "Failed to load BigQuery table")
 
     # Map updates by column name
     updates = {c.name: c.description for c in payload.columns}
@@ -150,9 +329,14 @@ def update_schema(request: Request, payload: SchemaUpdateRequest) -> Dict[str, A
 
     t.schema = new_schema
 
+    # Se invalida antes de escribir: si el update falla a medias, el próximo GET relee la tabla
+    _SCHEMA_CACHE.invalidate(table_ref)
     try:
-        client.update_table(t, ["schema", "description"])
+        updated = await upstream.run_blocking("bigquery", client.update_table, t, ["schema", "description"])
+    except upstream.UpstreamTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update BigQuery schema/description: {e}")
+    _SCHEMA_CACHE.put(table_ref, _cache_entry(payload.linked_resource, updated))
 
     return {"ok": True, "updated_by": actor, "linked_resource": payload.linked_resource}
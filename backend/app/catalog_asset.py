@@ -0,0 +1,109 @@
+"""
+Registro normalizado e inmutable de un asset del catálogo.
+
+Se construye una vez (desde MOCK_ASSETS o resultados del provider) y guarda los
+campos ya normalizados, así el hot path de /search no vuelve a llamar _norm ni
+a armar strings por asset.
+"""
+
+import sys
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple
+
+# (atributo normalizado, peso por token contenido) — ver gcp_catalog._score
+FIELD_WEIGHTS: Tuple[Tuple[str, float], ...] = (
+    ("display_name", 20),
+    ("domain", 8),
+    ("description", 6),
+    ("tags_text", 10),
+    ("system", 4),
+    ("type", 4),
+)
+EXACT_NAME_BONUS = 100
+ALL_TOKENS_BONUS = 12
+
+
+def norm(s: str) -> str:
+    return (s or "").strip().lower()
+
+
+# Valores de baja cardinalidad (system/type/domain/tags) se comparten entre registros
+_TAGSETS: Dict[Tuple[str, ...], FrozenSet[str]] = {}
+
+
+def _short(s: str) -> str:
+    return sys.intern(norm(s))
+
+
+class CatalogAsset:
+    """
+    raw:        dict original (es lo que devuelve la API)
+    tags:       frozenset de tags normalizados (filtros exactos)
+    tags_text:  tags normalizados unidos por espacio (match por substring)
+    haystack:   todos los campos buscables unidos (match "algún/todos los tokens")
+    """
+
+    __slots__ = (
+        "raw",
+        "display_name",
+        "description",
+        "domain",
+        "system",
+        "type",
+        "tags",
+        "tags_text",
+        "haystack",
+    )
+
+    def __init__(self, raw: Dict[str, Any]):
+        tag_list = tuple(_short(t) for t in (raw.get("tags") or []))
+        tags = _TAGSETS.get(tag_list)
+        if tags is None:
+            tags = _TAGSETS[tag_list] = frozenset(tag_list)
+
+        set_ = object.__setattr__
+        set_(self, "raw", raw)
+        set_(self, "display_name", norm(raw.get("display_name", "")))
+        set_(self, "description", norm(raw.get("description", "")))
+        set_(self, "domain", _short(raw.get("domain", "")))
+        set_(self, "system", _short(raw.get("system", "")))
+        set_(self, "type", _short(raw.get("type", "")))
+        set_(self, "tags", tags)
+        set_(self, "tags_text", " ".join(tag_list))
+        set_(
+            self,
+            "haystack",
+            " ".join([self.display_name, self.domain, self.description, self.tags_text, self.system, self.type]),
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("CatalogAsset is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("CatalogAsset is immutable")
+
+    def __repr__(self) -> str:
+        return f"CatalogAsset({self.display_name!r}, system={self.system!r}, type={self.type!r})"
+
+    def score(self, tokens: List[str]) -> float:
+        """Mismo ranking que gcp_catalog._score, sin normalizar nada por llamada."""
+        if not tokens:
+            return 0.0
+
+        score = 0.0
+        for t in tokens:
+            if not t:
+                continue
+            if self.display_name == t:
+                score += EXACT_NAME_BONUS
+            for attr, weight in FIELD_WEIGHTS:
+                if t in getattr(self, attr):
+                    score += weight
+
+        hay = self.haystack
+        if all(t in hay for t in tokens):
+            score += ALL_TOKENS_BONUS
+        return score
+
+
+def build_records(assets: Iterable[Dict[str, Any]]) -> List[CatalogAsset]:
+    return [CatalogAsset(a) for a in assets]
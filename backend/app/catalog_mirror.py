@@ -0,0 +1,279 @@
+"""
+Mirror local del catálogo (SQLite) con sync incremental en background.
+
+En vez de ir a Dataplex en cada query, un worker trae las entries cambiadas
+desde el último watermark (update_time), las guarda en SQLite (WAL) y, si hubo
+cambios, reconstruye el índice en memoria de /search (gcp_catalog.set_catalog).
+
+Config:
+- CATALOG_MIRROR=true              activa el mirror al levantar la app
+- CATALOG_MIRROR_SOURCE=fake|dataplex
+- CATALOG_MIRROR_PATH=catalog_mirror.db
+- CATALOG_MIRROR_REFRESH_S=300     intervalo del sync incremental
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi import APIRouter, HTTPException
+
+from app.upstream import track
+
+router = APIRouter(tags=["catalog"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    name        TEXT PRIMARY KEY,
+    update_time TEXT NOT NULL,
+    asset       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_update_time ON entries (update_time);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class DataplexSource:
+    """
+    Entries cambiadas en Dataplex vía search_entries con `updatetime>` (granularidad
+    de día); se filtra localmente por update_time exacto. Dataplex search no
+    reporta borrados: se limpian con sync(full=True).
+    """
+
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+
+    def changes_since(self, watermark: str = "") -> Iterator[Dict[str, Any]]:
+        from google.cloud import dataplex_v1
+
+        from app.catalog_provider import _normalize_entry
+        from app.gcp_clients import dataplex_client
+
+        query = f"updatetime>={watermark[:10]}" if watermark else "updatetime>1970-01-01"
+        req = dataplex_v1.SearchEntriesRequest(
+            page_size=500,
+            name=f"projects/{self.project_id}/locations/global",
+            scope=f"projects/{self.project_id}",
+            query=query,
+        )
+        # una llamada instrumentada por página: search_entries trae la primera,
+        # el pager pide cada siguiente al iterar
+        with track("dataplex"):
+            pages = dataplex_client().search_entries(req).pages
+            page = next(pages, None)
+        while page is not None:
+            for r in page.results:
+                e = r.dataplex_entry
+                update_time = e.update_time.strftime("%Y-%m-%dT%H:%M:%S.%fZ") if e.update_time else ""
+                if update_time and update_time <= watermark:
+                    continue
+                yield {"name": e.name, "update_time": update_time, "deleted": False, "asset": _normalize_entry(r)}
+            if not page.next_page_token:
+                break
+            with track("dataplex"):
+                page = next(pages, None)
+
+
+class CatalogMirror:
+    def __init__(self, path: str, source: Any):
+        self.path = path
+        self.source = source
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        self.last_sync: Dict[str, Any] = {}
+
+    def _state(self, key: str, default: str = "") -> str:
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @property
+    def watermark(self) -> str:
+        with self._lock:
+            return self._state("watermark")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def load_assets(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT asset FROM entries ORDER BY rowid").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def sync(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Trae cambios desde el watermark (o todo si full=True) y los aplica en una
+        transacción. Retorna contadores; `changed` > 0 significa que hay que
+        reconstruir el índice.
+        """
+        t0 = time.perf_counter()
+        watermark = "" if full else self.watermark
+        upserts = 0
+        deletes = 0
+        seen: List[str] = []
+        new_watermark = watermark
+
+        # Se consume el source fuera del lock (puede ser lento / remoto)
+        changes = list(self.source.changes_since(watermark))
+
+        with self._lock, self._conn:
+            for ch in changes:
+                if ch.get("deleted"):
+                    deletes += self._conn.execute("DELETE FROM entries WHERE name = ?", (ch["name"],)).rowcount
+                else:
+                    self._conn.execute(
+                        "INSERT INTO entries (name, update_time, asset) VALUES (?, ?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET update_time = excluded.update_time, asset = excluded.asset",
+                        (ch["name"], ch["update_time"], json.dumps(ch["asset"], ensure_ascii=False)),
+                    )
+                    upserts += 1
+                    seen.append(ch["name"])
+                if ch["update_time"] > new_watermark:
+                    new_watermark = ch["update_time"]
+
+            if full:
+                # Lo que no vino en un full sync ya no existe en el origen
+                self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (name TEXT PRIMARY KEY)")
+                self._conn.execute("DELETE FROM seen")
+                self._conn.executemany("INSERT OR IGNORE INTO seen (name) VALUES (?)", ((n,) for n in seen))
+                deletes += self._conn.execute(
+                    "DELETE FROM entries WHERE name NOT IN (SELECT name FROM seen)"
+                ).rowcount
+
+            self._conn.execute(
+                "INSERT INTO sync_state (key, value) VALUES ('watermark', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (new_watermark,),
+            )
+
+        self.last_sync = {
+            "full": full,
+            "upserts": upserts,
+            "deletes": deletes,
+            "changed": upserts + deletes,
+            "watermark": new_watermark,
+            "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "at": time.time(),
+        }
+        return self.last_sync
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MirrorSyncWorker:
+    """Thread que corre mirror.sync() cada `interval_s` y llama on_change(assets) si hubo cambios."""
+
+    def __init__(
+        self,
+        mirror: CatalogMirror,
+        on_change: Callable[[List[Dict[str, Any]]], None],
+        interval_s: float = 300.0,
+    ):
+        self.mirror = mirror
+        self.on_change = on_change
+        self.interval_s = interval_s
+        self.last_error: Optional[str] = None
+        self._sync_lock = threading.Lock()  # worker y POST /catalog/mirror/sync no se pisan
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="catalog-mirror-sync", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def trigger(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+
+    def sync_now(self, full: bool = False) -> Dict[str, Any]:
+        with self._sync_lock:
+            result = self.mirror.sync(full=full)
+            if result["changed"]:
+                self.on_change(self.mirror.load_assets())
+            return result
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync_now()
+                self.last_error = None
+            except Exception as e:  # el worker no debe morir por un error del source
+                self.last_error = str(e)
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+
+_WORKER: Optional[MirrorSyncWorker] = None
+
+
+def _truthy(v: str) -> bool:
+    return v.lower() in ("1", "true", "yes", "y")
+
+
+def start_from_env(on_change: Callable[[List[Dict[str, Any]]], None]) -> Optional[MirrorSyncWorker]:
+    """Levanta mirror + worker si CATALOG_MIRROR=true. Sirve lo que ya hay en disco de inmediato."""
+    global _WORKER
+    if not _truthy(os.getenv("CATALOG_MIRROR", "false")):
+        return None
+
+    source_kind = os.getenv("CATALOG_MIRROR_SOURCE", "fake").lower()
+    if source_kind == "fake":
+        from app.fake_dataplex import FakeDataplexSource
+
+        source: Any = FakeDataplexSource()
+    elif source_kind == "dataplex":
+        source = DataplexSource(os.getenv("GOOGLE_CLOUD_PROJECT", "your-gcp-project-id"))
+    else:
+        raise ValueError("Unsupported CATALOG_MIRROR_SOURCE. Use: fake | dataplex")
+
+    mirror = CatalogMirror(os.getenv("CATALOG_MIRROR_PATH", "catalog_mirror.db"), source)
+    if mirror.count():
+        on_change(mirror.load_assets())
+
+    _WORKER = MirrorSyncWorker(mirror, on_change, float(os.getenv("CATALOG_MIRROR_REFRESH_S", "300")))
+    _WORKER.start()
+    return _WORKER
+
+
+def stop() -> None:
+    global _WORKER
+    if _WORKER is not None:
+        _WORKER.stop()
+        _WORKER.mirror.close()
+        _WORKER = None
+
+
+@router.get("/catalog/mirror")
+def mirror_status() -> Dict[str, Any]:
+    if _WORKER is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "entries": _WORKER.mirror.count(),
+        "watermark": _WORKER.mirror.watermark,
+        "last_sync": _WORKER.mirror.last_sync,
+        "last_error": _WORKER.last_error,
+    }
+
+
+@router.post("/catalog/mirror/sync")
+def mirror_sync(full: bool = False) -> Dict[str, Any]:
+    if _WORKER is None:
+        raise HTTPException(status_code=409, detail="Catalog mirror disabled (CATALOG_MIRROR=false)")
+    return _WORKER.sync_now(full=full)
@@ -1,5 +1,16 @@
+import base64
+import json
 import os
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app import upstream
+from app.auth import get_current_user, require_role
+from app.gcp_clients import dataplex_client
+from app.ttl_cache import TTLCache
+
+router = APIRouter(tags=["catalog"])
 
 # Provider interface: returns a list of "assets"
 # Asset format (normalized):
@@ -31,7 +42,68 @@ def _mock_search(q: str, page_size: int) -> List[Dict]:
     return items[:page_size]
 
 
-def _dataplex_search(project_id: str, query: str, page_size: int) -> List[Dict]:
+def _normalize_entry(r: Any) -> Dict:
+    e = r.dataplex_entry
+    # best-effort normalization
+    display_name = getattr(e, "display_name", "") or (e.name.split("/")[-1] if e.name else "entry")
+    desc = getattr(e, "description", "") or ""
+    linked = getattr(e, "linked_resource", "") or ""
+    etype = getattr(e, "entry_type", "") or "ENTRY"
+    system = "DATAPLEX"
+
+    # If linked resource looks like BigQuery, label it
+    if "bigquery" in linked.lower():
+        system = "BIGQUERY"
+
+    return {
+        "display_name": display_name,
+        "description": desc,
+        "linked_resource": linked or e.name,
+        "system": system,
+        "type": etype,
+    }
+
+
+# Continuation token propio: (page_token de Dataplex, offset dentro de esa página).
+# Los tokens de Dataplex son por página; el offset permite cortar a mitad de página.
+def _encode_page_token(dataplex_token: str, offset: int) -> str:
+    raw = json.dumps({"p": dataplex_token, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_page_token(token: Optional[str]) -> Tuple[str, int]:
+    if not token:
+        return "", 0
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return str(data["p"]), int(data["o"])
+    except Exception:
+        raise ValueError("Invalid page_token")
+
+
+def _iter_dataplex_results(
+    client: Any, request: Any, skip: int = 0
+) -> Iterator[Tuple[str, Any, int, Any]]:
+    """
+    Genera (page_token, página, índice, resultado) en orden, pidiendo la
+    siguiente página a Dataplex solo cuando el consumidor la necesita.
+    """
+    token = request.page_token
+    for page in client.search_entries(request).pages:
+        for i, r in enumerate(page.results):
+            if skip:
+                skip -= 1
+                continue
+            yield token, page, i, r
+        skip = 0
+        token = page.next_page_token
+        if not token:
+            return
+
+
+def _dataplex_search_page(
+    project_id: str, query: str, page_size: int, page_token: Optional[str] = None
+) -> Dict[str, Any]:
     # Dataplex Universal Catalog search sample uses:
     # name=f"projects/{project_id}/locations/global"
     # scope=f"projects/{project_id}"
@@ -40,50 +112,135 @@ def _dataplex_search(project_id: str, query: str, page_size: int) -> List[Dict]:
 
     from google.cloud import dataplex_v1
 
-    with dataplex_v1.CatalogServiceClient() as client:
-        req = dataplex_v1.SearchEntriesRequest(
-            page_size=page_size,
-            name=f"projects/{project_id}/locations/global",
-            scope=f"projects/{project_id}",
-            query=query,
-        )
-        resp = client.search_entries(req)
-
-        # resp is iterable (paged); results contain dataplex_entry
-        items: List[Dict] = []
-        for r in resp:
-            e = r.dataplex_entry
-            # best-effort normalization
-            display_name = getattr(e, "display_name", "") or (e.name.split("/")[-1] if e.name else "entry")
-            desc = getattr(e, "description", "") or ""
-            linked = getattr(e, "linked_resource", "") or ""
-            etype = getattr(e, "entry_type", "") or "ENTRY"
-            system = "DATAPLEX"
-
-            # If linked resource looks like BigQuery, label it
-            if "bigquery" in linked.lower():
-                system = "BIGQUERY"
-
-            items.append(
-                {
-                    "display_name": display_name,
-                    "description": desc,
-                    "linked_resource": linked or e.name,
-                    "system": system,
-                    "type": etype,
-                }
-            )
-        return items
+    start_token, offset = _decode_page_token(page_token)
 
+    # Cliente compartido del proceso (app/gcp_clients.py): sin setup de canal por request
+    client = dataplex_client()
+    req = dataplex_v1.SearchEntriesRequest(
+        page_size=page_size,
+        page_token=start_token,
+        name=f"projects/{project_id}/locations/global",
+        scope=f"projects/{project_id}",
+        query=query,
+    )
 
-def search_assets(q: str, page_size: int = 20) -> List[Dict]:
-    provider = os.getenv("CATALOG_PROVIDER", "mock").lower()
-    project = os.getenv("GOOGLE_CLOUD_PROJECT", "your-gcp-project-id")
+    # Pipeline lazy: se normaliza entrada por entrada y se deja de paginar apenas
+    # hay page_size items (memoria acotada a una página, sin importar lo amplia que sea la query)
+    items: List[Dict] = []
+    next_token: Optional[str] = None
+    results = _iter_dataplex_results(client, req, skip=offset)
+    for token, page, i, r in results:
+        items.append(_normalize_entry(r))
+        if len(items) < page_size:
+            continue
+        # Continuación sin pedir otra página: resto de esta página o la siguiente
+        if i + 1 < len(page.results):
+            next_token = _encode_page_token(token, i + 1)
+        elif page.next_page_token:
+            next_token = _encode_page_token(page.next_page_token, 0)
+        break
+    results.close()
+
+    return {"items": items, "next_page_token": next_token}
+
+
+def _dataplex_search(project_id: str, query: str, page_size: int) -> List[Dict]:
+    return _dataplex_search_page(project_id, query, page_size)["items"]
+
+
+# Cache de resultados por (provider, project, query normalizada, page_size, page_token).
+# Los usuarios repiten las mismas búsquedas ("sales", "inventory"): evitamos el round trip a Dataplex.
+# CATALOG_CACHE_MAXSIZE=0 o CATALOG_CACHE_TTL_S=0 desactivan el cache.
+_CACHE = TTLCache(
+    maxsize=int(os.getenv("CATALOG_CACHE_MAXSIZE", "512")),
+    ttl_s=float(os.getenv("CATALOG_CACHE_TTL_S", "300")),
+    name="catalog_search",
+)
 
+
+def _normalize_query(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+
+def _search_uncached(
+    provider: str, project: str, q: str, page_size: int, page_token: Optional[str]
+) -> Dict[str, Any]:
     if provider == "mock":
-        return _mock_search(q, page_size)
+        return {"items": _mock_search(q, page_size), "next_page_token": None}
 
     if provider == "dataplex":
-        return _dataplex_search(project, q, page_size)
+        return _dataplex_search_page(project, q, page_size, page_token)
 
     raise ValueError("Unsupported CATALOG_PROVIDER. Use: mock | dataplex")
+
+
+def _cache_key(q: str, page_size: int, page_token: Optional[str] = None):
+    provider = os.getenv("CATALOG_PROVIDER", "mock").lower()
+    project = os.getenv("GOOGLE_CLOUD_PROJECT", "your-gcp-project-id")
+    return provider, project, _normalize_query(q), page_size, page_token or None
+
+
+def search_assets_page(q: str, page_size: int = 20, page_token: Optional[str] = None) -> Dict[str, Any]:
+    """{"items": [...], "next_page_token": str | None}"""
+    key = _cache_key(q, page_size, page_token)
+    # la llave va normalizada; al provider le llega el q original (en Dataplex
+    # las mayúsculas importan: OR/AND/NOT, qualifiers)
+    page = _CACHE.get_or_load(key, lambda: _search_uncached(key[0], key[1], q, page_size, key[4]))
+    # copia de la lista: el caller puede reordenar/filtrar sin tocar el cache
+    return {"items": list(page["items"]), "next_page_token": page["next_page_token"]}
+
+
+def search_assets(q: str, page_size: int = 20) -> List[Dict]:
+    return search_assets_page(q, page_size)["items"]
+
+
+async def search_assets_page_async(
+    q: str,
+    page_size: int = 20,
+    page_token: Optional[str] = None,
+    timeout_s: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Igual que search_assets_page, para handlers async: un hit del cache se resuelve
+    en el event loop; un miss va al executor de upstreams (límite de
+    concurrencia + timeout, ver app/upstream.py) sin bloquear el loop.
+    """
+    found, page = _CACHE.get(_cache_key(q, page_size, page_token), record_miss=False)
+    if found:
+        return {"items": list(page["items"]), "next_page_token": page["next_page_token"]}
+    return await upstream.run_blocking(
+        "dataplex", search_assets_page, q, page_size, page_token, timeout_s=timeout_s
+    )
+
+
+async def search_assets_async(q: str, page_size: int = 20, timeout_s: Optional[float] = None) -> List[Dict]:
+    return (await search_assets_page_async(q, page_size, timeout_s=timeout_s))["items"]
+
+
+@router.get("/catalog/search")
+async def catalog_search(
+    q: str = Query(default="", description="Search text"),
+    page_size: int = Query(default=20, ge=1, le=200),
+    page_token: Optional[str] = Query(default=None, description="next_page_token de la página anterior"),
+) -> Dict[str, Any]:
+    """Búsqueda directa en el provider configurado (CATALOG_PROVIDER=mock|dataplex)."""
+    try:
+        page = await search_assets_page_async(q, page_size, page_token)
+    except upstream.UpstreamTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": page["items"], "total": len(page["items"]), "next_page_token": page["next_page_token"]}
+
+
+@router.get("/catalog/cache")
+def catalog_cache_stats() -> Dict[str, Any]:
+    """Contadores del cache de búsquedas del provider (hits/misses/evictions/...)."""
+    return _CACHE.stats()
+
+
+@router.delete("/catalog/cache")
+def catalog_cache_clear(user: Dict[str, str] = Depends(get_current_user)) -> Dict[str, Any]:
+    require_role(user, ["ADMIN"])
+    _CACHE.clear()
+    return {"ok": True}
@@ -0,0 +1,307 @@
+"""
+Fake BigQuery REST (PUBLIC SAFE, solo para desarrollo/benchmarks offline).
+
+Sirve tables.get y tabledata.list (filas sintéticas deterministas según el tipo
+de cada columna) a partir de MOCK_SCHEMAS, datasets.get/patch (access entries
+con etag e If-Match -> 412), tables getIamPolicy/setIamPolicy (etag de la
+policy -> 409) y tabledata.insertAll (dedupe por insertId) para que google-cloud-bigquery funcione sin GCP:
+
+    cd backend && python -m app.fake_bigquery --port 9050
+    BIGQUERY_API_ENDPOINT=http://127.0.0.1:9050 uvicorn app.main:app
+
+`handshake_ms` simula el costo de abrir una conexión nueva (TLS + auth) para que
+los benchmarks muestren la diferencia entre clientes por request y reutilizados.
+"""
+
+import argparse
+import base64
+import json
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from app.mock_catalog import MOCK_SCHEMAS
+
+_TABLE_RE = re.compile(r"^/bigquery/v2/projects/([^/]+)/datasets/([^/]+)/tables/([^/?]+)")
+_DATA_RE = re.compile(r"^/bigquery/v2/projects/([^/]+)/datasets/([^/]+)/tables/([^/?]+)/data(?:\?|$)")
+_IAM_RE = re.compile(r"^/bigquery/v2/projects/([^/]+)/datasets/([^/]+)/tables/([^/?:]+):(getIamPolicy|setIamPolicy)")
+_INSERT_RE = re.compile(r"^/bigquery/v2/projects/([^/]+)/datasets/([^/]+)/tables/([^/?]+)/insertAll(?:\?|$)")
+_DATASET_RE = re.compile(r"^/bigquery/v2/projects/([^/]+)/datasets/([^/?]+)(?:\?|$)")
+_DEFAULT_NUM_ROWS = 1000
+
+
+def _tables() -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    out = {}
+    for linked, data in MOCK_SCHEMAS.items():
+        if not linked.startswith("bigquery://"):
+            continue
+        project, dataset, table = linked.replace("bigquery://", "", 1).split(".")
+        out[(project, dataset, table)] = data
+    return out
+
+
+def _table_resource(project: str, dataset: str, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "kind": "bigquery#table",
+        "id": f"{project}:{dataset}.{table}",
+        "etag": f"etag-{project}.{dataset}.{table}",
+        "tableReference": {"projectId": project, "datasetId": dataset, "tableId": table},
+        "type": "TABLE",
+        "description": data.get("table_description", ""),
+        "lastModifiedTime": "1767225600000",
+        "numRows": str(data.get("num_rows", _DEFAULT_NUM_ROWS)),
+        "schema": {
+            "fields": [
+                {
+                    "name": c["name"],
+                    "type": c["type"],
+                    "mode": c.get("mode", "NULLABLE"),
+                    "description": c.get("description", ""),
+                }
+                for c in data.get("columns", [])
+            ]
+        },
+    }
+
+
+def _cell(field_type: str, name: str, i: int) -> Optional[str]:
+    # Valores en el formato JSON de tabledata.list (todo string; TIMESTAMP en microsegundos,
+    # el cliente pide formatOptions.useInt64Timestamp)
+    t = field_type.upper()
+    if t in ("INT64", "INTEGER"):
+        return str(i)
+    if t in ("FLOAT64", "FLOAT", "NUMERIC", "BIGNUMERIC"):
+        return f"{i * 1.5:.2f}"
+    if t in ("BOOL", "BOOLEAN"):
+        return "true" if i % 2 == 0 else "false"
+    if t == "DATE":
+        return f"2026-01-{(i % 28) + 1:02d}"
+    if t == "TIMESTAMP":
+        return str((1767225600 + i * 60) * 1_000_000)
+    if t == "DATETIME":
+        return f"2026-01-{(i % 28) + 1:02d}T00:00:00"
+    return f"{name}-{i}"
+
+def _table_data(
+    data: Dict[str, Any],
+    selected: Optional[List[str]],
+    start: int,
+    max_results: int,
+) -> Dict[str, Any]:
+    columns = data.get("columns", [])
+    if selected:
+        by_name = {c["name"]: c for c in columns}
+        columns = [by_name[n] for n in selected if n in by_name]
+    num_rows = int(data.get("num_rows", _DEFAULT_NUM_ROWS))
+    end = min(num_rows, start + max_results)
+    rows = [{"f": [{"v": _cell(c["type"], c["name"], i)} for c in columns]} for i in range(start, end)]
+    body: Dict[str, Any] = {"kind": "bigquery#tableDataList", "totalRows": str(num_rows), "rows": rows}
+    if end < num_rows:
+        body["pageToken"] = str(end)
+    return body
+
+def _dataset_resource(project: str, dataset: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "kind": "bigquery#dataset",
+        "id": f"{project}:{dataset}",
+        "datasetReference": {"projectId": project, "datasetId": dataset},
+        "etag": str(state["etag"]),
+        "access": state["access"],
+    }
+
+def _policy_resource(state: Dict[str, Any]) -> Dict[str, Any]:
+    etag = base64.b64encode(f"v{state['etag']}".encode("ascii")).decode("ascii")
+    return {"version": 1, "etag": etag, "bindings": state["bindings"]}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: una conexión sirve muchos requests
+    tables: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    # (project, dataset) -> {"etag": int, "access": [...]}; mutable, protegido por lock
+    datasets: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    # (project, dataset, table) -> {"etag": int, "bindings": [...]}; se crea al primer uso
+    policies: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    # (project, dataset, table) -> {insertId: row}; insertAll acepta cualquier tabla de un dataset conocido
+    inserted: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    lock: Any = None
+    calls: Dict[str, int] = {}
+    handshake_ms: float = 0.0
+    latency_ms: float = 0.0
+
+    def setup(self) -> None:
+        super().setup()
+        # headers y body van en writes separados: sin NODELAY, Nagle + delayed ACK suman ~40ms
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.handshake_ms:
+            time.sleep(self.handshake_ms / 1000.0)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _not_found(self) -> None:
+        self._send(404, {"error": {"code": 404, "message": f"Not found: {self.path}", "status": "NOT_FOUND"}})
+
+    def _count(self, method: str) -> None:
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    def do_GET(self) -> None:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        m = _DATASET_RE.match(self.path)
+        if m:
+            self._count("datasets.get")
+            with self.lock:
+                state = self.datasets.get(m.groups())
+                body = _dataset_resource(*m.groups(), state) if state else None
+            return self._send(200, body) if body else self._not_found()
+        m = _DATA_RE.match(self.path) or _TABLE_RE.match(self.path)
+        if not m:
+            return self._not_found()
+        project, dataset, table = m.groups()
+        data = self.tables.get((project, dataset, table))
+        if data is None:
+            return self._not_found()
+        if m.re is _TABLE_RE:
+            return self._send(200, _table_resource(project, dataset, table, data))
+
+        qs = parse_qs(urlsplit(self.path).query)
+        selected = qs.get("selectedFields", [""])[0]
+        start = int(qs.get("pageToken", qs.get("startIndex", ["0"]))[0])
+        max_results = int(qs.get("maxResults", ["100000"])[0])
+        self._send(200, _table_data(data, selected.split(",") if selected else None, start, max_results))
+
+    def do_POST(self) -> None:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        m = _INSERT_RE.match(self.path)
+        if m:
+            if m.groups()[:2] not in self.datasets:
+                return self._not_found()
+            self._count("tabledata.insertAll")
+            with self.lock:
+                rows = self.inserted.setdefault(m.groups(), {})
+                for i, r in enumerate(body.get("rows", [])):
+                    rows[r.get("insertId") or f"auto-{len(rows)}-{i}"] = r.get("json", {})
+            return self._send(200, {"kind": "bigquery#tableDataInsertAllResponse"})
+        m = _IAM_RE.match(self.path)
+        if not m or m.groups()[:3] not in self.tables:
+            return self._not_found()
+        key, method = m.groups()[:3], m.group(4)
+        self._count(f"tables.{method}")
+        with self.lock:
+            state = self.policies.setdefault(key, {"etag": 1, "bindings": []})
+            if method == "setIamPolicy":
+                policy = body.get("policy", {})
+                if policy.get("etag") and policy["etag"] != _policy_resource(state)["etag"]:
+                    return self._send(
+                        409,
+                        {"error": {"code": 409, "message": "Concurrent policy changes.", "status": "ABORTED"}},
+                    )
+                state["bindings"] = policy.get("bindings", [])
+                state["etag"] += 1
+            resource = _policy_resource(state)
+        self._send(200, resource)
+
+    def do_PATCH(self) -> None:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        m = _DATASET_RE.match(self.path)
+        if not m:
+            return self._not_found()
+        self._count("datasets.patch")
+        if_match = self.headers.get("If-Match")
+        with self.lock:
+            state = self.datasets.get(m.groups())
+            if state is None:
+                return self._not_found()
+            if if_match is not None and if_match != str(state["etag"]):
+                return self._send(
+                    412,
+                    {"error": {"code": 412, "message": "Precondition check failed.", "status": "FAILED_PRECONDITION"}},
+                )
+            if "access" in body:
+                state["access"] = body["access"]
+            state["etag"] += 1
+            resource = _dataset_resource(*m.groups(), state)
+        self._send(200, resource)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    handshake_ms: float = 0.0,
+    latency_ms: float = 0.0,
+    extra_tables: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> ThreadingHTTPServer:
+    """
+    Levanta el fake en un thread daemon; retorna el server (server.server_address).
+    extra_tables: {"bigquery://p.d.t": {"columns": [...], "num_rows": N}} además de MOCK_SCHEMAS.
+    """
+    tables = _tables()
+    for linked, data in (extra_tables or {}).items():
+        project, dataset, table = linked.replace("bigquery://", "", 1).split(".")
+        tables[(project, dataset, table)] = data
+    datasets = {
+        (project, dataset): {"etag": 1, "access": [{"role": "OWNER", "specialGroup": "projectOwners"}]}
+        for project, dataset, _table in tables
+    }
+    handler = type(
+        "FakeBigQueryHandler",
+        (_Handler,),
+        {
+            "tables": tables,
+            "datasets": datasets,
+            "policies": {},
+            "inserted": {},
+            "lock": threading.Lock(),
+            "calls": {},
+            "handshake_ms": handshake_ms,
+            "latency_ms": latency_ms,
+        },
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def endpoint(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main(argv: Optional[list] = None) -> None:
+    ap = argparse.ArgumentParser(description="Fake BigQuery REST for offline dev")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9050)
+    ap.add_argument("--handshake-ms", type=float, default=0.0)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    args = ap.parse_args(argv)
+
+    server = serve(args.host, args.port, args.handshake_ms, args.latency_ms)
+    print(f"fake bigquery listening on {endpoint(server)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Fake Dataplex source (PUBLIC SAFE) para probar el sync del mirror offline.
+
+Expone la misma interfaz que catalog_mirror.DataplexSource:
+    changes_since(watermark) -> entries con update_time > watermark (orden ascendente)
+
+Cada entry: {"name", "update_time", "deleted", "asset"}; `asset` tiene la forma de MOCK_ASSETS.
+upsert()/delete() simulan cambios en el catálogo remoto.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.mock_catalog import MOCK_ASSETS
+
+
+def _ts(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class FakeDataplexSource:
+    def __init__(self, assets: Optional[Iterable[Dict[str, Any]]] = None):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._clock = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.calls = 0
+        for a in MOCK_ASSETS if assets is None else assets:
+            self.upsert(a)
+
+    def _tick(self) -> str:
+        # reloj monotónico propio: update_time estrictamente creciente
+        self._clock = max(self._clock + timedelta(microseconds=1), datetime.now(timezone.utc))
+        return _ts(self._clock)
+
+    def upsert(self, asset: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            name = asset["linked_resource"]
+            entry = {"name": name, "update_time": self._tick(), "deleted": False, "asset": dict(asset)}
+            self._entries[name] = entry
+            return entry
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries[name] = {**entry, "update_time": self._tick(), "deleted": True}
+
+    def changes_since(self, watermark: str = "") -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            self.calls += 1
+            changed: List[Dict[str, Any]] = [e for e in self._entries.values() if e["update_time"] > watermark]
+        changed.sort(key=lambda e: e["update_time"])
+        return iter(changed)
@@ -1,22 +1,30 @@
-from typing import Optional, List, Dict, Any
-from fastapi import APIRouter, Query
+import base64
+import heapq
+import json
+from typing import Optional, List, Dict, Any, Tuple, Union
+from fastapi import APIRouter, HTTPException, Query
 
-from app.mock_catalog import MOCK_ASSETS, MOCK_SCHEMAS
+from app.mock_catalog import MOCK_ASSETS
+from app.catalog_asset import CatalogAsset, norm as _norm
+from app.search_index import SearchIndex, tokenize as _tokenize
 
 router = APIRouter(tags=["catalog"])
 
-def _norm(s: str) -> str:
-    return (s or "").strip().lower()
+# Índice invertido construido una vez al cargar el catálogo (ver app/search_index.py)
+_INDEX = SearchIndex(MOCK_ASSETS)
 
-def _tokenize(q: str) -> List[str]:
-    q = _norm(q)
-    if not q:
-        return []
-    return [t for t in q.replace(",", " ").split() if t]
+def set_catalog(assets: List[Dict[str, Any]]) -> None:
+    """
+    Reemplaza el catálogo servido por /search (p.ej. desde el mirror local).
+    El índice nuevo se construye aparte y se publica con una sola asignación:
+    los requests en curso terminan con el índice anterior.
+    """
+    global _INDEX
+    _INDEX = SearchIndex(assets)
 
-def _score(asset: Dict[str, Any], tokens: List[str]) -> float:
+def _score(asset: Union[Dict[str, Any], CatalogAsset], tokens: List[str]) -> float:
     """
-    Simple ranking:
+    Ranking de un asset individual (referencia; /search usa el índice con los mismos pesos):
       - exact display_name match: +100
       - display_name contains token: +20 each
       - domain contains token: +8 each
@@ -24,43 +32,48 @@ def _score(asset: Dict[str, Any], tokens: List[str]) -> float:
       - tags contains token: +10 each
       - system/type match tokens: +4 each
     """
-    if not tokens:
-        return 0.0
-
-    dn = _norm(asset.get("display_name", ""))
-    desc = _norm(asset.get("description", ""))
-    domain = _norm(asset.get("domain", ""))
-    tags = [_norm(t) for t in (asset.get("tags") or [])]
-    sys = _norm(asset.get("system", ""))
-    typ = _norm(asset.get("type", ""))
-
-    score = 0.0
-
-    joined_tags = " ".join(tags)
-    for t in tokens:
-        if not t:
-            continue
-        if dn == t:
-            score += 100
-        if t in dn:
-            score += 20
-        if t in domain:
-            score += 8
-        if t in desc:
-            score += 6
-        if t in joined_tags:
-            score += 10
-        if t in sys:
-            score += 4
-        if t in typ:
-            score += 4
-
-    # bonus if all tokens appear somewhere
-    hay = " ".join([dn, domain, desc, joined_tags, sys, typ])
-    if all(t in hay for t in tokens):
-        score += 12
-
-    return score
+    rec = asset if isinstance(asset, CatalogAsset) else CatalogAsset(asset)
+    return rec.score(tokens)
+
+def _query(
+    idx: SearchIndex,
+    q: Optional[str],
+    system: Optional[str],
+    type: Optional[str],
+    domain: Optional[str],
+    tags: Optional[str],
+) -> Tuple[List[str], Optional[int]]:
+    """Tokens de texto + bitmap de filtros de facetas (None = sin filtros)."""
+    tokens = _tokenize(q or "")
+
+    filters: Dict[str, List[str]] = {}
+    if system:
+        filters["system"] = [_norm(system)]
+    if type:
+        filters["type"] = [_norm(type)]
+    if domain:
+        filters["domain"] = [_norm(domain)]
+    if tags:
+        tag_filters = [t for t in _tokenize(tags) if t]
+        if tag_filters:
+            filters["tags"] = tag_filters
+
+    return tokens, idx.filter_mask(filters)
+
+# Llave de orden de /search: (-score, display_name normalizado, doc_id)
+_RankKey = Tuple[float, str, int]
+
+def _encode_cursor(key: _RankKey) -> str:
+    raw = json.dumps({"s": key[0], "n": key[1], "i": key[2]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str) -> _RankKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return float(data["s"]), str(data["n"]), int(data["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/search")
 def search(
@@ -70,68 +83,55 @@ def search(
     type: Optional[str] = Query(default=None),
     domain: Optional[str] = Query(default=None),
     tags: Optional[str] = Query(default=None, description="Comma-separated tags filter, e.g. gold,kpi"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor de la página anterior"),
 ):
     """
     MVP MOCK SEARCH (ranked + filters).
+    - Top-k con heap (O(N log k)) en vez de ordenar todos los resultados.
+    - Paginación por cursor opaco (último score + display_name + doc_id).
+    - total siempre exacto: el top-k necesita el score de todos los candidatos,
+      así que contarlos (len) no cuesta nada extra.
     Production replacement:
       - Dataplex Catalog search + facets
       - Data Catalog tags / policy tags
       - Owners/Stewards from governance sources
     """
-    tokens = _tokenize(q or "")
-    sys_f = _norm(system) if system else None
-    type_f = _norm(type) if type else None
-    domain_f = _norm(domain) if domain else None
-
-    tag_filters = []
-    if tags:
-        tag_filters = [t for t in _tokenize(tags) if t]
-
-    scored = []
-    for a in MOCK_ASSETS:
-        a_sys = _norm(a.get("system", ""))
-        a_type = _norm(a.get("type", ""))
-        a_domain = _norm(a.get("domain", ""))
-        a_tags = [_norm(t) for t in (a.get("tags") or [])]
-
-        if sys_f and a_sys != sys_f:
-            continue
-        if type_f and a_type != type_f:
-            continue
-        if domain_f and a_domain != domain_f:
-            continue
-        if tag_filters and not all(tf in a_tags for tf in tag_filters):
-            continue
-
-        # if q exists, require at least one token match somewhere
-        if tokens:
-            hay = " ".join([
-                _norm(a.get("display_name", "")),
-                _norm(a.get("description", "")),
-                _norm(a.get("domain", "")),
-                " ".join(a_tags),
-                a_sys,
-                a_type,
-            ])
-            if not any(t in hay for t in tokens):
-                continue
-
-        s = _score(a, tokens)
-        scored.append((s, a))
-
-    # sort best first, stable by display_name
-    scored.sort(key=lambda x: (-x[0], _norm(x[1].get("display_name", ""))))
-    items = [a for _, a in scored]
-
-    return {"items": items[:page_size], "total": len(items)}
-
-@router.get("/assets/schema")
-def get_schema(linked_resource: str = Query(..., description="bigquery://... or dataplex://...")):
+    after: Optional[_RankKey] = _decode_cursor(cursor) if cursor else None
+
+    idx = _INDEX
+    tokens, mask = _query(idx, q, system, type, domain, tags)
+    scored = idx.search(tokens, mask)
+
+    # best first, empates por display_name y luego doc_id (orden original del catálogo)
+    records = idx.records
+    keys = ((-s, records[d].display_name, d) for s, d in scored)
+    if after is not None:
+        keys = (k for k in keys if k > after)
+    top = heapq.nsmallest(page_size + 1, keys)
+
+    has_more = len(top) > page_size
+    top = top[:page_size]
+
+    return {
+        "items": [records[d].raw for _, _, d in top],
+        "total": len(scored),
+        "next_cursor": _encode_cursor(top[-1]) if has_more else None,
+    }
+
+@router.get("/search/facets")
+def search_facets(
+    q: Optional[str] = Query(default="", description="Search text"),
+    system: Optional[str] = Query(default=None),
+    type: Optional[str] = Query(default=None),
+    domain: Optional[str] = Query(default=None),
+    tags: Optional[str] = Query(default=None, description="Comma-separated tags filter, e.g. gold,kpi"),
+):
     """
-    MVP MOCK SCHEMA.
-    Returns empty schema instead of 404 to keep UI stable.
+    Conteos por valor de faceta (system/type/domain/tags) para la misma query que /search.
+    Se calculan con popcount sobre los bitmaps de facetas en una pasada.
     """
-    data = MOCK_SCHEMAS.get(linked_resource)
-    if not data:
-        return {"table_description": "—", "columns": []}
-    return data
+    idx = _INDEX
+    tokens, mask = _query(idx, q, system, type, domain, tags)
+    result = idx.match_mask(tokens, mask)
+    total = len(idx) if result is None else result.bit_count()
+    return {"facets": idx.facet_counts(result), "total": total}
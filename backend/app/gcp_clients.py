@@ -0,0 +1,133 @@
+"""
+Registro de clientes GCP reutilizables (uno por proyecto, por proceso).
+
+Construir un CatalogServiceClient / bigquery.Client por request implica setup del
+canal gRPC/HTTP, refresh de credenciales y handshake TLS en el camino del request.
+Aquí se crean lazy la primera vez y se reutilizan; main.py los cierra en el
+shutdown (lifespan).
+
+Los imports de google.cloud son lazy: el MVP en modo mock no los necesita.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import APIRouter
+
+router = APIRouter(tags=["health"])
+
+_Key = Tuple[str, Optional[str]]
+
+_LOCK = threading.Lock()
+_CLIENTS: Dict[_Key, Any] = {}
+_CREATED_AT: Dict[_Key, float] = {}
+
+
+def _get_or_create(key: _Key, factory: Callable[[], Any]) -> Any:
+    client = _CLIENTS.get(key)
+    if client is not None:
+        return client
+    with _LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = factory()
+            _CLIENTS[key] = client
+            _CREATED_AT[key] = time.time()
+        return client
+
+
+def dataplex_client() -> Any:
+    def _factory():
+        from google.cloud import dataplex_v1
+
+        return dataplex_v1.CatalogServiceClient()
+
+    return _get_or_create(("dataplex", None), _factory)
+
+
+def new_bigquery_client(project: Optional[str] = None) -> Any:
+    """
+    Construye un bigquery.Client nuevo (sin registrar).
+    BIGQUERY_API_ENDPOINT apunta a un stand-in local (app/fake_bigquery.py) con credenciales anónimas.
+    """
+    from google.cloud import bigquery
+
+    api_endpoint = os.getenv("BIGQUERY_API_ENDPOINT")
+    if api_endpoint:
+        from google.auth.credentials import AnonymousCredentials
+
+        return bigquery.Client(
+            project=project or os.getenv("GOOGLE_CLOUD_PROJECT", "demo"),
+            credentials=AnonymousCredentials(),
+            client_options={"api_endpoint": api_endpoint},
+        )
+    return bigquery.Client(project=project) if project else bigquery.Client()
+
+
+def bigquery_client(project: Optional[str] = None) -> Any:
+    """Cliente compartido; project=None usa el proyecto de ADC / GOOGLE_CLOUD_PROJECT."""
+
+    def _factory():
+        return new_bigquery_client(project)
+
+    return _get_or_create(("bigquery", project), _factory)
+
+
+def _close(kind: str, client: Any) -> None:
+    try:
+        if kind == "dataplex":
+            client.transport.close()
+        else:
+            client.close()
+    except Exception:
+        pass
+
+
+def discard(kind: str, project: Optional[str] = None) -> None:
+    """Saca (y cierra) un cliente roto; el próximo uso crea uno nuevo."""
+    with _LOCK:
+        client = _CLIENTS.pop((kind, project), None)
+        _CREATED_AT.pop((kind, project), None)
+    if client is not None:
+        _close(kind, client)
+
+
+def close_all() -> None:
+    with _LOCK:
+        clients = list(_CLIENTS.items())
+        _CLIENTS.clear()
+        _CREATED_AT.clear()
+    for (kind, _project), client in clients:
+        _close(kind, client)
+
+
+def health() -> Dict[str, Any]:
+    """Estado del registro: qué clientes existen y si su transporte sigue abierto."""
+    now = time.time()
+    items = []
+    with _LOCK:
+        snapshot = list(_CLIENTS.items())
+        created = dict(_CREATED_AT)
+    for (kind, project), client in snapshot:
+        ok = True
+        if kind == "dataplex":
+            channel = getattr(client.transport, "grpc_channel", None)
+            ok = channel is not None
+        else:
+            ok = getattr(client, "_http", None) is not None
+        items.append(
+            {
+                "kind": kind,
+                "project": project,
+                "ok": ok,
+                "age_s": round(now - created.get((kind, project), now), 1),
+            }
+        )
+    return {"ok": all(x["ok"] for x in items), "clients": items}
+
+
+@router.get("/health/clients")
+def clients_health() -> Dict[str, Any]:
+    return health()
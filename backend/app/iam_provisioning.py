@@ -1,39 +1,266 @@
+import os
 import re
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 
+from google.api_core.exceptions import Conflict, PreconditionFailed
 from google.cloud import bigquery
 
+from app.gcp_clients import bigquery_client
+from app.upstream import track
+
 BQ_LINK_RE = re.compile(
     r"//bigquery\.googleapis\.com/projects/(?P<project>[^/]+)/datasets/(?P<dataset>[^/]+)/tables/(?P<table>[^/]+)"
 )
+# Formato del catálogo MVP: bigquery://project.dataset.table
+BQ_URI_RE = re.compile(r"^bigquery://(?P<project>[^./]+)\.(?P<dataset>[^./]+)\.(?P<table>[^./]+)$")
+
+# Reintentos del read-modify-write de access_entries / IAM policy cuando el etag cambió (412/409)
+_MAX_ETAG_RETRIES = 5
+
+# Un rol mayor incluye al menor: quien ya es WRITER/OWNER no necesita READER
+_DATASET_ROLE_RANK = {"READER": 1, "WRITER": 2, "OWNER": 3}
+# access_entries también aceptan roles IAM (legacy <-> predefinido)
+_DATASET_ROLE_ALIASES = {
+    "roles/bigquery.dataViewer": "READER",
+    "roles/bigquery.dataEditor": "WRITER",
+    "roles/bigquery.dataOwner": "OWNER",
+}
+TABLE_VIEWER_ROLE = "roles/bigquery.dataViewer"
+_TABLE_ROLE_RANK = {
+    "roles/viewer": 1,
+    "roles/bigquery.dataViewer": 1,
+    "roles/editor": 2,
+    "roles/bigquery.dataEditor": 2,
+    "roles/owner": 3,
+    "roles/bigquery.dataOwner": 3,
+    "roles/bigquery.admin": 3,
+}
+
+_STATS_LOCK = threading.Lock()
+_STATS = {"writes": 0, "writes_avoided": 0, "members_granted": 0, "members_already_granted": 0, "etag_retries": 0}
+
+
+def _record(plan: Dict[str, List[str]], wrote: bool, retries: int) -> None:
+    with _STATS_LOCK:
+        _STATS["writes" if wrote else "writes_avoided"] += 1
+        _STATS["members_granted"] += len(plan["add"]) if wrote else 0
+        _STATS["members_already_granted"] += len(plan["satisfied"])
+        _STATS["etag_retries"] += retries
+
+
+def grant_stats() -> Dict[str, int]:
+    """Contadores de grants: writes_avoided = updates que el planner evitó por ser no-op."""
+    with _STATS_LOCK:
+        return dict(_STATS)
+
+
+def grant_scope() -> str:
+    """PROVISIONING_GRANT_SCOPE=dataset (access_entries, default) | table (IAM policy de la tabla)."""
+    return "table" if os.getenv("PROVISIONING_GRANT_SCOPE", "dataset").lower() == "table" else "dataset"
 
 def parse_bq_linked_resource(linked_resource: str):
-    m = BQ_LINK_RE.match(linked_resource or "")
+    m = BQ_LINK_RE.match(linked_resource or "") or BQ_URI_RE.match(linked_resource or "")
     if not m:
         return None
     return m.group("project"), m.group("dataset"), m.group("table")
 
+def _entry_grants(entry: bigquery.AccessEntry, email: str, min_rank: int) -> bool:
+    if entry.entity_type == "userByEmail":
+        member = (entry.entity_id or "").lower()
+    elif entry.entity_type == "iamMember":
+        member = (entry.entity_id or "").lower().removeprefix("user:")
+    else:
+        # grupos/dominios: no sabemos si el usuario es miembro
+        return False
+    role = _DATASET_ROLE_ALIASES.get(entry.role, entry.role)
+    return member == email and _DATASET_ROLE_RANK.get(role, 0) >= min_rank
+
+def plan_dataset_access(
+    entries: Iterable[bigquery.AccessEntry], member_emails: Iterable[str], role: str = "READER"
+) -> Dict[str, List[str]]:
+    """
+    Diff mínimo entre lo deseado y los access_entries actuales:
+    {"add": miembros sin el rol (ni uno mayor), "satisfied": los que ya lo tienen}.
+    add vacío = no hay que escribir.
+    """
+    entries = list(entries)
+    rank = _DATASET_ROLE_RANK[role]
+    plan: Dict[str, List[str]] = {"add": [], "satisfied": []}
+    for m in dict.fromkeys(e.lower() for e in member_emails):
+        plan["satisfied" if any(_entry_grants(e, m, rank) for e in entries) else "add"].append(m)
+    return plan
+
+def plan_table_bindings(
+    bindings: Iterable[Dict[str, Any]], member_emails: Iterable[str], role: str = TABLE_VIEWER_ROLE
+) -> Dict[str, List[str]]:
+    """Igual que plan_dataset_access pero sobre los bindings de la IAM policy de una tabla."""
+    rank = _TABLE_ROLE_RANK.get(role, 1)
+    held: Dict[str, int] = {}
+    for b in bindings:
+        if b.get("condition"):
+            # un binding condicional no garantiza acceso siempre
+            continue
+        r = _TABLE_ROLE_RANK.get(b.get("role"), 0)
+        for member in b.get("members", ()):
+            if member.lower().startswith("user:"):
+                email = member[5:].lower()
+                held[email] = max(held.get(email, 0), r)
+    plan: Dict[str, List[str]] = {"add": [], "satisfied": []}
+    for m in dict.fromkeys(e.lower() for e in member_emails):
+        plan["satisfied" if held.get(m, 0) >= rank else "add"].append(m)
+    return plan
+
+def grant_bigquery_viewers(
+    project: str,
+    dataset: str,
+    member_emails: List[str],
+    client: Optional[bigquery.Client] = None,
+    max_retries: int = _MAX_ETAG_RETRIES,
+) -> Dict[str, Any]:
+    """
+    Dataset-level READER para varios usuarios con UN update_dataset.
+    - get_dataset -> plan (solo los que no tienen READER o un rol mayor)
+      -> update_dataset con If-Match: etag
+    - plan vacío: no se escribe (writes_avoided)
+    - si otro writer cambió el dataset entre medio (412) se relee y se reintenta,
+      así no se pisan cambios concurrentes (lost update)
+    """
+    client = client or bigquery_client(project)
+    ds_id = f"{project}.{dataset}"
+    calls = 0
+
+    for attempt in range(max_retries + 1):
+        with track("bigquery"):
+            ds = client.get_dataset(ds_id)
+        calls += 1
+        entries = list(ds.access_entries)
+        plan = plan_dataset_access(entries, member_emails)
+        if not plan["add"]:
+            break
+        entries.extend(bigquery.AccessEntry(role="READER", entity_type="userByEmail", entity_id=m) for m in plan["add"])
+        ds.access_entries = entries
+        try:
+            with track("bigquery"):
+                client.update_dataset(ds, ["access_entries"])  # ds.etag -> If-Match
+            calls += 1
+            break
+        except PreconditionFailed:
+            calls += 1
+            if attempt == max_retries:
+                raise
+            time.sleep(min(0.05 * 2 ** attempt, 1.0))
+
+    _record(plan, bool(plan["add"]), attempt)
+    return {
+        "ok": True,
+        "dataset": ds_id,
+        "granted": plan["add"],
+        "already_granted": plan["satisfied"],
+        "write_skipped": not plan["add"],
+        "api_calls": calls,
+        "retries": attempt,
+    }
+
+def grant_table_viewers(
+    project: str,
+    dataset: str,
+    table: str,
+    member_emails: List[str],
+    client: Optional[bigquery.Client] = None,
+    max_retries: int = _MAX_ETAG_RETRIES,
+) -> Dict[str, Any]:
+    """
+    Table-level roles/bigquery.dataViewer vía IAM policy de la tabla.
+    get_iam_policy -> plan -> set_iam_policy (la policy lleva su etag; si cambió
+    entre medio BigQuery responde 409/412 y se reintenta). Sin cambios no hay set.
+    """
+    client = client or bigquery_client(project)
+    table_id = f"{project}.{dataset}.{table}"
+    calls = 0
+
+    for attempt in range(max_retries + 1):
+        with track("bigquery"):
+            policy = client.get_iam_policy(table_id)
+        calls += 1
+        bindings = policy.bindings
+        plan = plan_table_bindings(bindings, member_emails)
+        if not plan["add"]:
+            break
+        new_members = {f"user:{m}" for m in plan["add"]}
+        for b in bindings:
+            if b["role"] == TABLE_VIEWER_ROLE and not b.get("condition"):
+                b["members"] = set(b["members"]) | new_members
+                break
+        else:
+            bindings.append({"role": TABLE_VIEWER_ROLE, "members": new_members})
+        policy.bindings = bindings
+        try:
+            with track("bigquery"):
+                client.set_iam_policy(table_id, policy)
+            calls += 1
+            break
+        except (Conflict, PreconditionFailed):
+            calls += 1
+            if attempt == max_retries:
+                raise
+            time.sleep(min(0.05 * 2 ** attempt, 1.0))
+
+    _record(plan, bool(plan["add"]), attempt)
+    return {
+        "ok": True,
+        "table": table_id,
+        "granted": plan["add"],
+        "already_granted": plan["satisfied"],
+        "write_skipped": not plan["add"],
+        "api_calls": calls,
+        "retries": attempt,
+    }
+
 def grant_bigquery_viewer(linked_resource: str, member_email: str) -> Dict[str, Any]:
     """
-    Grants dataset-level BigQuery Data Viewer to user: user:email
-    This is an MVP approach for public repo.
+    Grants BigQuery Data Viewer to user:email (dataset-level, o table-level con
+    PROVISIONING_GRANT_SCOPE=table). No escribe si el usuario ya tiene acceso.
     """
     parsed = parse_bq_linked_resource(linked_resource)
     if not parsed:
         return {"ok": False, "error": "Unsupported linked_resource"}
 
-    project, dataset, _table = parsed
-    client = bigquery.Client(project=project)
+    project, dataset, table = parsed
+    if grant_scope() == "table":
+        res = grant_table_viewers(project, dataset, table, [member_email])
+        granted, target = "TABLE_VIEWER", res["table"]
+    else:
+        res = grant_bigquery_viewers(project, dataset, [member_email])
+        granted, target = "DATASET_READER", res["dataset"]
 
-    ds_id = f"{project}.{dataset}"
-    ds = client.get_dataset(ds_id)
+    return {
+        "ok": True,
+        "granted": granted,
+        "resource": target,
+        "member": f"user:{member_email}",
+        "write_skipped": res["write_skipped"],
+    }
 
-    entries = list(ds.access_entries)
-    member = f"user:{member_email}"
+def _group(linked_resources: Dict[str, str], parts: int) -> Tuple[Dict[Tuple[str, ...], List[str]], List[str]]:
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    unsupported: List[str] = []
+    for key, linked_resource in linked_resources.items():
+        parsed = parse_bq_linked_resource(linked_resource)
+        if not parsed:
+            unsupported.append(key)
+            continue
+        groups.setdefault(parsed[:parts], []).append(key)
+    return groups, unsupported
 
-    # add dataset-level viewer
-    entries.append(bigquery.AccessEntry(role="READER", entity_type="userByEmail", entity_id=member_email))
-    ds.access_entries = entries
-    client.update_dataset(ds, ["access_entries"])
+def group_by_dataset(linked_resources: Dict[str, str]) -> Tuple[Dict[Tuple[str, str], List[str]], List[str]]:
+    """
+    {key: linked_resource} -> ({(project, dataset): [key, ...]}, [keys no soportados]).
+    Sirve para aplicar todas las aprobaciones de un dataset en un solo update.
+    """
+    return _group(linked_resources, 2)
 
-    return {"ok": True, "granted": "DATASET_READER", "dataset": ds_id, "member": member}
+def group_by_table(linked_resources: Dict[str, str]) -> Tuple[Dict[Tuple[str, str, str], List[str]], List[str]]:
+    """Como group_by_dataset pero por (project, dataset, table): un set_iam_policy por tabla."""
+    return _group(linked_resources, 3)
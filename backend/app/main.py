@@ -1,6 +1,10 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app import gcp_clients, metrics, profiler
+
 # Routers (si existen en tu repo)
 try:
     from app.gcp_catalog import router as catalog_router
@@ -8,24 +12,72 @@ except Exception:
     catalog_router = None
 
 try:
+    from app import catalog_mirror
+    from app.gcp_catalog import set_catalog
+except Exception:
+    catalog_mirror = None
+
+try:
+    from app.catalog_provider import router as provider_router
+except Exception:
+    provider_router = None
+
+try:
+    from app import access_requests
     from app.access_requests import router as access_router
 except Exception:
+    access_requests = None
     access_router = None
 
+try:
+    from app import provisioning_queue
+except Exception:
+    provisioning_queue = None
+
 try:
     from app.assets import router as assets_router
 except Exception:
     assets_router = None
 
+try:
+    from app.bq_schema import router as schema_router
+except Exception:
+    schema_router = None
+
 try:
     from app.bq_preview import router as preview_router
 except Exception:
     preview_router = None
 
 # Audit router (MVP)
+from app import audit
 from app.audit import router as audit_router
 
-app = FastAPI(title="GCP Data Portal (MVP)", version="0.1.0")
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Writer de auditoría en background (AUDIT_SINKS): audit_log solo encola
+    audit.start_writer()
+    audit.warm_index()
+    # Mirror local del catálogo (CATALOG_MIRROR=true): /search sirve desde el índice del mirror
+    if catalog_mirror:
+        catalog_mirror.start_from_env(on_change=set_catalog)
+    # Workers de provisioning (ENABLE_PROVISIONING=true): aplican los grants encolados al aprobar
+    if provisioning_queue:
+        provisioning_queue.start_from_env()
+    yield
+    if catalog_mirror:
+        catalog_mirror.stop()
+    if provisioning_queue:
+        provisioning_queue.stop()
+    if access_requests:
+        access_requests.close_store()
+    # Último: las decisiones de arriba pueden auditar hasta el final
+    audit.stop_writer()
+    # Cierra canales gRPC / sesiones HTTP de los clientes GCP compartidos
+    gcp_clients.close_all()
+
+
+app = FastAPI(title="GCP Data Portal (MVP)", version="0.1.0", lifespan=lifespan)
 
 # CORS (MVP local)
 app.add_middleware(
@@ -37,8 +89,20 @@ app.add_middleware(
 )
 
 
+# Latencia por ruta / upstream + GET /metrics (Prometheus). Se agrega después de CORS,
+# así queda por fuera y mide también los preflight.
+if metrics.enabled():
+    metrics.install(app)
+    app.include_router(metrics.router)
+
+# Profiler por muestreo (solo ADMIN, /admin/profiler/*). Apagado = ni middleware.
+if profiler.enabled():
+    profiler.install(app)
+    app.include_router(profiler.router)
+
+# async: no ocupa un worker del threadpool, responde aunque los upstreams estén lentos
 @app.get("/health")
-def health():
+async def health():
     return {"ok": True}
 
 
@@ -46,14 +110,29 @@ def health():
 if catalog_router:
     app.include_router(catalog_router)
 
+if provider_router:
+    app.include_router(provider_router)
+
+if catalog_mirror:
+    app.include_router(catalog_mirror.router)
+
 if access_router:
     app.include_router(access_router)
 
+if provisioning_queue:
+    app.include_router(provisioning_queue.router)
+
 if assets_router:
     app.include_router(assets_router)
 
+if schema_router:
+    # GET /assets/schema: mock con MOCK_MODE=true / X-Mock: 1; si no, BigQuery con cache + ETag
+    app.include_router(schema_router)
+
 if preview_router:
     app.include_router(preview_router)
 
 # Siempre incluimos audit (mock)
 app.include_router(audit_router)
+
+app.include_router(gcp_clients.router)
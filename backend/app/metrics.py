@@ -0,0 +1,180 @@
+"""
+Métricas en memoria + GET /metrics (formato texto de Prometheus).
+
+- MetricsMiddleware (ASGI puro, sin BaseHTTPMiddleware): latencia por ruta (el
+  template, p.ej. /assets/schema, no el path crudo), status y requests en curso
+- upstream.run_blocking / upstream.track: latencia, resultado (ok/error/timeout)
+  y llamadas en curso por upstream (dataplex, bigquery)
+
+Histogramas con buckets fijos: observar = un bisect + dos sumas. El middleware
+corre siempre en el thread del event loop; lo de upstreams puede venir de
+threads (workers, sinks) y va con lock. Ver benchmarks/metrics_overhead.py.
+
+Config:
+- METRICS_ENABLED=true
+"""
+
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app import upstream
+
+router = APIRouter(tags=["metrics"])
+
+# segundos; el último bucket implícito es +Inf
+BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+
+def enabled() -> bool:
+    return os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+
+# -------- requests (solo desde el event loop) --------
+
+_in_flight = 0
+# (method, route) -> Histogram
+_REQUEST_LATENCY: Dict[Tuple[str, str], Histogram] = {}
+# (method, route, status) -> n
+_REQUESTS: Dict[Tuple[str, str, int], int] = {}
+
+
+def _record_request(method: str, route: str, status: int, seconds: float) -> None:
+    key = (method, route)
+    h = _REQUEST_LATENCY.get(key)
+    if h is None:
+        h = _REQUEST_LATENCY[key] = Histogram()
+    h.observe(seconds)
+    skey = (method, route, status)
+    _REQUESTS[skey] = _REQUESTS.get(skey, 0) + 1
+
+
+class MetricsMiddleware:
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        global _in_flight
+        status = 500
+
+        async def _send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _in_flight += 1
+        t0 = perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            seconds = perf_counter() - t0
+            _in_flight -= 1
+            # FastAPI deja la ruta matcheada en el scope; sin match (404) se agrupa
+            route = scope.get("route")
+            _record_request(scope["method"], getattr(route, "path", "unmatched"), status, seconds)
+
+
+# -------- upstreams (cualquier thread) --------
+
+_UPSTREAM_LOCK = threading.Lock()
+_UPSTREAM_LATENCY: Dict[str, Histogram] = {}
+# (upstream, outcome) -> n
+_UPSTREAM_CALLS: Dict[Tuple[str, str], int] = {}
+_UPSTREAM_IN_FLIGHT: Dict[str, int] = {}
+
+
+class _UpstreamMetrics:
+    """Hook registrado en app.upstream."""
+
+    def upstream_start(self, name: str) -> None:
+        with _UPSTREAM_LOCK:
+            _UPSTREAM_IN_FLIGHT[name] = _UPSTREAM_IN_FLIGHT.get(name, 0) + 1
+
+    def upstream_end(self, name: str, seconds: float, outcome: str) -> None:
+        with _UPSTREAM_LOCK:
+            _UPSTREAM_IN_FLIGHT[name] -= 1
+            h = _UPSTREAM_LATENCY.get(name)
+            if h is None:
+                h = _UPSTREAM_LATENCY[name] = Histogram()
+            h.observe(seconds)
+            key = (name, outcome)
+            _UPSTREAM_CALLS[key] = _UPSTREAM_CALLS.get(key, 0) + 1
+
+
+_HOOK = _UpstreamMetrics()
+
+
+def install(app: Any) -> None:
+    """Middleware + hook de upstreams (idempotente para el hook)."""
+    app.add_middleware(MetricsMiddleware)
+    upstream.add_hook(_HOOK)
+
+
+# -------- exposición --------
+
+
+def _labels(**kv: Any) -> str:
+    parts = []
+    for k, v in kv.items():
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _histogram_lines(name: str, series: List[Tuple[Dict[str, Any], List[int], float]]) -> List[str]:
+    out = [f"# TYPE {name} histogram"]
+    for labels, counts, total in series:
+        acc = 0
+        for le, n in zip(BUCKETS + (float("inf"),), counts):
+            acc += n
+            out.append(f"{name}_bucket{_labels(**labels, le='+Inf' if le == float('inf') else repr(le))} {acc}")
+        out.append(f"{name}_sum{_labels(**labels)} {total}")
+        out.append(f"{name}_count{_labels(**labels)} {acc}")
+    return out
+
+
+def render() -> str:
+    # copias: el event loop y los threads siguen escribiendo mientras se formatea
+    req_latency = [(dict(method=m, route=r), list(h.counts), h.sum) for (m, r), h in list(_REQUEST_LATENCY.items())]
+    requests = list(_REQUESTS.items())
+    with _UPSTREAM_LOCK:
+        up_latency = [(dict(upstream=u), list(h.counts), h.sum) for u, h in _UPSTREAM_LATENCY.items()]
+        up_calls = list(_UPSTREAM_CALLS.items())
+        up_in_flight = list(_UPSTREAM_IN_FLIGHT.items())
+
+    lines = ["# TYPE http_requests_in_flight gauge", f"http_requests_in_flight {_in_flight}"]
+    lines += _histogram_lines("http_request_duration_seconds", req_latency)
+    lines.append("# TYPE http_requests_total counter")
+    lines += [f"http_requests_total{_labels(method=m, route=r, status=s)} {n}" for (m, r, s), n in requests]
+    lines.append("# TYPE upstream_calls_in_flight gauge")
+    lines += [f"upstream_calls_in_flight{_labels(upstream=u)} {n}" for u, n in up_in_flight]
+    lines += _histogram_lines("upstream_call_duration_seconds", up_latency)
+    lines.append("# TYPE upstream_calls_total counter")
+    lines += [f"upstream_calls_total{_labels(upstream=u, outcome=o)} {n}" for (u, o), n in up_calls]
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
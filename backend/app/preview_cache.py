@@ -0,0 +1,274 @@
+"""
+Cache de previews (bodies serializados, comprimidos con zlib).
+
+- Llave: (linked_resource, columnas, limit, formato, last_modified de la tabla):
+  una versión nueva de la tabla es otra llave, las viejas salen por LRU
+- Memoria acotada por bytes comprimidos (LRU)
+- Spill opcional a disco: lo que sale de memoria se escribe en spill_dir (también
+  acotado por bytes); un hit en disco vuelve a memoria. Los archivos se nombran
+  por hash de la llave, así que sobreviven reinicios.
+- El I/O de disco nunca corre con el lock tomado; desde el event loop se usa
+  aget/aput, que mandan ese I/O al threadpool.
+
+El cache no decide permisos: el caller valida acceso por request antes de leer.
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+_CHUNK = 64 * 1024
+# (llave, media_type, blob) que sale de memoria rumbo al spill
+_Entry = Tuple[Hashable, str, bytes]
+
+
+def compress(raw: bytes) -> bytes:
+    return zlib.compress(raw, 6)
+
+
+def iter_decompressed(blob: bytes, chunk: int = _CHUNK) -> Iterator[bytes]:
+    """Descomprime por pedazos (para StreamingResponse sin materializar el body)."""
+    d = zlib.decompressobj()
+    for i in range(0, len(blob), chunk):
+        out = d.decompress(blob[i : i + chunk])
+        if out:
+            yield out
+    tail = d.flush()
+    if tail:
+        yield tail
+
+
+class PreviewCache:
+    def __init__(
+        self,
+        max_bytes: int,
+        spill_dir: Optional[str] = None,
+        spill_max_bytes: int = 0,
+        max_entry_bytes: Optional[int] = None,
+    ):
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entry_bytes = self.max_bytes // 4 if max_entry_bytes is None else int(max_entry_bytes)
+        self.spill_dir = spill_dir or None
+        self.spill_max_bytes = max(0, int(spill_max_bytes)) if spill_dir else 0
+        self._lock = threading.Lock()
+        # llave -> (media_type, blob comprimido)
+        self._mem: "OrderedDict[Hashable, Tuple[str, bytes]]" = OrderedDict()
+        self._mem_bytes = 0
+        # nombre de archivo -> tamaño (orden LRU)
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spilled = 0
+        self.skipped_large = 0
+        self.raw_bytes_in = 0
+        self.stored_bytes_in = 0
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._load_disk_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    # -------- disco --------
+
+    @staticmethod
+    def _file_name(key: Hashable) -> str:
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest() + ".z"
+
+    def _load_disk_index(self) -> None:
+        files = []
+        for name in os.listdir(self.spill_dir):
+            if name.endswith(".z"):
+                st = os.stat(os.path.join(self.spill_dir, name))
+                files.append((st.st_mtime, name, st.st_size))
+        for _mtime, name, size in sorted(files):
+            self._disk[name] = size
+            self._disk_bytes += size
+
+    def _disk_read(self, key: Hashable) -> Optional[Tuple[str, bytes]]:
+        # Sin self._lock: el índice se toca adentro, el archivo se lee afuera
+        name = self._file_name(key)
+        with self._lock:
+            if name not in self._disk:
+                return None
+            self._disk.move_to_end(name)
+        try:
+            with open(os.path.join(self.spill_dir, name), "rb") as f:
+                media_type, _, blob = f.read().partition(b"\n")
+        except OSError:
+            with self._lock:
+                size = self._disk.pop(name, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+        return media_type.decode("ascii"), blob
+
+    def _disk_write(self, key: Hashable, media_type: str, blob: bytes) -> None:
+        # Sin self._lock: escritura y borrados fuera del lock
+        size = len(blob) + len(media_type) + 1
+        if size > self.spill_max_bytes:
+            return
+        name = self._file_name(key)
+        path = os.path.join(self.spill_dir, name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        # 0600: los previews son datos de negocio
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(media_type.encode("ascii") + b"\n" + blob)
+        os.replace(tmp, path)
+        drop: List[str] = []
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(name, 0)
+            self._disk[name] = size
+            self.spilled += 1
+            while self._disk_bytes > self.spill_max_bytes and self._disk:
+                old, old_size = self._disk.popitem(last=False)
+                self._disk_bytes -= old_size
+                drop.append(old)
+        for old in drop:
+            try:
+                os.remove(os.path.join(self.spill_dir, old))
+            except OSError:
+                pass
+
+    def _spill(self, entries: List[_Entry]) -> None:
+        for key, media_type, blob in entries:
+            self._disk_write(key, media_type, blob)
+
+    # -------- API --------
+    #
+    # get/put hacen todo en el thread que llama. Desde el event loop usar
+    # aget/aput: la búsqueda en memoria es inline y lo que toca disco
+    # (lectura de spill, escritura, evicción) va al threadpool.
+
+    def _lookup(self, key: Hashable) -> Tuple[Optional[Tuple[str, bytes]], bool]:
+        """Solo memoria: (entry, hay que leerlo de disco)."""
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return entry, False
+            if self.spill_dir and self._file_name(key) in self._disk:
+                return None, True
+            self.misses += 1
+            return None, False
+
+    def _load_from_disk(self, key: Hashable) -> Optional[Tuple[str, bytes]]:
+        entry = self._disk_read(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            spill = self._store(key, entry[0], entry[1])
+        self._spill(spill)
+        return entry
+
+    def _put_mem(self, key: Hashable, media_type: str, blob: bytes, raw_size: int) -> Optional[List[_Entry]]:
+        """None si excede max_entry_bytes; si no, lo que salió de memoria y va a disco."""
+        with self._lock:
+            if len(blob) > self.max_entry_bytes:
+                self.skipped_large += 1
+                return None
+            self.raw_bytes_in += raw_size
+            self.stored_bytes_in += len(blob)
+            return self._store(key, media_type, blob)
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, bytes]]:
+        """(media_type, blob comprimido) o None."""
+        if not self.enabled:
+            return None
+        entry, on_disk = self._lookup(key)
+        return self._load_from_disk(key) if on_disk else entry
+
+    async def aget(self, key: Hashable) -> Optional[Tuple[str, bytes]]:
+        if not self.enabled:
+            return None
+        entry, on_disk = self._lookup(key)
+        if on_disk:
+            return await run_in_threadpool(self._load_from_disk, key)
+        return entry
+
+    def put(self, key: Hashable, media_type: str, blob: bytes, raw_size: int = 0) -> bool:
+        """Guarda un body ya comprimido; False si excede max_entry_bytes."""
+        if not self.enabled:
+            return False
+        spill = self._put_mem(key, media_type, blob, raw_size)
+        if spill is None:
+            return False
+        self._spill(spill)
+        return True
+
+    async def aput(self, key: Hashable, media_type: str, blob: bytes, raw_size: int = 0) -> bool:
+        if not self.enabled:
+            return False
+        spill = self._put_mem(key, media_type, blob, raw_size)
+        if spill is None:
+            return False
+        if spill:
+            await run_in_threadpool(self._spill, spill)
+        return True
+
+    def _store(self, key: Hashable, media_type: str, blob: bytes) -> List[_Entry]:
+        # Requiere self._lock tomado. Devuelve lo que hay que escribir a disco
+        # (el caller lo hace fuera del lock)
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old[1])
+        self._mem[key] = (media_type, blob)
+        self._mem_bytes += len(blob)
+        spill: List[_Entry] = []
+        while self._mem_bytes > self.max_bytes and self._mem:
+            old_key, (old_type, old_blob) = self._mem.popitem(last=False)
+            self._mem_bytes -= len(old_blob)
+            self.evictions += 1
+            # lo que ya está en disco (p.ej. promovido desde ahí) no se reescribe
+            if self.spill_dir and self._file_name(old_key) not in self._disk:
+                spill.append((old_key, old_type, old_blob))
+        return spill
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+            drop = list(self._disk)
+            self._disk.clear()
+            self._disk_bytes = 0
+        for name in drop:
+            try:
+                os.remove(os.path.join(self.spill_dir, name))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._mem),
+                "bytes": self._mem_bytes,
+                "max_bytes": self.max_bytes,
+                "max_entry_bytes": self.max_entry_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.spill_max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "spilled": self.spilled,
+                "skipped_large": self.skipped_large,
+                "compression_ratio": round(self.raw_bytes_in / self.stored_bytes_in, 2) if self.stored_bytes_in else None,
+            }
@@ -0,0 +1,329 @@
+"""
+Profiler por muestreo de stacks, solo ADMIN, para ver dónde se va el tiempo
+de un endpoint (p.ej. /search: _score vs JSON vs pydantic) en producción.
+
+- PROFILING_ENABLED=true instala el middleware y /admin/profiler/*. Sin eso no
+  hay nada en el camino del request.
+- Con el middleware instalado pero sin sesión activa, el costo por request es
+  leer un atributo.
+- Una sesión (POST /admin/profiler/start) dura a lo sumo 300s y muestrea una
+  fracción de los requests (sample_rate, opcional path_prefix).
+- Un thread toma sys._current_frames() cada interval_ms mientras haya requests
+  muestreados en curso. Se cuenta un stack cuando contiene el frame del
+  middleware de uno de esos requests: así cada muestra queda atribuida a su
+  request aunque el event loop intercale otras corutinas.
+- Handlers y dependencias `def` (p.ej. /search) corren en el threadpool de
+  AnyIO, fuera de ese stack: install() envuelve el run_in_threadpool de FastAPI
+  para que el worker que atiende un request muestreado se registre (thread id ->
+  request) mientras corre. Esas muestras también cuelgan de la ruta.
+- Cualquier otro thread (workers con requests no muestreados, executor de
+  upstreams) no se cuenta.
+
+GET /admin/profiler/collapsed devuelve el formato "collapsed stacks"
+(frame;frame;frame N), que entienden flamegraph.pl, speedscope e inferno.
+"""
+
+import contextvars
+import functools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+from app.auth import get_current_user, require_role
+
+router = APIRouter(tags=["admin"])
+
+_MAX_DURATION_S = 300
+# stacks distintos por sesión: lo que exceda se cuenta como "[truncated]"
+_MAX_STACKS = 20000
+
+
+def enabled() -> bool:
+    return os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+
+
+_FRAME_NAMES: Dict[Any, str] = {}
+# hojas de threads ociosos (workers esperando trabajo, selector del loop): no son costo
+_IDLE_LEAVES = {("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("queue.py", "get"), ("selectors.py", "select")}
+
+
+def _idle(code: Any) -> bool:
+    return (code.co_filename.rsplit("/", 1)[-1], code.co_name) in _IDLE_LEAVES
+
+
+def _frame_name(code: Any) -> str:
+    name = _FRAME_NAMES.get(code)
+    if name is None:
+        parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+        where = "/".join(parts[-2:])
+        name = f"{where}:{getattr(code, 'co_qualname', code.co_name)}".replace(";", ":").replace(" ", "_")
+        _FRAME_NAMES[code] = name
+    return name
+
+
+class ProfileSession:
+    def __init__(self, duration_s: float, sample_rate: float, interval_ms: float, path_prefix: str, started_by: str):
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + duration_s
+        self.duration_s = duration_s
+        self.sample_rate = sample_rate
+        self.interval_s = interval_ms / 1000.0
+        self.path_prefix = path_prefix
+        self.started_by = started_by
+        self.stopped_at: Optional[float] = None
+        self.requests_seen = 0
+        self.requests_sampled = 0
+        self.samples = 0
+        self.errors = 0
+        self.stacks: Counter = Counter()
+
+    def should_sample(self, scope: Dict[str, Any]) -> bool:
+        path = scope.get("path", "")
+        if path.startswith("/admin/profiler") or not path.startswith(self.path_prefix):
+            return False
+        self.requests_seen += 1
+        if random.random() >= self.sample_rate:
+            return False
+        self.requests_sampled += 1
+        return True
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "active": self.stopped_at is None,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "duration_s": self.duration_s,
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval_s * 1000,
+            "path_prefix": self.path_prefix,
+            "started_by": self.started_by,
+            "requests_seen": self.requests_seen,
+            "requests_sampled": self.requests_sampled,
+            "samples": self.samples,
+            "sample_errors": self.errors,
+            "distinct_stacks": len(self.stacks),
+        }
+
+
+class SamplingProfiler:
+    def __init__(self) -> None:
+        # None = sin sesión: lo único que mira el middleware
+        self.session: Optional[ProfileSession] = None
+        self.last: Optional[ProfileSession] = None
+        # frame del middleware de cada request muestreado en curso -> scope
+        self._active: Dict[Any, Dict[str, Any]] = {}
+        # thread id del threadpool corriendo trabajo sync de un request muestreado -> scope
+        self._threads: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, session: ProfileSession) -> None:
+        with self._lock:
+            if self.session is not None:
+                raise HTTPException(status_code=409, detail="A profiling session is already running")
+            self.session = self.last = session
+            self._thread = threading.Thread(target=self._run, args=(session,), name="profiler-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> Optional[ProfileSession]:
+        with self._lock:
+            session, self.session = self.session, None
+            if session is not None and session.stopped_at is None:
+                session.stopped_at = time.time()
+        self._wake.set()
+        return session
+
+    def enter(self, frame: Any, scope: Dict[str, Any]) -> None:
+        self._active[frame] = scope
+        self._wake.set()
+
+    def exit(self, frame: Any) -> None:
+        self._active.pop(frame, None)
+
+    def enter_thread(self, tid: int, scope: Dict[str, Any]) -> None:
+        self._threads[tid] = scope
+        self._wake.set()
+
+    def exit_thread(self, tid: int) -> None:
+        self._threads.pop(tid, None)
+
+    def _sample(self, session: ProfileSession, own: int) -> None:
+        active = self._active
+        threads = self._threads
+        for tid, frame in sys._current_frames().items():
+            if tid == own or _idle(frame.f_code):
+                continue
+            # worker del threadpool: solo si está corriendo algo de un request muestreado
+            tagged = threads.get(tid)
+            names: List[str] = []
+            scope = None
+            f = frame
+            while f is not None:
+                if tagged is not None and f.f_code is _TAGGED_CODE:
+                    scope = tagged
+                    break
+                # una sola lectura: exit() puede sacar el frame desde el event loop entre medio
+                scope = active.get(f)
+                if scope is not None:
+                    break
+                names.append(_frame_name(f.f_code))
+                f = f.f_back
+            if scope is None or not names:
+                continue
+            route = scope.get("route")
+            root = f"{scope.get('method', '')} {getattr(route, 'path', scope.get('path', ''))}"
+            names.append(root.replace(";", ":").replace(" ", "_"))
+            key = ";".join(reversed(names))
+            if key not in session.stacks and len(session.stacks) >= _MAX_STACKS:
+                key = f"{names[-1]};[truncated]"
+            session.stacks[key] += 1
+            session.samples += 1
+
+    def _run(self, session: ProfileSession) -> None:
+        own = threading.get_ident()
+        while self.session is session:
+            if time.monotonic() >= session.deadline:
+                self.stop()
+                break
+            if not self._active and not self._threads:
+                # nada muestreado en curso: dormir hasta el próximo request o el fin
+                self._wake.wait(min(1.0, max(0.0, session.deadline - time.monotonic())))
+                self._wake.clear()
+                continue
+            try:
+                self._sample(session, own)
+            except Exception:
+                # una muestra rota (thread que terminó a mitad, etc.) no corta la sesión
+                session.errors += 1
+            time.sleep(session.interval_s)
+
+
+PROFILER = SamplingProfiler()
+
+# scope del request muestreado; el threadpool copia el contexto al worker
+_SAMPLED: "contextvars.ContextVar[Optional[Dict[str, Any]]]" = contextvars.ContextVar("profiler_sampled", default=None)
+
+
+def _run_tagged(scope: Dict[str, Any], func: Any, *args: Any, **kwargs: Any) -> Any:
+    tid = threading.get_ident()
+    PROFILER.enter_thread(tid, scope)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        PROFILER.exit_thread(tid)
+
+
+# el sampler corta el stack del worker en este frame (lo de abajo es AnyIO)
+_TAGGED_CODE = _run_tagged.__code__
+
+
+async def _run_in_threadpool(func: Any, *args: Any, **kwargs: Any) -> Any:
+    scope = _SAMPLED.get()
+    if scope is not None and PROFILER.session is not None:
+        func = functools.partial(_run_tagged, scope, func)
+    return await run_in_threadpool(func, *args, **kwargs)
+
+
+class ProfilerMiddleware:
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        session = PROFILER.session
+        if session is None or scope["type"] != "http" or not session.should_sample(scope):
+            await self.app(scope, receive, send)
+            return
+        # este frame queda en el stack del request mientras dure: es la marca del sampler
+        frame = sys._getframe()
+        PROFILER.enter(frame, scope)
+        token = _SAMPLED.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _SAMPLED.reset(token)
+            PROFILER.exit(frame)
+
+
+def install(app: Any) -> None:
+    import fastapi.dependencies.utils
+    import fastapi.routing
+
+    app.add_middleware(ProfilerMiddleware)
+    # handlers, dependencias y validación de respuesta `def` pasan por aquí
+    for module in (fastapi.routing, fastapi.dependencies.utils):
+        module.run_in_threadpool = _run_in_threadpool  # type: ignore[attr-defined]
+
+
+# -------- endpoints (ADMIN) --------
+
+
+def _admin(user: Dict[str, str] = Depends(get_current_user)) -> Dict[str, str]:
+    require_role(user, ["ADMIN"])
+    return user
+
+
+class ProfileStart(BaseModel):
+    duration_s: float = Field(30, gt=0, le=_MAX_DURATION_S)
+    sample_rate: float = Field(0.1, gt=0, le=1)
+    interval_ms: float = Field(5, ge=1, le=1000)
+    path_prefix: str = Field("/", description="Solo requests cuyo path empieza así (p.ej. /search)")
+
+
+def _functions(session: ProfileSession, top: int) -> List[Dict[str, Any]]:
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, n in session.stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += n
+        for name in set(frames[1:]):
+            total[name] += n
+    samples = session.samples or 1
+    return [
+        {"function": name, "self": n, "total": total[name], "self_pct": round(100 * n / samples, 2)}
+        for name, n in own.most_common(top)
+    ]
+
+
+@router.post("/admin/profiler/start")
+def start_profile(payload: ProfileStart, user: Dict[str, str] = Depends(_admin)) -> Dict[str, Any]:
+    session = ProfileSession(payload.duration_s, payload.sample_rate, payload.interval_ms, payload.path_prefix, user["email"])
+    PROFILER.start(session)
+    return session.info()
+
+
+@router.post("/admin/profiler/stop")
+def stop_profile(_user: Dict[str, str] = Depends(_admin)) -> Dict[str, Any]:
+    session = PROFILER.stop()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profiling session running")
+    return session.info()
+
+
+@router.get("/admin/profiler")
+def profile_status(
+    top: int = Query(30, ge=1, le=500), _user: Dict[str, str] = Depends(_admin)
+) -> Dict[str, Any]:
+    """Sesión activa (o la última) + funciones con más muestras propias."""
+    session = PROFILER.last
+    if session is None:
+        return {"session": None, "functions": []}
+    return {"session": session.info(), "functions": _functions(session, top)}
+
+
+@router.get("/admin/profiler/collapsed")
+def profile_collapsed(_user: Dict[str, str] = Depends(_admin)) -> PlainTextResponse:
+    session = PROFILER.last
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profiling session yet")
+    body = "".join(f"{stack} {n}\n" for stack, n in sorted(session.stacks.items()))
+    return PlainTextResponse(body, headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'})
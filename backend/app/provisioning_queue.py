@@ -0,0 +1,346 @@
+"""
+Cola local (SQLite) de jobs de provisioning + pool de workers.
+
+La decisión de una solicitud solo encola (milisegundos); los workers aplican el
+grant en BigQuery con reintentos:
+
+- idempotency_key UNIQUE: re-encolar lo mismo (retry del cliente, doble click)
+  retorna el job existente; si ese job está FAILED, se reencola (attempts en 0)
+- claim atómico (UPDATE ... RETURNING) con lease: si un worker muere, el job
+  vuelve a estar disponible cuando vence locked_until (sirve entre procesos),
+  salvo que ya haya agotado max_attempts: ahí queda FAILED
+- backoff exponencial con jitter para errores transitorios; los 4xx definitivos
+  fallan sin reintentar
+- los grants (dataset o tabla) no escriben si el usuario ya tiene el rol o uno
+  mayor (ver iam_provisioning.plan_*)
+
+Config:
+- ENABLE_PROVISIONING=true           encola grants al aprobar y levanta los workers
+- PROVISIONING_QUEUE_PATH=provisioning_jobs.db
+- PROVISIONING_WORKERS=4
+- PROVISIONING_MAX_ATTEMPTS=6
+- PROVISIONING_BACKOFF_BASE_S=2      espera = base * 2^(intento-1) (+ jitter), tope 300s
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+router = APIRouter(tags=["provisioning"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id              TEXT PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    kind            TEXT NOT NULL,
+    payload         TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    max_attempts    INTEGER NOT NULL,
+    next_run_at     REAL NOT NULL,
+    locked_until    REAL,
+    last_error      TEXT,
+    result          TEXT,
+    created_at      TEXT NOT NULL,
+    updated_at      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_runnable ON jobs (status, next_run_at);
+"""
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "QUEUED", "RUNNING", "SUCCEEDED", "FAILED"
+
+_LEASE_S = 120.0
+_BACKOFF_CAP_S = 300.0
+
+
+class PermanentError(Exception):
+    """El handler indica que reintentar no sirve."""
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _retryable(e: BaseException) -> bool:
+    if isinstance(e, (PermanentError, ValueError, KeyError)):
+        return False
+    code = getattr(e, "code", None)
+    if isinstance(code, int) and 400 <= code < 500:
+        # 408 timeout, 409 conflicto, 412 etag, 429 cuota: transitorios
+        return code in (408, 409, 412, 429)
+    return True
+
+
+def _grant_dataset_reader(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from app.iam_provisioning import grant_bigquery_viewers
+
+    return grant_bigquery_viewers(payload["project"], payload["dataset"], payload["emails"])
+
+
+def _grant_table_reader(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from app.iam_provisioning import grant_table_viewers
+
+    return grant_table_viewers(payload["project"], payload["dataset"], payload["table"], payload["emails"])
+
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "grant_dataset_reader": _grant_dataset_reader,
+    "grant_table_reader": _grant_table_reader,
+}
+
+
+class JobQueue:
+    def __init__(self, path: str, max_attempts: int = 6, backoff_base_s: float = 2.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base_s = backoff_base_s
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], idempotency_key: str) -> Dict[str, Any]:
+        """
+        Encola, o retorna el job existente con la misma idempotency_key. Un job
+        existente FAILED se reencola (nuevo intento, attempts en 0): re-aprobar
+        tiene que poder reintentar el grant.
+        """
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = _now_iso()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, idempotency_key, kind, payload, status, max_attempts, next_run_at, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(idempotency_key) DO UPDATE SET status = excluded.status, attempts = 0, "
+                "payload = excluded.payload, max_attempts = excluded.max_attempts, "
+                "next_run_at = excluded.next_run_at, locked_until = NULL, result = NULL, "
+                "updated_at = excluded.updated_at WHERE jobs.status = 'FAILED'",
+                (str(uuid.uuid4()), idempotency_key, kind, json.dumps(payload), QUEUED,
+                 self.max_attempts, time.time(), now, now),
+            )
+            row = self._conn.execute("SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        self._wake.set()
+        return self._job(row)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM jobs"
+        params: List[Any] = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._job(r) for r in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Toma el próximo job listo (o con lease vencido) en una sola sentencia.
+        Un lease vencido con los intentos agotados (el worker murió en el último)
+        pasa a FAILED en vez de reclamarse de nuevo.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, locked_until = NULL, updated_at = ?, "
+                "last_error = 'lease expired after ' || attempts || ' attempts' "
+                "WHERE status = ? AND locked_until < ? AND attempts >= max_attempts",
+                (FAILED, _now_iso(), RUNNING, now),
+            )
+            row = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, locked_until = ?, updated_at = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE (status = ? AND next_run_at <= ?) "
+                "OR (status = ? AND locked_until < ? AND attempts < max_attempts) "
+                "ORDER BY next_run_at LIMIT 1) RETURNING *",
+                (RUNNING, now + _LEASE_S, _now_iso(), QUEUED, now, RUNNING, now),
+            ).fetchone()
+        return self._job(row)
+
+    def complete(self, job: Dict[str, Any], result: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, last_error = NULL, locked_until = NULL, updated_at = ? "
+                "WHERE id = ?",
+                (SUCCEEDED, json.dumps(result, default=str), _now_iso(), job["id"]),
+            )
+
+    def fail(self, job: Dict[str, Any], error: BaseException) -> None:
+        retry = _retryable(error) and job["attempts"] < job["max_attempts"]
+        delay = min(self.backoff_base_s * 2 ** (job["attempts"] - 1), _BACKOFF_CAP_S)
+        delay *= random.uniform(0.8, 1.2)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, next_run_at = ?, last_error = ?, locked_until = NULL, updated_at = ? "
+                "WHERE id = ?",
+                (QUEUED if retry else FAILED, time.time() + delay, f"{type(error).__name__}: {error}",
+                 _now_iso(), job["id"]),
+            )
+
+    def next_due_in(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_run_at) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ProvisioningWorkers:
+    """N threads que toman jobs de la cola y corren su handler."""
+
+    def __init__(self, queue: JobQueue, workers: int = 4, idle_s: float = 5.0):
+        self.queue = queue
+        self.idle_s = idle_s
+        self.processed = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"provisioning-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+
+    def start(self) -> None:
+        for t in self._threads:
+            t.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.queue._wake.set()
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def run_one(self) -> bool:
+        """Procesa un job si hay uno listo; False si la cola no tenía nada."""
+        job = self.queue.claim()
+        if job is None:
+            return False
+        try:
+            result = HANDLERS[job["kind"]](job["payload"])
+        except Exception as e:
+            self.queue.fail(job, e)
+            self.failed += 1
+        else:
+            self.queue.complete(job, result)
+        self.processed += 1
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.run_one():
+                    continue
+                due = self.queue.next_due_in()
+            except Exception:
+                due = None
+            # espera al próximo reintento programado o a un enqueue
+            self.queue._wake.wait(self.idle_s if due is None else min(due, self.idle_s))
+            self.queue._wake.clear()
+
+
+_QUEUE: Optional[JobQueue] = None
+_WORKERS: Optional[ProvisioningWorkers] = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.getenv("ENABLE_PROVISIONING", "false").lower() == "true"
+
+
+def get_queue() -> JobQueue:
+    global _QUEUE
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            _QUEUE = JobQueue(
+                os.getenv("PROVISIONING_QUEUE_PATH", "provisioning_jobs.db"),
+                max_attempts=int(os.getenv("PROVISIONING_MAX_ATTEMPTS", "6")),
+                backoff_base_s=float(os.getenv("PROVISIONING_BACKOFF_BASE_S", "2")),
+            )
+        return _QUEUE
+
+
+def start_from_env() -> Optional[ProvisioningWorkers]:
+    global _WORKERS
+    if not enabled():
+        return None
+    _WORKERS = ProvisioningWorkers(get_queue(), int(os.getenv("PROVISIONING_WORKERS", "4")))
+    _WORKERS.start()
+    return _WORKERS
+
+
+def stop() -> None:
+    global _QUEUE, _WORKERS
+    if _WORKERS is not None:
+        _WORKERS.stop()
+        _WORKERS = None
+    with _QUEUE_LOCK:
+        if _QUEUE is not None:
+            _QUEUE.close()
+            _QUEUE = None
+
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in job.items() if k not in ("locked_until", "next_run_at")} | {
+        "next_run_in_s": round(max(0.0, job["next_run_at"] - time.time()), 1) if job["status"] == QUEUED else None
+    }
+
+
+@router.get("/provisioning/jobs/{job_id}")
+def get_job(job_id: str) -> Dict[str, Any]:
+    job = get_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _public(job)
+
+
+@router.get("/provisioning/jobs")
+def list_jobs(
+    status: Optional[str] = Query(default=None, description="QUEUED/RUNNING/SUCCEEDED/FAILED"),
+    limit: int = Query(default=50, ge=1, le=500),
+) -> Dict[str, Any]:
+    q = get_queue()
+    return {
+        "items": [_public(j) for j in q.list(status=status, limit=limit)],
+        "counts": q.counts(),
+        "workers": len(_WORKERS._threads) if _WORKERS else 0,
+    }
+
+
+@router.get("/provisioning/stats")
+def provisioning_stats() -> Dict[str, Any]:
+    from app.iam_provisioning import grant_scope, grant_stats
+
+    return {"jobs": get_queue().counts(), "grant_scope": grant_scope(), "grants": grant_stats()}
@@ -0,0 +1,233 @@
+"""
+Inverted index for /search (MVP).
+
+Se construye una sola vez al cargar el catálogo y evita el full scan por query:
+- posting lists de trigramas por campo (display_name, domain, description, tags, system, type)
+- los tokens >= 3 chars se resuelven intersectando postings y verificando el substring
+- los tokens cortos (1-2 chars) se resuelven con el vocabulario de trigramas del campo
+- bitmaps (int como bitset) por valor de faceta (system/type/domain/tags): los filtros
+  son un AND de bitmaps antes de puntuar, y los conteos de facetas un popcount
+
+El ranking es el mismo de gcp_catalog._score (pesos + bonus "all tokens present").
+"""
+
+from array import array
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.catalog_asset import (
+    ALL_TOKENS_BONUS,
+    EXACT_NAME_BONUS,
+    FIELD_WEIGHTS,
+    CatalogAsset,
+    norm,
+)
+
+GRAM = 3
+
+FACETS = ("system", "type", "domain", "tags")
+
+
+def tokenize(q: str) -> List[str]:
+    q = norm(q)
+    if not q:
+        return []
+    return [t for t in q.replace(",", " ").split() if t]
+
+
+def bits_from_ids(ids: Iterable[int], n: int) -> int:
+    buf = bytearray((n + 7) // 8)
+    for d in ids:
+        buf[d >> 3] |= 1 << (d & 7)
+    return int.from_bytes(buf, "little")
+
+
+def ids_from_bits(mask: int) -> List[int]:
+    """Doc ids (ascendentes) con bit encendido; bin() + find evita shifts O(N) por bit."""
+    bits = bin(mask)[:1:-1]
+    out: List[int] = []
+    i = bits.find("1")
+    while i != -1:
+        out.append(i)
+        i = bits.find("1", i + 1)
+    return out
+
+
+def _grams(value: str) -> Set[str]:
+    # Valores más cortos que GRAM se indexan completos (si no, no tendrían llave)
+    if len(value) < GRAM:
+        return {value} if value else set()
+    return {value[i:i + GRAM] for i in range(len(value) - GRAM + 1)}
+
+
+class SearchIndex:
+    """
+    Índice invertido inmutable sobre registros CatalogAsset.
+    Los doc ids son la posición del registro en la lista original.
+    """
+
+    def __init__(self, assets: Iterable[Any]):
+        self.records: List[CatalogAsset] = [
+            a if isinstance(a, CatalogAsset) else CatalogAsset(a) for a in assets
+        ]
+        # array("I") en vez de list: 4 bytes por posting en catálogos grandes
+        self.postings: Dict[str, Dict[str, array]] = {f: {} for f, _ in FIELD_WEIGHTS}
+        self.by_name: Dict[str, List[int]] = {}
+        # faceta -> valor normalizado -> bitmap de doc ids
+        self.facets: Dict[str, Dict[str, int]] = {}
+        # faceta -> valor normalizado -> valor tal como viene en el catálogo (para mostrar)
+        self.facet_labels: Dict[str, Dict[str, str]] = {f: {} for f in FACETS}
+
+        getters = [(self.postings[f], attrgetter(f)) for f, _ in FIELD_WEIGHTS]
+        for doc_id, rec in enumerate(self.records):
+            for field_postings, get in getters:
+                for g in _grams(get(rec)):
+                    docs = field_postings.get(g)
+                    if docs is None:
+                        docs = field_postings[g] = array("I")
+                    docs.append(doc_id)
+            self.by_name.setdefault(rec.display_name, []).append(doc_id)
+
+        self._build_facets()
+
+    def _build_facets(self) -> None:
+        n = len(self.records)
+        ids: Dict[str, Dict[str, List[int]]] = {f: {} for f in FACETS}
+        for doc_id, rec in enumerate(self.records):
+            raw = rec.raw
+            for f in ("system", "type", "domain"):
+                value = getattr(rec, f)
+                ids[f].setdefault(value, []).append(doc_id)
+                self.facet_labels[f].setdefault(value, raw.get(f) or "")
+            for label in raw.get("tags") or []:
+                tag = norm(label)
+                ids["tags"].setdefault(tag, []).append(doc_id)
+                self.facet_labels["tags"].setdefault(tag, label)
+        self.facets = {f: {v: bits_from_ids(d, n) for v, d in values.items()} for f, values in ids.items()}
+
+    def filter_mask(self, filters: Dict[str, List[str]]) -> Optional[int]:
+        """
+        AND de bitmaps para {faceta: [valores normalizados]}.
+        None significa "sin filtro" (todos los docs).
+        """
+        mask: Optional[int] = None
+        for f, values in filters.items():
+            for v in values:
+                m = self.facets[f].get(v, 0)
+                mask = m if mask is None else mask & m
+                if not mask:
+                    return 0
+        return mask
+
+    def facet_counts(self, mask: Optional[int]) -> Dict[str, List[Dict[str, Any]]]:
+        """Conteo por valor de faceta sobre `mask` (popcount de cada bitmap AND mask)."""
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        for f, values in self.facets.items():
+            labels = self.facet_labels[f]
+            counts = []
+            for v, bm in values.items():
+                if not v:
+                    continue
+                c = bm.bit_count() if mask is None else (bm & mask).bit_count()
+                if c:
+                    counts.append({"value": labels.get(v) or v, "count": c})
+            counts.sort(key=lambda x: (-x["count"], x["value"]))
+            out[f] = counts
+        return out
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _docs_containing(self, field: str, token: str, allowed: Optional[Set[int]] = None) -> Set[int]:
+        """
+        Doc ids cuyo campo normalizado contiene `token` como substring (exacto),
+        restringidos a `allowed` si viene.
+        """
+        field_postings = self.postings[field]
+
+        if len(token) < GRAM:
+            # Toda ocurrencia de un token corto cae dentro de algún trigrama (o valor corto) indexado
+            hits: Set[int] = set()
+            for g, docs in field_postings.items():
+                if token in g:
+                    hits.update(docs)
+            if allowed is not None:
+                hits.intersection_update(allowed)
+            return hits
+
+        lists = []
+        for g in _grams(token):
+            docs = field_postings.get(g)
+            if not docs:
+                return set()
+            lists.append(docs)
+        lists.sort(key=len)
+
+        cand = set(lists[0])
+        if allowed is not None:
+            cand.intersection_update(allowed)
+        for docs in lists[1:]:
+            cand.intersection_update(docs)
+            if not cand:
+                return cand
+
+        get = attrgetter(field)
+        records = self.records
+        return {d for d in cand if token in get(records[d])}
+
+    def score(self, tokens: List[str], allowed: Optional[Set[int]] = None) -> Dict[int, float]:
+        """
+        Retorna {doc_id: score} para los docs (dentro de `allowed`, si viene) que
+        contienen al menos un token.
+        Mantiene la semántica de _score: tokens repetidos suman de nuevo.
+        """
+        scores: Dict[int, float] = {}
+        matched: Dict[int, Set[str]] = {}
+        hits_cache: Dict[Tuple[str, str], Set[int]] = {}
+
+        for t in tokens:
+            if not t:
+                continue
+            for d in self.by_name.get(t, ()):
+                if allowed is None or d in allowed:
+                    scores[d] = scores.get(d, 0.0) + EXACT_NAME_BONUS
+            for field, weight in FIELD_WEIGHTS:
+                key = (field, t)
+                docs = hits_cache.get(key)
+                if docs is None:
+                    docs = hits_cache[key] = self._docs_containing(field, t, allowed)
+                for d in docs:
+                    scores[d] = scores.get(d, 0.0) + weight
+                    matched.setdefault(d, set()).add(t)
+
+        wanted = {t for t in tokens if t}
+        for d, found in matched.items():
+            if found == wanted:
+                scores[d] += ALL_TOKENS_BONUS
+
+        # Un match exacto de display_name implica match por substring: todo doc en
+        # `scores` contiene al menos un token.
+        return scores
+
+    def search(self, tokens: List[str], mask: Optional[int] = None) -> List[Tuple[float, int]]:
+        """
+        Retorna [(score, doc_id)] de los docs dentro de `mask` (bitmap de facetas;
+        None = todos) que, si hay tokens, contienen al menos uno. Sin orden.
+        """
+        if mask == 0:
+            return []
+
+        allowed = None if mask is None else ids_from_bits(mask)
+        if tokens:
+            scores = self.score(tokens, None if allowed is None else set(allowed))
+            return [(s, d) for d, s in scores.items()]
+
+        if allowed is None:
+            return [(0.0, d) for d in range(len(self.records))]
+        return [(0.0, d) for d in allowed]
+
+    def match_mask(self, tokens: List[str], mask: Optional[int] = None) -> Optional[int]:
+        """Bitmap de los docs que matchean tokens + facetas (None = todos)."""
+        if not tokens:
+            return mask
+        return bits_from_ids((d for _, d in self.search(tokens, mask)), len(self.records))
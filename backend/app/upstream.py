@@ -0,0 +1,116 @@
+"""
+Llamadas a upstreams (Dataplex / BigQuery) desde handlers async.
+
+Los SDKs de Google son bloqueantes. En vez de usar handlers `def` (que ocupan el
+threadpool de Starlette y dejan sin workers a /health o /audit), los handlers son
+`async def` y las llamadas bloqueantes van a un executor propio:
+
+- UPSTREAM_MAX_WORKERS: threads del executor de upstreams (default 32)
+- UPSTREAM_MAX_CONCURRENCY: llamadas simultáneas por upstream (default 16)
+- UPSTREAM_TIMEOUT_S: timeout por llamada (default 15)
+
+Instrumentación: hooks (add_hook) reciben upstream_start(name) y
+upstream_end(name, seconds, outcome) con outcome ok|error|timeout, tanto desde
+run_blocking como desde track() (llamadas SDK en threads propios: workers, sinks).
+"""
+
+import asyncio
+import functools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_MAX_WORKERS = int(os.getenv("UPSTREAM_MAX_WORKERS", "32"))
+_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "16"))
+DEFAULT_TIMEOUT_S = float(os.getenv("UPSTREAM_TIMEOUT_S", "15"))
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="upstream")
+# Un semáforo por (event loop, upstream): asyncio.Semaphore queda atado al loop que lo usa
+_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+# Objetos con upstream_start(name) / upstream_end(name, seconds, outcome); ver app.metrics
+_HOOKS: List[Any] = []
+
+
+def add_hook(hook: Any) -> None:
+    if hook not in _HOOKS:
+        _HOOKS.append(hook)
+
+
+def _start(upstream: str) -> float:
+    for h in _HOOKS:
+        h.upstream_start(upstream)
+    return perf_counter()
+
+
+def _end(upstream: str, t0: float, outcome: str) -> None:
+    seconds = perf_counter() - t0
+    for h in _HOOKS:
+        h.upstream_end(upstream, seconds, outcome)
+
+
+@contextmanager
+def track(upstream: str) -> Iterator[None]:
+    """Para llamadas SDK bloqueantes fuera de run_blocking: `with track("bigquery"): ...`"""
+    t0 = _start(upstream)
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        _end(upstream, t0, outcome)
+
+
+class UpstreamTimeout(Exception):
+    def __init__(self, upstream: str, timeout_s: float):
+        super().__init__(f"{upstream} call timed out after {timeout_s}s")
+        self.upstream = upstream
+        self.timeout_s = timeout_s
+
+
+def _semaphore(upstream: str) -> asyncio.Semaphore:
+    per_loop = _SEMAPHORES.setdefault(asyncio.get_running_loop(), {})
+    sem = per_loop.get(upstream)
+    if sem is None:
+        sem = per_loop[upstream] = asyncio.Semaphore(_MAX_CONCURRENCY)
+    return sem
+
+
+async def run_blocking(
+    upstream: str,
+    fn: Callable[..., Any],
+    *args: Any,
+    timeout_s: Optional[float] = None,
+    **kwargs: Any,
+) -> Any:
+    """
+    Ejecuta fn(*args, **kwargs) en el executor de upstreams, con límite de
+    concurrencia por `upstream` y timeout (UpstreamTimeout).
+    El timeout libera al request; el thread sigue hasta que el SDK retorne.
+    """
+    timeout_s = DEFAULT_TIMEOUT_S if timeout_s is None else timeout_s
+    loop = asyncio.get_running_loop()
+
+    async def _call() -> Any:
+        async with _semaphore(upstream):
+            return await loop.run_in_executor(_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+    # la latencia medida incluye la espera por un cupo del semáforo (lo que ve el request)
+    t0 = _start(upstream)
+    outcome = "error"
+    try:
+        # el timeout cubre también la espera por un cupo del semáforo
+        result = await asyncio.wait_for(_call(), timeout_s)
+        outcome = "ok"
+        return result
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise UpstreamTimeout(upstream, timeout_s)
+    finally:
+        _end(upstream, t0, outcome)
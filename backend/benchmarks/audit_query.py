@@ -0,0 +1,102 @@
+"""
+Consultas de auditoría sobre segmentos indexados (audit_index).
+
+    cd backend && python -m benchmarks.audit_query [events] [dir]
+
+Genera `events` eventos sintéticos (default 1M; 10M tarda unos minutos) repartidos
+en 30 días con SegmentFileSink (segmentos por hora + sidecar) y mide consultas
+típicas de GET /audit: en frío (carga sidecars) y en caliente (p50 de 20 corridas).
+Si `dir` ya tiene segmentos se reutilizan.
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from app.audit_index import AuditQueryEngine
+from app.audit_sink import SegmentFileSink
+
+_DAYS = 30
+_ACTORS = 2000
+_RESOURCES = 5000
+
+
+def generate(directory: str, n: int) -> None:
+    rnd = random.Random(7)
+    sink = SegmentFileSink(directory)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+    step = _DAYS * 86400 / n
+    batch = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        # actores con distribución sesgada: unos pocos generan la mayoría de eventos
+        actor = f"user{int(rnd.paretovariate(1.2)) % _ACTORS}@example.com"
+        batch.append(
+            {
+                "ts": datetime.fromtimestamp(start + i * step, timezone.utc).isoformat(),
+                "actor": actor,
+                "action": "ACCESS_REQUEST_APPROVED" if i % 3 else "PREVIEW",
+                "resource": f"bigquery://demo.ds{i % 40}.t{rnd.randrange(_RESOURCES)}",
+                "details": {"request_id": f"r{i}"},
+                "event_id": f"bench-{i}",
+            }
+        )
+        if len(batch) == 1000:
+            sink.write(batch)
+            batch = []
+    if batch:
+        sink.write(batch)
+    sink.close()
+    print(f"generated {n} events in {time.perf_counter() - t0:.1f}s")
+
+
+def _time(engine, kwargs, reps=20):
+    t0 = time.perf_counter()
+    first = engine.query(**kwargs)
+    cold = (time.perf_counter() - t0) * 1000
+    warm = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        engine.query(**kwargs)
+        warm.append((time.perf_counter() - t0) * 1000)
+    return cold, statistics.median(warm), first
+
+
+def main(n: int, directory: str) -> None:
+    os.makedirs(directory, exist_ok=True)
+    if not any(name.endswith(".idx") for name in os.listdir(directory)):
+        generate(directory, n)
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+    print(f"{directory}: {len(os.listdir(directory)) // 2} segments, {size / 2**20:.0f} MiB")
+
+    day = 86400
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+    cases = [
+        ("newest 50", {}),
+        ("actor (frequent)", {"actor": "user1@example.com"}),
+        ("actor (rare)", {"actor": f"user{_ACTORS - 7}@example.com"}),
+        ("resource", {"resource": "bigquery://demo.ds3.t1203"}),
+        ("actor + resource", {"actor": "user1@example.com", "resource": "bigquery://demo.ds3.t1203"}),
+        ("range 1 day", {"ts_from": start + 10 * day, "ts_to": start + 11 * day}),
+        ("actor + range 1 week", {"actor": "user2@example.com", "ts_from": start + 7 * day, "ts_to": start + 14 * day}),
+        ("no match", {"actor": "nobody@example.com"}),
+    ]
+    engine = AuditQueryEngine(directory, cache_segments=_DAYS * 24)
+    print(f"{'query':<22} {'cold ms':>9} {'warm ms':>9} {'items':>6} {'searched':>9} {'skipped':>8}")
+    for label, kwargs in cases:
+        cold, warm, res = _time(engine, {**kwargs, "limit": 50})
+        st = res["stats"]
+        skipped = st["skipped_by_name"] + st["skipped_by_index"]
+        print(f"{label:<22} {cold:9.1f} {warm:9.2f} {len(res['items']):6d} {st['searched']:9d} {skipped:8d}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if args else 1_000_000,
+        args[1] if len(args) > 1 else os.path.join(tempfile.gettempdir(), "audit_query_bench"),
+    )
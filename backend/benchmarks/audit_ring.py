@@ -0,0 +1,123 @@
+"""
+audit_log: list.insert(0) + del (original) vs ring buffer (deque maxlen).
+
+    cd backend && python -m benchmarks.audit_ring [events_per_s] [seconds] [capacity]
+
+Dos pasadas por implementación, con el buffer ya lleno (capacidad default 5000,
+el caso estable en producción):
+  - sin pausa: costo por append (ns/op)
+  - a ritmo fijo (default 10k eventos/s): latencia p50/p99 por llamada y % de un
+    core que se va en auditar
+Al final, costo de leer los 50 más recientes (lo que hace GET /audit).
+"""
+
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+from app import audit
+
+
+class ListAudit:
+    """La implementación original, tal cual."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.items = []
+
+    def log(self, actor, action, resource, details=None):
+        self.items.insert(
+            0,
+            {
+                "ts": datetime.now(timezone.utc).isoformat(),
+                "actor": actor,
+                "action": action,
+                "resource": resource,
+                "details": details or {},
+            },
+        )
+        if len(self.items) > self.capacity:
+            del self.items[self.capacity:]
+
+    def newest(self, n):
+        return self.items[:n]
+
+
+class RingAudit:
+    """app.audit con capacidad propia."""
+
+    def __init__(self, capacity: int):
+        audit._AUDIT = audit.deque(maxlen=capacity)
+
+    def log(self, actor, action, resource, details=None):
+        audit.audit_log(actor, action, resource, details)
+
+    def newest(self, n):
+        with audit._AUDIT_LOCK:
+            recs = list(islice(audit._AUDIT, n))
+        return [audit._to_item(r) for r in recs]
+
+
+def _fill(impl, capacity):
+    for i in range(capacity):
+        impl.log("warmup@x.com", "ACCESS_REQUEST_APPROVED", f"bigquery://p.d.t{i}", {"request_id": str(i)})
+
+
+def _unpaced(impl, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        impl.log("bench@x.com", "ACCESS_REQUEST_APPROVED", "bigquery://p.d.t", {"request_id": str(i)})
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def _paced(impl, rate, seconds):
+    interval = 1.0 / rate
+    lat = []
+    start = time.perf_counter()
+    next_at = start
+    for i in range(int(rate * seconds)):
+        while time.perf_counter() < next_at:
+            pass
+        t0 = time.perf_counter()
+        impl.log("bench@x.com", "ACCESS_REQUEST_APPROVED", "bigquery://p.d.t", {"request_id": str(i)})
+        lat.append(time.perf_counter() - t0)
+        next_at += interval
+    wall = time.perf_counter() - start
+    lat.sort()
+    return {
+        "p50_us": statistics.median(lat) * 1e6,
+        "p99_us": lat[int(len(lat) * 0.99) - 1] * 1e6,
+        "busy": sum(lat) / wall,
+        "achieved": len(lat) / wall,
+    }
+
+
+def _read(impl, n=50, reps=2000):
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        impl.newest(n)
+    return (time.perf_counter() - t0) / reps * 1e6
+
+
+def main(rate: int, seconds: float, capacity: int) -> None:
+    print(f"capacity {capacity}, paced {rate} events/s for {seconds}s")
+    print(f"{'impl':<8} {'ns/op':>9} {'p50 us':>8} {'p99 us':>8} {'core %':>7} {'ev/s':>8} {'read50 us':>10}")
+    for name, cls in (("list", ListAudit), ("ring", RingAudit)):
+        impl = cls(capacity)
+        _fill(impl, capacity)
+        ns = _unpaced(impl, 50_000)
+        p = _paced(impl, rate, seconds)
+        read_us = _read(impl)
+        print(f"{name:<8} {ns:9.0f} {p['p50_us']:8.2f} {p['p99_us']:8.2f} {p['busy'] * 100:6.1f}% "
+              f"{p['achieved']:8.0f} {read_us:10.1f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if len(args) > 0 else 10_000,
+        float(args[1]) if len(args) > 1 else 3.0,
+        int(args[2]) if len(args) > 2 else audit.AUDIT_MAX_EVENTS,
+    )
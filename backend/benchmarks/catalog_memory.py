@@ -0,0 +1,57 @@
+"""
+Memoria del catálogo: list-of-dicts vs registros CatalogAsset (__slots__).
+
+    cd backend && python -m benchmarks.catalog_memory [n]
+
+Compara, sobre un catálogo sintético (default 500k):
+  - dicts originales (lo que ya vive en memoria)
+  - copia normalizada como dicts (lo que haría precomputar "a mano")
+  - registros CatalogAsset (campos normalizados + frozenset de tags + haystack)
+Los registros referencian el dict original (`raw`), así que se reporta el costo
+incremental de cada representación normalizada.
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from app.catalog_asset import CatalogAsset, norm
+from benchmarks.synthetic import synthetic_assets
+
+
+def _normalized_dict(a):
+    tags = [norm(t) for t in (a.get("tags") or [])]
+    dn, desc, domain = norm(a.get("display_name", "")), norm(a.get("description", "")), norm(a.get("domain", ""))
+    sys_, typ = norm(a.get("system", "")), norm(a.get("type", ""))
+    joined = " ".join(tags)
+    return {
+        "raw": a, "display_name": dn, "description": desc, "domain": domain, "system": sys_, "type": typ,
+        "tags": tags, "tags_text": joined, "haystack": " ".join([dn, domain, desc, joined, sys_, typ]),
+    }
+
+
+def _measure(label, build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - t0
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} {current / 2**20:9.1f} MiB  {elapsed:6.2f}s")
+    return obj
+
+
+def main(n: int) -> None:
+    print(f"synthetic catalog: {n} assets")
+    assets = _measure("list-of-dicts (raw)", lambda: synthetic_assets(n))
+    normalized = _measure("+ normalized dicts", lambda: [_normalized_dict(a) for a in assets])
+    del normalized
+    records = _measure("+ CatalogAsset records (__slots__)", lambda: [CatalogAsset(a) for a in assets])
+    print(f"per record: dict {sys.getsizeof(_normalized_dict(assets[0]))} B shell, "
+          f"CatalogAsset {sys.getsizeof(records[0])} B shell")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
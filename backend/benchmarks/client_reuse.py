@@ -0,0 +1,47 @@
+"""
+Latencia de get_table: bigquery.Client nuevo por request vs cliente del registro.
+
+    cd backend && python -m benchmarks.client_reuse [n] [handshake_ms]
+
+Corre contra el fake REST local (app/fake_bigquery.py). `handshake_ms` simula el
+costo de abrir conexión (TLS + auth) que en GCP se paga con cada cliente nuevo.
+"""
+
+import os
+import statistics
+import sys
+import time
+
+from app import fake_bigquery, gcp_clients
+
+TABLE = "demo.retail.sales_daily_gold"
+
+
+def _run(label, get_client, n):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        get_client().get_table(TABLE)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<24} mean {statistics.mean(samples):7.2f} ms  p50 {samples[len(samples) // 2]:7.2f} ms  p95 {p95:7.2f} ms")
+
+
+def main(n: int, handshake_ms: float) -> None:
+    server = fake_bigquery.serve(handshake_ms=handshake_ms)
+    os.environ["BIGQUERY_API_ENDPOINT"] = fake_bigquery.endpoint(server)
+    print(f"{n} x get_table({TABLE}) against {os.environ['BIGQUERY_API_ENDPOINT']} (handshake {handshake_ms} ms)")
+    try:
+        _run("new client per call", lambda: gcp_clients.new_bigquery_client("demo"), n)
+        _run("pooled client", lambda: gcp_clients.bigquery_client("demo"), n)
+    finally:
+        gcp_clients.close_all()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20.0,
+    )
@@ -0,0 +1,432 @@
+"""
+Suite de endpoints: search, facets, schema, preview, access requests y audit
+contra la app FastAPI completa (middlewares incluidos), in-process.
+
+    cd backend && python -m benchmarks.endpoints                      # compara con el baseline
+    cd backend && python -m benchmarks.endpoints --save               # guarda baseline nuevo
+    cd backend && python -m benchmarks.endpoints --sizes 1000,1000000 --only search
+
+- Catálogo sintético (synthetic_assets) por cada --sizes; historial de
+  solicitudes (synthetic_access_requests, --history) en un SQLite temporal.
+- Schema / preview van contra el fake BigQuery REST en otro proceso (MOCK_MODE=false),
+  con cache de schema / preview en su config por defecto.
+- GET /audit: filtros por actor / resource sobre el ring en memoria (lleno con
+  AUDIT_MAX_EVENTS eventos) y sobre segmentos indexados (AUDIT_SINKS=segments,
+  --audit-events eventos generados como en benchmarks.audit_query).
+- Cada grupo (un tamaño de catálogo, governance) corre en su propio proceso:
+  el pico de RSS (ru_maxrss) de un grupo no se arrastra al siguiente. Dentro del
+  grupo el pico es acumulado, en el orden de los escenarios.
+- Por escenario: --requests requests tras un warmup, con --concurrency clientes
+  (httpx ASGITransport). Reporta p50/p95/p99 ms, req/s, pico de RSS y errores.
+
+Baseline: benchmarks/baselines/endpoints.json. Regresión = p50/p95 (p99: el doble
+de tolerancia) o RSS por encima de baseline * (1 + threshold), o req/s por debajo de
+baseline * (1 - threshold), con un mínimo absoluto (1 ms, 8 MiB) para no marcar
+ruido en escenarios sub-ms. Sale con 1 si hay regresiones. Los números dependen
+de la máquina: comparar contra un baseline guardado en la misma (ver "machine"
+en el JSON). Con otras opciones de carga (--history, --requests, ...) que las del
+baseline no se compara (sale con 2); --sizes y --only solo eligen escenarios.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "endpoints.json")
+
+# (method, url, params, json body, headers)
+Call = Tuple[str, str, Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[Dict[str, str]]]
+
+# chequeo por respuesta: mensaje si el request no fue por el camino que se quiere medir
+Check = Callable[[Any], Optional[str]]
+
+# opciones que cambian los números: si difieren del baseline no se compara
+_LOAD_OPTIONS = ("history", "audit_events", "requests", "warmup", "concurrency")
+
+# diferencias absolutas por debajo de esto no cuentan como regresión
+_MIN_DELTA_MS = 1.0
+_MIN_DELTA_MIB = 8.0
+
+
+def _peak_rss_mib() -> float:
+    # linux: KiB; macOS: bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def _pct(sorted_ms: List[float], p: float) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(round(p / 100 * (len(sorted_ms) - 1))))]
+
+
+async def _run_scenario(
+    client: Any, make_call: Callable[[int], Call], n: int, warmup: int, concurrency: int, check: Optional[Check] = None
+) -> Dict[str, Any]:
+    async def one(i: int) -> Tuple[float, int]:
+        method, url, params, body, headers = make_call(i)
+        t0 = time.perf_counter()
+        resp = await client.request(method, url, params=params, json=body, headers=headers)
+        await resp.aread()
+        elapsed = (time.perf_counter() - t0) * 1000
+        problem = check(resp) if check is not None else None
+        if problem:
+            raise RuntimeError(f"{method} {url}: {problem}")
+        return elapsed, resp.status_code
+
+    for i in range(warmup):
+        await one(i)
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(warmup, warmup + n))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            ms, status = await one(i)
+            latencies.append(ms)
+            if status >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "p50_ms": round(_pct(latencies, 50), 3),
+        "p95_ms": round(_pct(latencies, 95), 3),
+        "p99_ms": round(_pct(latencies, 99), 3),
+        "rps": round(n / wall, 1),
+        "rss_peak_mib": round(_peak_rss_mib(), 1),
+        "errors": errors,
+        "requests": n,
+    }
+
+
+async def _drive(
+    scenarios: List[Tuple[str, Callable[[int], Call]]], opts: Dict[str, Any], checks: Optional[Dict[str, Check]] = None
+) -> Dict[str, Dict[str, Any]]:
+    import httpx
+
+    from app.main import app
+
+    out: Dict[str, Dict[str, Any]] = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, make_call in scenarios:
+                check = (checks or {}).get(name)
+                res = await _run_scenario(client, make_call, opts["requests"], opts["warmup"], opts["concurrency"], check)
+                out[name] = res
+                _print_row(name, res)
+    return out
+
+
+# -------- grupos (cada uno en su proceso) --------
+
+
+def _base_env(workdir: str) -> None:
+    os.environ.update(
+        {
+            "ACCESS_STORE": "sqlite",
+            "ACCESS_STORE_PATH": os.path.join(workdir, "access_requests.db"),
+            "AUDIT_SINKS": "",
+            "ENABLE_PROVISIONING": "false",
+            "CATALOG_MIRROR": "false",
+            "PROFILING_ENABLED": "false",
+        }
+    )
+
+
+def _catalog_group(size: int, opts: Dict[str, Any], q: Any) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        _base_env(workdir)
+        from app import gcp_catalog
+        from benchmarks.synthetic import DOMAINS, SUBJECTS, TAGS, synthetic_assets
+
+        t0 = time.perf_counter()
+        gcp_catalog.set_catalog(synthetic_assets(size))
+        print(f"-- catalog {size} assets (built in {time.perf_counter() - t0:.1f}s)", flush=True)
+
+        rnd = random.Random(1)
+        texts = [f"{rnd.choice(SUBJECTS)} {rnd.choice(['gold', 'daily', 'kpi', 'ventas', ''])}".strip() for _ in range(64)]
+        filters = [{"domain": rnd.choice(DOMAINS), "tags": rnd.choice(TAGS)} for _ in range(64)]
+        # cursores de segunda página para las mismas queries de texto
+        cursors: List[Dict[str, Any]] = []
+        for text in texts:
+            page = gcp_catalog.search(q=text, page_size=25, system=None, type=None, domain=None, tags=None, cursor=None)
+            if page["next_cursor"]:
+                cursors.append({"q": text, "cursor": page["next_cursor"]})
+
+        scenarios: List[Tuple[str, Callable[[int], Call]]] = [
+            (f"search text @{size}", lambda i: ("GET", "/search", {"q": texts[i % len(texts)]}, None, None)),
+            (f"search filters @{size}", lambda i: ("GET", "/search", {"q": texts[i % len(texts)], **filters[i % len(filters)]}, None, None)),
+            (f"search match-all @{size}", lambda i: ("GET", "/search", {"q": ""}, None, None)),
+            (f"facets @{size}", lambda i: ("GET", "/search/facets", {"q": texts[i % len(texts)]}, None, None)),
+        ]
+        if cursors:
+            scenarios.append((f"search page 2 @{size}", lambda i: ("GET", "/search", cursors[i % len(cursors)], None, None)))
+        scenarios = [s for s in scenarios if opts["only"] in s[0]]
+        q.put(asyncio.run(_drive(scenarios, opts)))
+
+
+def _serve_fake_bigquery(port_q: Any) -> None:
+    from app import fake_bigquery
+
+    server = fake_bigquery.serve()
+    port_q.put(fake_bigquery.endpoint(server))
+    while True:
+        time.sleep(3600)
+
+
+def _governance_group(opts: Dict[str, Any], q: Any) -> None:
+    ctx = multiprocessing.get_context("spawn")
+    port_q = ctx.Queue()
+    fake = ctx.Process(target=_serve_fake_bigquery, args=(port_q,), daemon=True)
+    fake.start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            _base_env(workdir)
+            os.environ["MOCK_MODE"] = "false"
+            os.environ["BIGQUERY_API_ENDPOINT"] = port_q.get(timeout=30)
+
+            from app import access_requests
+            from app.mock_catalog import MOCK_SCHEMAS
+            from benchmarks.synthetic import synthetic_access_requests, synthetic_assets
+
+            history = opts["history"]
+            t0 = time.perf_counter()
+            items = synthetic_access_requests(history, synthetic_assets(2000))
+            tables = [r for r in MOCK_SCHEMAS if r.startswith("bigquery://")]
+            # preview resuelve el rol con app.auth: tiene que ser un usuario conocido (VIEWER)
+            reader = "viewer@company.com"
+            owner = "bench.owner@company.com"
+            # solicitudes aprobadas para preview + pendientes para decidir, después del historial
+            extra = [
+                {**items[0], "id": f"bench-approved-{j}", "linked_resource": t, "requester_email": reader, "status": "APPROVED"}
+                for j, t in enumerate(tables)
+            ]
+            pending_n = opts["requests"] + opts["warmup"]
+            extra += [
+                {**items[0], "id": f"bench-pending-{j:06d}", "data_owner": owner, "status": "PENDING", "decided_at": None, "decided_by": None, "decision": None}
+                for j in range(pending_n)
+            ]
+            for item in items + extra:
+                access_requests._STORE.create(item)
+            print(f"-- governance: {history} access requests (seeded in {time.perf_counter() - t0:.1f}s)", flush=True)
+
+            # ring de auditoría lleno; los escenarios de abajo que auditan lo van rotando
+            from app import audit
+
+            rnd = random.Random(3)
+            for j in range(audit.AUDIT_MAX_EVENTS):
+                audit.audit_log(f"user{rnd.randrange(200)}@company.com", "PREVIEW", tables[j % len(tables)], {"n": j})
+            ring_actors = [f"user{k}@company.com" for k in range(0, 200, 7)]
+
+            owners = sorted({it["data_owner"] for it in items})
+            actor = {"X-User-Email": reader}
+            scenarios: List[Tuple[str, Callable[[int], Call]]] = [
+                ("schema", lambda i: ("GET", "/assets/schema", {"linked_resource": tables[i % len(tables)]}, None, actor)),
+                ("preview", lambda i: ("GET", "/assets/preview", {"linked_resource": tables[i % len(tables)], "limit": 50}, None, actor)),
+                ("access list pending", lambda i: ("GET", "/access-requests", {"approver_email": owners[i % len(owners)], "status": "PENDING"}, None, None)),
+                ("access list all", lambda i: ("GET", "/access-requests", {"limit": 100}, None, None)),
+                ("audit ring actor", lambda i: ("GET", "/audit", {"actor": ring_actors[i % len(ring_actors)]}, None, None)),
+                (
+                    "audit ring actor+resource",
+                    lambda i: ("GET", "/audit", {"actor": ring_actors[i % len(ring_actors)], "resource": tables[i % len(tables)]}, None, None),
+                ),
+                (
+                    "access create",
+                    lambda i: (
+                        "POST",
+                        "/access-requests",
+                        None,
+                        {
+                            "linked_resource": tables[i % len(tables)],
+                            "requester_email": f"bench{i}@company.com",
+                            "access_level": "READER",
+                            "reason": "benchmark",
+                            "data_owner": owner,
+                        },
+                        None,
+                    ),
+                ),
+                (
+                    "access decide",
+                    lambda i: ("POST", f"/access-requests/bench-pending-{i:06d}/decision", None, {"decision": "APPROVED", "decided_by": owner}, None),
+                ),
+            ]
+            scenarios = [s for s in scenarios if opts["only"] in s[0]]
+            # sin ETag = no pasó por el cache de bq_schema contra BigQuery (p.ej. una ruta mock)
+            checks: Dict[str, Check] = {
+                "schema": lambda r: None if r.headers.get("etag") else f"{r.status_code} without ETag",
+                "preview": lambda r: None if r.status_code == 200 else f"status {r.status_code}",
+                "audit ring actor": _audit_check("memory"),
+                "audit ring actor+resource": _audit_check("memory"),
+            }
+            q.put(asyncio.run(_drive(scenarios, opts, checks)))
+    finally:
+        fake.terminate()
+
+
+def _audit_check(source: str) -> Check:
+    def check(r: Any) -> Optional[str]:
+        if r.status_code != 200:
+            return f"status {r.status_code}"
+        got = r.json().get("source")
+        return None if got == source else f"source {got}, expected {source}"
+
+    return check
+
+
+def _audit_group(opts: Dict[str, Any], q: Any) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        _base_env(workdir)
+        directory = os.path.join(workdir, "audit")
+        os.environ.update({"AUDIT_SINKS": "segments", "AUDIT_DIR": directory})
+
+        from app.audit_index import AuditQueryEngine
+        from benchmarks.audit_query import generate
+
+        n = opts["audit_events"]
+        generate(directory, n)
+        # actores / resources que existen en los segmentos (en todo el rango de fechas)
+        sample = AuditQueryEngine(directory).query(limit=500)["items"]
+        actors = sorted({e["actor"] for e in sample})
+        resources = sorted({e["resource"] for e in sample})
+        print(f"-- audit: {n} events in {len(os.listdir(directory)) // 2} segments", flush=True)
+
+        # cursores de segunda página por actor
+        engine = AuditQueryEngine(directory)
+        cursors = [{"actor": a, "cursor": c} for a in actors if (c := engine.query(actor=a)["next_cursor"])]
+
+        scenarios: List[Tuple[str, Callable[[int], Call]]] = [
+            ("audit segments newest", lambda i: ("GET", "/audit", None, None, None)),
+            ("audit segments actor", lambda i: ("GET", "/audit", {"actor": actors[i % len(actors)]}, None, None)),
+            ("audit segments resource", lambda i: ("GET", "/audit", {"resource": resources[i % len(resources)]}, None, None)),
+            (
+                "audit segments actor+res",
+                lambda i: ("GET", "/audit", {"actor": sample[i % len(sample)]["actor"], "resource": sample[i % len(sample)]["resource"]}, None, None),
+            ),
+        ]
+        if cursors:
+            scenarios.append(("audit segments page 2", lambda i: ("GET", "/audit", cursors[i % len(cursors)], None, None)))
+        scenarios = [s for s in scenarios if opts["only"] in s[0]]
+        checks = {name: _audit_check("segments") for name, _ in scenarios}
+        q.put(asyncio.run(_drive(scenarios, opts, checks)))
+
+
+def _run_group(target: Callable[..., None], *args: Any) -> Dict[str, Dict[str, Any]]:
+    ctx = multiprocessing.get_context("spawn")
+    q = ctx.Queue()
+    proc = ctx.Process(target=target, args=(*args, q))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        raise SystemExit(f"benchmark group {target.__name__}{args[:1]} failed (exit {proc.exitcode})")
+    return q.get()
+
+
+# -------- baseline --------
+
+
+def _print_row(name: str, res: Dict[str, Any]) -> None:
+    err = f"  errors {res['errors']}" if res["errors"] else ""
+    print(
+        f"{name:<28} p50 {res['p50_ms']:8.2f}  p95 {res['p95_ms']:8.2f}  p99 {res['p99_ms']:8.2f} ms  "
+        f"{res['rps']:8.1f} req/s  rss {res['rss_peak_mib']:7.1f} MiB{err}",
+        flush=True,
+    )
+
+
+def _machine() -> Dict[str, Any]:
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(current: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float) -> List[str]:
+    flags = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        # p99 con pocos cientos de requests es ruidoso: el doble de tolerancia
+        for key, tol in (("p50_ms", threshold), ("p95_ms", threshold), ("p99_ms", 2 * threshold)):
+            if cur[key] > base[key] * (1 + tol) and cur[key] - base[key] > _MIN_DELTA_MS:
+                flags.append(f"{name}: {key} {base[key]} -> {cur[key]} (+{(cur[key] / base[key] - 1) * 100:.0f}%)")
+        if cur["rps"] < base["rps"] * (1 - threshold):
+            flags.append(f"{name}: rps {base['rps']} -> {cur['rps']} ({(cur['rps'] / base['rps'] - 1) * 100:.0f}%)")
+        if cur["rss_peak_mib"] > base["rss_peak_mib"] * (1 + threshold) and cur["rss_peak_mib"] - base["rss_peak_mib"] > _MIN_DELTA_MIB:
+            flags.append(f"{name}: rss_peak_mib {base['rss_peak_mib']} -> {cur['rss_peak_mib']}")
+        if cur["errors"] > base.get("errors", 0):
+            flags.append(f"{name}: errors {base.get('errors', 0)} -> {cur['errors']}")
+    return flags
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1000,100000", help="tamaños de catálogo, p.ej. 1000,100000,1000000")
+    ap.add_argument("--history", type=int, default=50_000, help="solicitudes de acceso en el historial")
+    ap.add_argument("--audit-events", type=int, default=200_000, help="eventos de auditoría en segmentos")
+    ap.add_argument("--requests", type=int, default=300, help="requests medidos por escenario")
+    ap.add_argument("--warmup", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--only", default="", help="solo escenarios cuyo nombre contiene esto")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save", action="store_true", help="guardar los resultados como baseline")
+    ap.add_argument("--threshold", type=float, default=0.25, help="tolerancia relativa (0.25 = 25%%)")
+    args = ap.parse_args(argv)
+
+    opts = {k: getattr(args, k) for k in ("history", "audit_events", "requests", "warmup", "concurrency", "only")}
+    results: Dict[str, Dict[str, Any]] = {}
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        results.update(_run_group(_catalog_group, size, opts))
+    results.update(_run_group(_governance_group, opts))
+    results.update(_run_group(_audit_group, opts))
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        doc = {"machine": _machine(), "options": {**opts, "sizes": args.sizes}, "results": results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline} (run with --save)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        doc = json.load(f)
+    if doc.get("machine") != _machine():
+        print(f"warning: baseline from another machine {doc.get('machine')}")
+    base_opts = doc.get("options", {})
+    mismatched = [k for k in _LOAD_OPTIONS if base_opts.get(k) != opts[k]]
+    if mismatched:
+        # otra carga (más historial, menos requests, ...) no es comparable: no es una regresión
+        for k in mismatched:
+            print(f"option {k}: baseline {base_opts.get(k)}, this run {opts[k]}")
+        print("not comparing: run with the baseline's options or --save a new baseline")
+        return 2
+    flags = compare(results, doc.get("results", {}), args.threshold)
+    missing = sorted(set(results) - set(doc.get("results", {})))
+    if missing:
+        print(f"not in baseline: {', '.join(missing)}")
+    if flags:
+        print(f"REGRESSIONS ({len(flags)}, threshold {args.threshold:.0%}):")
+        for line in flags:
+            print(f"  {line}")
+        return 1
+    print(f"no regressions vs {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
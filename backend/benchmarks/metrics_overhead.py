@@ -0,0 +1,69 @@
+"""
+Costo por request de MetricsMiddleware y de los hooks de upstream.
+
+    cd backend && python -m benchmarks.metrics_overhead [n]
+
+Llama n veces a una app ASGI mínima (response.start + body) con y sin el
+middleware, en el mismo event loop; la diferencia es lo que paga cada request.
+Para upstreams se mide lo que run_blocking/track agregan por llamada
+(upstream._start + upstream._end) con y sin el hook de métricas: la llamada en
+sí (executor, semáforo) tiene demasiado ruido para medir la diferencia.
+"""
+
+import asyncio
+import sys
+import time
+
+from app import metrics, upstream
+
+
+class _Route:
+    path = "/assets/schema"
+
+
+async def _app(scope, receive, send):
+    scope["route"] = _Route  # lo que deja el router de FastAPI
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(_message):
+    pass
+
+
+async def _drive(app, n):
+    scope = {"type": "http", "method": "GET", "path": "/assets/schema"}
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), _receive, _send)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def _upstream(n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        upstream._end("bigquery", upstream._start("bigquery"), "ok")
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def main(n: int) -> None:
+    wrapped = metrics.MetricsMiddleware(_app)
+    for _ in range(2):  # warmup
+        await _drive(_app, n // 10)
+        await _drive(wrapped, n // 10)
+    base = min([await _drive(_app, n) for _ in range(5)])
+    inst = min([await _drive(wrapped, n) for _ in range(5)])
+    print(f"request  bare {base:6.2f} us  with middleware {inst:6.2f} us  overhead {inst - base:5.2f} us")
+
+    up_base = min(_upstream(n) for _ in range(5))
+    upstream.add_hook(metrics._HOOK)
+    up_inst = min(_upstream(n) for _ in range(5))
+    print(f"upstream bare {up_base:6.2f} us  with hook       {up_inst:6.2f} us  overhead {up_inst - up_base:5.2f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000))
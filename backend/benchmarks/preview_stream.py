@@ -0,0 +1,134 @@
+"""
+Preview de una tabla ancha: list-of-dicts + un JSON vs streaming NDJSON / Arrow.
+
+    cd backend && python -m benchmarks.preview_stream [rows] [cols]
+
+Default 10k filas x 100 columnas. El fake BigQuery REST corre en otro proceso
+(para que tracemalloc mida solo el lado del portal) y las tres variantes leen las
+mismas páginas de tabledata.list:
+  - list-of-dicts: todas las filas como dicts + json.dumps del payload completo
+                   (el loop `rows.append({...})` original); primer byte = al final
+  - ndjson:        _stream_preview(format=ndjson), una página por chunk
+  - arrow:         _stream_preview(format=arrow), un RecordBatch por página (pyarrow)
+Reporta time-to-first-byte, tiempo total, bytes y pico de memoria (tracemalloc,
+en una pasada aparte).
+"""
+
+import asyncio
+import inspect
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+
+TABLE = "bigquery://bench.preview.wide"
+TYPES = ["STRING", "INT64", "FLOAT64", "DATE", "TIMESTAMP", "BOOL", "STRING", "NUMERIC"]
+
+
+def _serve(port_q, rows: int, cols: int) -> None:
+    from app import fake_bigquery
+
+    columns = [{"name": f"col_{i:03d}", "type": TYPES[i % len(TYPES)]} for i in range(cols)]
+    server = fake_bigquery.serve(extra_tables={TABLE: {"columns": columns, "num_rows": rows}})
+    port_q.put(server.server_address[1])
+    while True:
+        time.sleep(3600)
+
+
+def _list_of_dicts(rows: int):
+    from app import bq_preview
+
+    def run():
+        fields, _total, pages = bq_preview._open_rows(TABLE, rows, None, bq_preview.PREVIEW_STREAM_PAGE_ROWS)
+        names = [f.name for f in fields]
+        out = []
+        page = bq_preview._next_page(pages)
+        while page is not None:
+            for values in page:
+                out.append({n: bq_preview._jsonable(v) for n, v in zip(names, values)})
+            page = bq_preview._next_page(pages)
+        body = json.dumps({"ok": True, "linked_resource": TABLE, "rows": out}).encode("utf-8")
+        return [body]
+
+    return run
+
+
+def _stream(rows: int, fmt: str):
+    from app import bq_preview
+
+    async def run():
+        resp = await bq_preview._stream_preview(TABLE, rows, None, fmt, mock=False)
+        async for chunk in resp.body_iterator:
+            yield chunk
+
+    return run
+
+
+def _consume(run):
+    """(time-to-first-byte s, total s, bytes)."""
+    t0 = time.perf_counter()
+    first = None
+    total_bytes = 0
+
+    if inspect.isasyncgenfunction(run):
+        async def consume():
+            nonlocal first, total_bytes
+            async for chunk in run():
+                if first is None:
+                    first = time.perf_counter() - t0
+                total_bytes += len(chunk)
+
+        asyncio.run(consume())
+    else:
+        for chunk in run():
+            if first is None:
+                first = time.perf_counter() - t0
+            total_bytes += len(chunk)
+
+    return first, time.perf_counter() - t0, total_bytes
+
+
+def _measure(label: str, run) -> None:
+    # tiempos sin tracemalloc (lo hace ~10x más lento); el pico en una segunda pasada
+    first, elapsed, total_bytes = _consume(run)
+    tracemalloc.start()
+    _consume(run)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<14} first byte {first * 1000:8.1f} ms  total {elapsed * 1000:8.1f} ms  "
+        f"{total_bytes / 2**20:7.1f} MiB out  peak {peak / 2**20:7.1f} MiB"
+    )
+
+
+def main(rows: int, cols: int) -> None:
+    port_q = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_serve, args=(port_q, rows, cols), daemon=True)
+    proc.start()
+    os.environ["BIGQUERY_API_ENDPOINT"] = f"http://127.0.0.1:{port_q.get(timeout=10)}"
+    os.environ["PREVIEW_STREAM_MAX_ROWS"] = str(rows)
+
+    from app import bq_preview, gcp_clients
+
+    print(f"preview {rows} rows x {cols} cols, page {bq_preview.PREVIEW_STREAM_PAGE_ROWS} rows")
+    try:
+        _measure("list-of-dicts", _list_of_dicts(rows))
+        _measure("ndjson", _stream(rows, "ndjson"))
+        try:
+            import pyarrow  # noqa: F401
+
+            _measure("arrow", _stream(rows, "arrow"))
+        except ImportError:
+            print("arrow          skipped (pip install pyarrow)")
+    finally:
+        gcp_clients.close_all()
+        proc.terminate()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    )
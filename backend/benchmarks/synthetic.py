@@ -0,0 +1,84 @@
+"""
+Generadores de datos sintéticos con la misma forma que MOCK_ASSETS.
+Deterministas (seed) para que los números sean comparables entre corridas.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+DOMAINS = ["Retail", "Logistics", "CRM", "Ecommerce", "Finance", "Marketing"]
+LAYERS = ["gold", "silver", "bronze"]
+SYSTEMS = [("BIGQUERY", "TABLE"), ("BIGQUERY", "VIEW"), ("DATAPLEX", "ENTRY"), ("GCS", "FILE")]
+SUBJECTS = [
+    "sales", "margin", "inventory", "stock_movements", "customers", "segments",
+    "orders", "order_items", "payments", "returns", "promotions", "stores", "sku",
+]
+GRAINS = ["daily", "hourly", "weekly", "monthly", "snapshot", "events"]
+TAGS = [
+    "gold", "silver", "sales", "kpi", "certified", "inventory", "critical", "audit",
+    "pii", "restricted", "customer", "orders", "digital", "finance", "near_real_time",
+]
+WORDS = [
+    "ventas", "diarias", "consolidadas", "margen", "stock", "clientes", "segmentación",
+    "órdenes", "detalle", "fuente", "oficial", "reportería", "auditoría", "base", "para",
+    "dashboards", "kpi", "canal", "local", "producto", "promociones", "acceso", "restringido",
+]
+
+
+def synthetic_assets(n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    items: List[Dict[str, Any]] = []
+    for i in range(n):
+        domain = rnd.choice(DOMAINS)
+        layer = rnd.choice(LAYERS)
+        system, typ = rnd.choice(SYSTEMS)
+        name = f"{domain.lower()}.{rnd.choice(SUBJECTS)}_{rnd.choice(GRAINS)}_{layer}_{i}"
+        owner = domain.lower()
+        items.append(
+            {
+                "display_name": name,
+                "type": typ,
+                "system": system,
+                "linked_resource": f"bigquery://demo.{name}",
+                "description": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(6, 16))).capitalize() + ".",
+                "domain": domain,
+                "data_owner": f"{owner}.owner@company.com",
+                "data_steward": f"{owner}.steward@company.com",
+                "tags": [layer] + rnd.sample(TAGS, rnd.randint(1, 4)),
+            }
+        )
+    return items
+
+
+STATUSES = ["PENDING", "APPROVED", "REJECTED"]
+
+
+def synthetic_access_requests(
+    n: int, assets: List[Dict[str, Any]], requesters: int = 500, seed: int = 42
+) -> List[Dict[str, Any]]:
+    """Historial de solicitudes (forma de access_requests.create_access_request), oldest first."""
+    rnd = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    items: List[Dict[str, Any]] = []
+    for i in range(n):
+        asset = rnd.choice(assets)
+        status = rnd.choices(STATUSES, weights=[2, 6, 2])[0]
+        created = start + timedelta(seconds=i * 30)
+        decided = status != "PENDING"
+        items.append(
+            {
+                "id": f"req-{i:08d}",
+                "linked_resource": asset["linked_resource"],
+                "requester_email": f"user{int(rnd.paretovariate(1.2)) % requesters}@company.com",
+                "access_level": "READER" if rnd.random() < 0.9 else "WRITER",
+                "reason": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 10))),
+                "data_owner": asset["data_owner"],
+                "status": status,
+                "created_at": created.isoformat() + "Z",
+                "decided_at": (created + timedelta(hours=rnd.randint(1, 72))).isoformat() + "Z" if decided else None,
+                "decided_by": asset["data_owner"] if decided else None,
+                "decision": status if decided else None,
+            }
+        )
+    return items
@@ -0,0 +1,106 @@
+"""
+¿Un upstream lento deja sin respuesta a /health y /audit?
+
+    cd backend && python -m benchmarks.upstream_starvation [concurrency] [upstream_ms]
+
+Simula un provider lento (sleep en _mock_search, cache desactivado) y lanza
+`concurrency` búsquedas simultáneas mientras mide la latencia de /health y /audit:
+  - legacy: handler `def` que llama search_assets (threadpool de Starlette)
+            + un /health `def` como el original
+  - async:  GET /catalog/search (executor de upstreams) + /health y /audit async
+  - schema: GET /assets/schema (async, MOCK_MODE=false) contra el fake BigQuery
+            con `upstream_ms` por llamada; TTL del cache de schema en 0 para que
+            cada request revalide contra BigQuery
+Todo in-process vía httpx.ASGITransport (requirements-dev.txt).
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+from app import bq_schema, catalog_provider, fake_bigquery
+from app.main import app
+
+
+def _install_legacy_routes() -> None:
+    @app.get("/bench/legacy/catalog-search")
+    def legacy_search(q: str = "", page_size: int = 20):
+        return {"items": catalog_provider.search_assets(q, page_size)}
+
+    @app.get("/bench/legacy/health")
+    def legacy_health():
+        return {"ok": True}
+
+
+async def _probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, out: list) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await client.get(path)
+        out.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(0.02)
+
+
+async def _scenario(label: str, search_path: str, probe_paths: list, concurrency: int, params=None) -> None:
+    params = params or (lambda i: {"q": f"sales{i}"})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        stop = asyncio.Event()
+        probes = {p: [] for p in probe_paths}
+        probe_tasks = [asyncio.create_task(_probe(client, p, stop, probes[p])) for p in probe_paths]
+        await asyncio.sleep(0.05)
+
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(*(client.get(search_path, params=params(i)) for i in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+        stop.set()
+        await asyncio.gather(*probe_tasks)
+
+    errors = sum(1 for r in responses if r.status_code >= 400)
+    print(f"[{label}] {concurrency} slow requests in {elapsed:.2f}s ({concurrency / elapsed:.0f} req/s, {errors} errors)")
+    for path, samples in probes.items():
+        if samples:
+            print(f"    {path:<24} n={len(samples):4d}  p50 {statistics.median(samples):8.1f} ms  max {max(samples):8.1f} ms")
+
+
+def main(concurrency: int, upstream_ms: float) -> None:
+    def slow_mock(q, page_size):
+        time.sleep(upstream_ms / 1000.0)
+        return []
+
+    catalog_provider._mock_search = slow_mock
+    catalog_provider._CACHE.maxsize = 0
+    _install_legacy_routes()
+
+    print(f"upstream latency {upstream_ms} ms, concurrency {concurrency}")
+    asyncio.run(_scenario("legacy sync def", "/bench/legacy/catalog-search", ["/bench/legacy/health"], concurrency))
+    asyncio.run(_scenario("async + upstream executor", "/catalog/search", ["/health", "/audit"], concurrency))
+
+    server = fake_bigquery.serve(latency_ms=upstream_ms)
+    os.environ["BIGQUERY_API_ENDPOINT"] = fake_bigquery.endpoint(server)
+    os.environ["MOCK_MODE"] = "false"
+    bq_schema._SCHEMA_TTL_S = 0.0
+    tables = [t for t in fake_bigquery.MOCK_SCHEMAS if t.startswith("bigquery://")]
+    try:
+        asyncio.run(
+            _scenario(
+                "async /assets/schema (fake BigQuery)",
+                "/assets/schema",
+                ["/health", "/audit"],
+                concurrency,
+                params=lambda i: {"linked_resource": tables[i % len(tables)]},
+            )
+        )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 500.0,
+    )
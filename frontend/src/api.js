@@ -32,21 +32,89 @@ async function http(path, { method = "GET", query, body, headers } = {}) {
   return data;
 }
 
+// Lee un stream NDJSON línea a línea; onLine recibe cada objeto apenas llega
+async function streamNdjson(path, { query, headers, onLine, signal } = {}) {
+  const url = new URL(API_BASE + path);
+  Object.entries(query || {}).forEach(([k, v]) => {
+    if (v != null) url.searchParams.set(k, String(v));
+  });
+
+  const res = await fetch(url.toString(), { headers, signal });
+  if (!res.ok) {
+    let msg = `HTTP ${res.status}`;
+    try {
+      const data = await res.json();
+      msg = data.detail || data.message || msg;
+    } catch {
+      // body no JSON
+    }
+    const err = new Error(msg);
+    err.status = res.status;
+    throw err;
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    buf += decoder.decode(value || new Uint8Array(), { stream: !done });
+    let nl;
+    while ((nl = buf.indexOf("\n")) >= 0) {
+      const line = buf.slice(0, nl);
+      buf = buf.slice(nl + 1);
+      if (line) onLine(JSON.parse(line));
+    }
+    if (done) break;
+  }
+}
+
 export const api = {
   // Catalog
-  search(q, { page_size = 25, system, type, domain, tags } = {}) {
-    return http("/search", { query: { q, page_size, system, type, domain, tags } });
+  search(q, { page_size = 25, system, type, domain, tags, cursor } = {}) {
+    return http("/search", { query: { q, page_size, system, type, domain, tags, cursor } });
   },
   getSchema(linked_resource) {
     return http("/assets/schema", { query: { linked_resource } });
   },
+  getSchemaBatch(linked_resources) {
+    return http("/assets/schema:batch", { method: "POST", body: { linked_resources } });
+  },
+  // Preview por streaming (NDJSON): onColumns(columns, total_rows) una vez, onRows(rows) por chunk.
+  // actor ({email, role}) va en X-User-Email / X-User-Role: el backend valida acceso por request
+  streamPreview(linked_resource, { limit = 1000, columns, actor, onColumns, onRows, signal } = {}) {
+    let pending = [];
+    let flushed = Promise.resolve();
+    return streamNdjson("/assets/preview", {
+      query: { linked_resource, limit, columns, format: "ndjson" },
+      headers: actor ? { "X-User-Email": actor.email || "", "X-User-Role": actor.role || "" } : undefined,
+      signal,
+      onLine(obj) {
+        if (Array.isArray(obj)) {
+          pending.push(obj);
+          // agrupa las filas de un mismo chunk en un solo render
+          if (pending.length === 1) {
+            flushed = Promise.resolve().then(() => {
+              const rows = pending;
+              pending = [];
+              onRows && onRows(rows);
+            });
+          }
+        } else if (obj.columns) {
+          onColumns && onColumns(obj.columns, obj.total_rows);
+        } else if (obj.error) {
+          throw new Error(obj.error);
+        }
+      },
+    }).then(() => flushed);
+  },
 
   // Access Requests
   createAccessRequest(payload) {
     return http("/access-requests", { method: "POST", body: payload });
   },
-  listAccessRequests({ status, approver_email } = {}) {
-    return http("/access-requests", { query: { status, approver_email } });
+  listAccessRequests({ status, approver_email, limit, cursor } = {}) {
+    return http("/access-requests", { query: { status, approver_email, limit, cursor } });
   },
   decideAccessRequest(request_id, { decision, decided_by } = {}) {
     return http(`/access-requests/${encodeURIComponent(request_id)}/decision`, {
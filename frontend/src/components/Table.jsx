@@ -1,4 +1,12 @@
-export default function Table({ columns, rows, onRowClick }) {
+// Celdas de preview pueden traer booleanos u objetos (RECORD): React no los renderiza tal cual
+function cell(v) {
+  if (v !== null && typeof v === "object") return JSON.stringify(v);
+  if (typeof v === "boolean") return String(v);
+  return v;
+}
+
+// rows puede ir creciendo (preview por streaming): loading muestra "Loading…" mientras llegan más filas
+export default function Table({ columns, rows, onRowClick, loading = false }) {
   return (
     <table>
       <thead>
@@ -16,11 +24,18 @@ export default function Table({ columns, rows, onRowClick }) {
             onClick={() => onRowClick && onRowClick(r)}
           >
             {columns.map((c) => (
-              <td key={c.key}>{r[c.key]}</td>
+              <td key={c.key}>{cell(r[c.key])}</td>
             ))}
           </tr>
         ))}
-        {rows.length === 0 && (
+        {loading && (
+          <tr>
+            <td colSpan={columns.length || 1} style={{ opacity: 0.7 }}>
+              Loading…
+            </td>
+          </tr>
+        )}
+        {!loading && rows.length === 0 && (
           <tr>
             <td colSpan={columns.length} style={{ opacity: 0.7 }}>
               No results
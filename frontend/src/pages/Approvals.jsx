@@ -2,6 +2,8 @@ import { useEffect, useMemo, useState } from "react";
 import { api } from "../api.js";
 import { addGrant, revokeGrant, getSession } from "../store.js";
 
+const PAGE_SIZE = 50;
+
 export default function Approvals() {
   const session = useMemo(() => getSession(), []);
   const isOwner = session?.role === "DATA_OWNER";
@@ -12,10 +14,13 @@ export default function Approvals() {
   const [status, setStatus] = useState("PENDING");
   const [approverEmail, setApproverEmail] = useState(session?.email || "");
   const [rows, setRows] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [err, setErr] = useState("");
 
-  async function load() {
+  // Primera página (o siguiente con cursor: se agrega a lo ya cargado)
+  async function load(cursor = null) {
     if (!canView) return;
     setLoading(true);
     setErr("");
@@ -23,11 +28,16 @@ export default function Approvals() {
       const data = await api.listAccessRequests({
         status,
         approver_email: approverEmail || session?.email,
+        limit: PAGE_SIZE,
+        cursor: cursor || undefined,
       });
-      setRows(data?.items || []);
+      const items = data?.items || [];
+      setRows((prev) => (cursor ? prev.concat(items) : items));
+      setTotal(data?.total ?? items.length);
+      setNextCursor(data?.next_cursor || null);
     } catch (e) {
       setErr(e?.message || "Error");
-      setRows([]);
+      if (!cursor) setRows([]);
     } finally {
       setLoading(false);
     }
@@ -71,7 +81,7 @@ export default function Approvals() {
             Owner y Steward pueden ver. Solo el <b>Owner</b> aprueba/rechaza (MVP).
           </div>
         </div>
-        <button onClick={load} disabled={loading}>
+        <button onClick={() => load()} disabled={loading}>
           {loading ? "Loading..." : "Refresh"}
         </button>
       </div>
@@ -139,6 +149,15 @@ export default function Approvals() {
         </table>
       </div>
 
+      <div style={{ marginTop: 10, display: "flex", gap: 10, alignItems: "center" }}>
+        <span className="pill">{rows.length} of {total}</span>
+        {nextCursor && (
+          <button className="secondary" onClick={() => load(nextCursor)} disabled={loading}>
+            {loading ? "Loading..." : "Load more"}
+          </button>
+        )}
+      </div>
+
       <div style={{ marginTop: 10, opacity: 0.7, fontSize: 12 }}>
         Tip MVP: si “Approve”, el requester obtiene acceso mock (grant local) y ya puede ver el catálogo del asset.
       </div>
@@ -1,6 +1,7 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { api } from "../api.js";
+import Table from "../components/Table.jsx";
 import { getSelectedAsset, getSession, computeAccess } from "../store.js";
 
 export default function Asset() {
@@ -13,6 +14,13 @@ export default function Asset() {
   const [schemaLoading, setSchemaLoading] = useState(false);
   const [schemaErr, setSchemaErr] = useState("");
 
+  const [previewCols, setPreviewCols] = useState([]);
+  const [previewRows, setPreviewRows] = useState([]);
+  const [previewTotal, setPreviewTotal] = useState(null);
+  const [previewLoading, setPreviewLoading] = useState(false);
+  const [previewErr, setPreviewErr] = useState("");
+  const previewAbort = useRef(null);
+
   const [reason, setReason] = useState("Necesito este dataset para análisis/reporting.");
   const [accessLevel, setAccessLevel] = useState("READER");
   const [reqLoading, setReqLoading] = useState(false);
@@ -53,6 +61,38 @@ export default function Asset() {
     };
   }, [asset, access?.hasAccess]);
 
+  // Cancela un preview en curso al salir de la página
+  useEffect(() => () => previewAbort.current?.abort(), []);
+
+  async function loadPreview() {
+    previewAbort.current?.abort();
+    const ctrl = new AbortController();
+    previewAbort.current = ctrl;
+
+    setPreviewCols([]);
+    setPreviewRows([]);
+    setPreviewTotal(null);
+    setPreviewErr("");
+    setPreviewLoading(true);
+    try {
+      // Las filas se van pintando a medida que llega cada chunk NDJSON
+      await api.streamPreview(asset.linked_resource, {
+        limit: 1000,
+        actor: session,
+        signal: ctrl.signal,
+        onColumns: (cols, total) => {
+          setPreviewCols(cols.map((name, i) => ({ key: i, label: name })));
+          setPreviewTotal(total);
+        },
+        onRows: (rows) => setPreviewRows((prev) => prev.concat(rows)),
+      });
+    } catch (e) {
+      if (e?.name !== "AbortError") setPreviewErr(e?.message || "Error loading preview");
+    } finally {
+      if (previewAbort.current === ctrl) setPreviewLoading(false);
+    }
+  }
+
   async function requestAccess(e) {
     e.preventDefault();
     setReqLoading(true);
@@ -229,6 +269,38 @@ export default function Asset() {
           </>
         )}
       </div>
+
+      {/* Preview */}
+      {access?.hasAccess && (
+        <div className="card" style={{ cursor: "default" }}>
+          <div style={{ display: "flex", justifyContent: "space-between", gap: 12, alignItems: "flex-start", flexWrap: "wrap" }}>
+            <div>
+              <div style={{ fontSize: 18, fontWeight: 900 }}>Preview</div>
+              <div style={{ marginTop: 6, opacity: 0.8 }}>
+                Primeras filas vía tabledata.list (sin query job). Se muestran a medida que llegan.
+              </div>
+            </div>
+            <div style={{ display: "flex", gap: 10, alignItems: "center" }}>
+              {previewCols.length > 0 && (
+                <span className="pill">
+                  {previewRows.length} rows{previewTotal != null ? ` of ${previewTotal}` : ""}
+                </span>
+              )}
+              <button onClick={loadPreview} disabled={previewLoading}>
+                {previewLoading ? "Loading..." : "Load preview"}
+              </button>
+            </div>
+          </div>
+
+          {previewErr && <div className="error" style={{ marginTop: 12 }}>⚠️ {previewErr}</div>}
+
+          {(previewLoading || previewCols.length > 0) && (
+            <div style={{ marginTop: 12 }} className="tableWrap">
+              <Table columns={previewCols} rows={previewRows} loading={previewLoading} />
+            </div>
+          )}
+        </div>
+      )}
     </div>
   );
 }